@@ -0,0 +1,138 @@
+# emulator.py
+"""
+Run the arcade's MicroPython sources on CPython.
+
+``install()`` puts the emulated device modules in this directory (``machine``,
+``framebuf``, ``micropython``, ``urandom``) and ``src/`` at the front of
+``sys.path``, and adds the MicroPython-only ``time`` and ``gc`` functions.
+Ticks come from ``clock``, which is virtual: it only moves when a runner
+advances it, so simulated games see exactly the timing the runner asks for
+and never sleep.
+"""
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(HOST_DIR), "src")
+
+# Same wrap-around period as the ESP8266 ticks_ms()/ticks_us() counters
+TICKS_PERIOD = 1 << 30
+_TICKS_MAX = TICKS_PERIOD - 1
+_TICKS_HALF = TICKS_PERIOD // 2
+
+# Heap size reported by gc.mem_free(), roughly what an ESP8266 has left
+# after the firmware and the arcade modules are loaded
+HEAP_SIZE = 36 * 1024
+
+# Where emulated runs keep high scores and settings: the file named by the
+# ARCADE_STORE environment variable, else only in memory, so that runs
+# neither write into the working tree nor depend on earlier runs
+STORE_PATH = os.environ.get("ARCADE_STORE")
+
+
+class Clock:
+    def __init__(self):
+        self.us = 0
+
+    def reset(self, ms=0):
+        """
+        Set the clock to an absolute time.
+
+        :param ms: New time in milliseconds.
+        """
+        self.us = ms * 1000
+
+    def advance(self, ms):
+        """
+        Move the clock forward.
+
+        :param ms: Number of milliseconds to advance by.
+        """
+        self.us += int(ms * 1000)
+
+    def ticks_ms(self):
+        return (self.us // 1000) & _TICKS_MAX
+
+    def ticks_us(self):
+        return self.us & _TICKS_MAX
+
+
+clock = Clock()
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+
+def sleep_ms(ms):
+    clock.advance(ms)
+
+
+def sleep_us(us):
+    clock.advance(us / 1000)
+
+
+def mem_alloc():
+    """
+    Bytes allocated by Python code, as measured by tracemalloc when it is
+    tracing and 0 otherwise.
+    """
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return 0
+
+
+def mem_free():
+    return max(HEAP_SIZE - mem_alloc(), 0)
+
+
+_gc_threshold = -1
+
+
+def threshold(amount=None):
+    global _gc_threshold
+    if amount is None:
+        return _gc_threshold
+    _gc_threshold = amount
+
+
+_installed = False
+
+
+def install():
+    """
+    Make ``import machine``, ``import framebuf`` and the arcade modules under
+    ``src/`` resolve to the emulated device. Safe to call more than once.
+    """
+    global _installed
+    if _installed:
+        return
+    # src/random.py shadows the standard library module; anything already
+    # bound to the stdlib version keeps it, everything imported from here on
+    # gets the device implementation.
+    sys.modules.pop("random", None)
+    for path in (SRC_DIR, HOST_DIR):
+        if path in sys.path:
+            sys.path.remove(path)
+        sys.path.insert(0, path)
+    time.ticks_ms = clock.ticks_ms
+    time.ticks_us = clock.ticks_us
+    time.ticks_diff = ticks_diff
+    time.ticks_add = ticks_add
+    time.sleep_ms = sleep_ms
+    time.sleep_us = sleep_us
+    gc.mem_alloc = mem_alloc
+    gc.mem_free = mem_free
+    gc.threshold = threshold
+    import store
+
+    store.STORE.path = STORE_PATH
+    _installed = True
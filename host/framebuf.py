@@ -0,0 +1,122 @@
+# framebuf.py
+"""
+Host emulation of the MicroPython ``framebuf`` module.
+
+Only the MONO_VLSB format used by the SSD1306 driver is supported. The real
+firmware draws text with its built-in 8x8 font; the emulator has no copy of
+that font, so each character is drawn as a fixed 7x7 bit pattern derived from
+its code. Pixel output is therefore stable and comparable between host runs,
+but not identical to the device.
+"""
+
+MONO_VLSB = 0
+MONO_HLSB = 3
+MONO_HMSB = 4
+
+
+def _glyph(code):
+    columns = bytearray(8)
+    if code != 0x20:
+        h = (code * 2654435761) & 0xFFFFFFFF
+        for i in range(7):
+            h = (h * 1103515245 + 12345) & 0xFFFFFFFF
+            columns[i] = ((h >> 16) & 0x7F) | 0x41
+    return bytes(columns)
+
+
+_GLYPHS = [_glyph(code) for code in range(256)]
+
+
+class FrameBuffer:
+    def __init__(self, buffer, width, height, format=MONO_VLSB, stride=None):
+        if format != MONO_VLSB:
+            raise ValueError("only MONO_VLSB is emulated")
+        self._buf = buffer
+        self._width = width
+        self._height = height
+        self._stride = width if stride is None else stride
+
+    def fill(self, c):
+        buf = self._buf
+        buf[:] = (b"\xff" if c else b"\x00") * len(buf)
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self._width and 0 <= y < self._height):
+            return None
+        index = (y >> 3) * self._stride + x
+        bit = 1 << (y & 7)
+        if c is None:
+            return 1 if self._buf[index] & bit else 0
+        if c:
+            self._buf[index] |= bit
+        else:
+            self._buf[index] &= ~bit & 0xFF
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self._width)
+        y1 = min(y + h, self._height)
+        for yy in range(y0, y1):
+            index = (yy >> 3) * self._stride
+            bit = 1 << (yy & 7)
+            buf = self._buf
+            for xx in range(x0, x1):
+                if c:
+                    buf[index + xx] |= bit
+                else:
+                    buf[index + xx] &= ~bit & 0xFF
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.hline(x, y, w, c)
+        self.hline(x, y + h - 1, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w - 1, y, h, c)
+
+    def line(self, x0, y0, x1, y1, c):
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x0, y0, c)
+            if x0 == x1 and y0 == y1:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    def text(self, s, x, y, c=1):
+        for ch in s:
+            columns = _GLYPHS[ord(ch) & 0xFF]
+            for i in range(8):
+                bits = columns[i]
+                for j in range(8):
+                    if bits & (1 << j):
+                        self.pixel(x + i, y + j, c)
+            x += 8
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for yy in range(fbuf._height):
+            for xx in range(fbuf._width):
+                c = fbuf.pixel(xx, yy)
+                if c != key:
+                    self.pixel(x + xx, y + yy, c)
+
+    def scroll(self, xstep, ystep):
+        copy = FrameBuffer(bytearray(self._buf), self._width, self._height)
+        self.blit(copy, xstep, ystep)
@@ -0,0 +1,195 @@
+# machine.py
+"""
+Host emulation of the MicroPython ``machine`` module.
+
+Only the pieces the arcade uses are provided. Input pins read back the value
+last set on them (released, thanks to the pull-up, by default), I2C writes are
+counted and discarded, and timers never fire on their own: host runners call
+``Timer.fire()`` or ``Timer.fire_due()``, or step the game directly from a
+virtual clock. PWM outputs record every change with its time.
+"""
+
+import time
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 2
+    IRQ_RISING = 1
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = mode
+        self.pull = pull
+        self._value = 1 if pull == self.PULL_UP else 0
+        if value is not None:
+            self._value = value
+        self.handler = None
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if mode != -1:
+            self.mode = mode
+        if value is not None:
+            self._value = value
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = 1 if v else 0
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, **kwargs):
+        self.handler = handler
+
+
+class I2C:
+    def __init__(self, id=-1, scl=None, sda=None, freq=400000):
+        self.scl = scl
+        self.sda = sda
+        self.freq = freq
+        self.bytes_written = 0
+
+    def scan(self):
+        return [0x3C]
+
+    def writeto(self, addr, buf):
+        self.bytes_written += len(buf)
+        return len(buf)
+
+    def writevto(self, addr, vector):
+        for buf in vector:
+            self.bytes_written += len(buf)
+
+
+class PWM:
+    def __init__(self, pin, freq=1000, duty=0):
+        self.pin = pin
+        self._freq = freq
+        self._duty = duty
+        # (ticks_ms, freq, duty) after every change
+        self.timeline = []
+
+    def _record(self):
+        self.timeline.append((time.ticks_ms(), self._freq, self._duty))
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+        self._record()
+
+    def duty(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = value
+        self._record()
+
+    def deinit(self):
+        self.duty(0)
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+    # Timers with a callback, for fire_due()
+    _active = []
+
+    def __init__(self, id=-1):
+        self.id = id
+        self.period = 0
+        self.mode = self.PERIODIC
+        self.callback = None
+        self.deadline = 0
+
+    def init(self, period=1000, mode=PERIODIC, callback=None):
+        self.period = period
+        self.mode = mode
+        self.callback = callback
+        self.deadline = time.ticks_add(time.ticks_ms(), period)
+        if self not in Timer._active:
+            Timer._active.append(self)
+
+    def deinit(self):
+        self.callback = None
+        if self in Timer._active:
+            Timer._active.remove(self)
+
+    @classmethod
+    def next_deadline(cls):
+        """
+        :return: ticks_ms() at which the next timer is due, or None.
+        """
+        deadlines = [t.deadline for t in cls._active if t.callback is not None]
+        if not deadlines:
+            return None
+        now = time.ticks_ms()
+        return min(deadlines, key=lambda d: time.ticks_diff(d, now))
+
+    @classmethod
+    def fire_due(cls):
+        """
+        Fire every timer whose deadline has passed on the clock, including
+        ones that callbacks set up for the current time.
+        """
+        fired = True
+        while fired:
+            fired = False
+            now = time.ticks_ms()
+            for t in list(cls._active):
+                if t.callback is not None and time.ticks_diff(now, t.deadline) >= 0:
+                    if t.mode == cls.PERIODIC:
+                        t.deadline = time.ticks_add(t.deadline, t.period)
+                    t.fire()
+                    fired = True
+
+    def fire(self):
+        """
+        Invoke the timer callback once, as the hardware timer would.
+        """
+        callback = self.callback
+        if callback is not None:
+            if self.mode == self.ONE_SHOT:
+                self.deinit()
+            callback(self)
+
+
+_freq = 80000000
+
+
+def freq(hz=None):
+    global _freq
+    if hz is None:
+        return _freq
+    _freq = hz
+
+
+def unique_id():
+    return b"\x00\x00\x00\x00"
+
+
+def idle():
+    pass
+
+
+def lightsleep(time_ms=None):
+    """
+    Advance the emulator's virtual clock instead of sleeping.
+    """
+    if time_ms is not None:
+        time.sleep_ms(time_ms)
+
+
+def reset():
+    raise SystemExit("machine.reset()")
@@ -0,0 +1,37 @@
+# micropython.py
+"""
+Host emulation of the MicroPython ``micropython`` module.
+
+Code emitters are not available on CPython, so the ``native`` and ``viper``
+decorators return the function unchanged. Modules that ship viper kernels
+check ``sys.implementation.name`` before defining them.
+"""
+
+
+def const(value):
+    return value
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    return func
+
+
+def opt_level(level=None):
+    return 0
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def schedule(func, arg):
+    func(arg)
+    return True
+
+
+def mem_info(verbose=False):
+    print("mem: host emulator")
@@ -0,0 +1,208 @@
+# netplay_loopback.py
+"""
+Run a networked game between several emulated devices on one machine.
+
+Each player is a separate process running the arcade sources under the
+emulator, with its own UDP port on 127.0.0.1 and a scripted player. Packets
+can be delayed and dropped on the way out to imitate WiFi. At the end every
+process hashes its game state; the run passes when all hashes agree.
+
+Example::
+
+    python host/netplay_loopback.py --players 2 --ticks 500 --latency-ms 30 --loss 0.1
+"""
+
+import argparse
+import heapq
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import emulator  # noqa: E402
+import policies  # noqa: E402
+
+# Skill rating stored on every device before the match, which must survive it
+SKILL = 3
+
+
+class ImpairedSocket:
+    def __init__(self, sock, latency_ms, loss, seed):
+        """
+        Wrap a UDP socket so that sent packets arrive late or not at all.
+
+        :param sock: Socket to wrap.
+        :param latency_ms: Real milliseconds each packet is held back.
+        :param loss: Probability of dropping a packet.
+        :param seed: Seed for the drop decisions.
+        """
+        from _random import Random
+
+        self.sock = sock
+        self.latency = latency_ms / 1000
+        self.loss = loss
+        self.rng = Random(seed)
+        self.queue = []
+        self.sent = 0
+
+    def _flush(self):
+        now = time.monotonic()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, addr = heapq.heappop(self.queue)
+            self.sock.sendto(data, addr)
+
+    def sendto(self, data, addr):
+        self.sent += 1
+        if self.rng.random() < self.loss:
+            return len(data)
+        heapq.heappush(
+            self.queue, (time.monotonic() + self.latency, self.sent, bytes(data), addr)
+        )
+        self._flush()
+        return len(data)
+
+    def recvfrom(self, size):
+        self._flush()
+        return self.sock.recvfrom(size)
+
+    def settimeout(self, value):
+        self._flush()
+        # Wake up in time to send held-back packets
+        if value and self.queue:
+            value = min(value, max(self.queue[0][0] - time.monotonic(), 0.001))
+        self.sock.settimeout(value)
+
+    def setblocking(self, flag):
+        self.sock.setblocking(flag)
+
+    def close(self):
+        self.sock.close()
+
+
+def _wait(session, ms):
+    """
+    Poll the network for up to `ms` real milliseconds, moving the virtual
+    clock on by the time that actually passed.
+    """
+    start = time.monotonic()
+    session.poll(ms)
+    emulator.clock.advance((time.monotonic() - start) * 1000)
+
+
+def _player(args):
+    """
+    Play one side of the match.
+
+    :return: Tuple of (player, state hash, game over, settled, network report,
+        whether the stored skill rating was left alone).
+    """
+    player, options = args
+    emulator.install()
+    import netplay
+    from game_framework import RENDER_NEVER
+    from game_manager import GameManager
+    from store import STORE
+
+    games = {entry["name"]: entry for entry in GameManager().games}
+    entry = games[options.game]
+    params = dict(entry["params"])
+    params["num_players"] = options.players
+    game = entry["class"](**params)
+    game.set_render_policy(RENDER_NEVER)
+    # A seeded match must not change the player's rating on this device
+    skill_key = "skill:" + type(game).__name__
+    STORE.set(skill_key, SKILL)
+
+    addresses = [
+        ("127.0.0.1", options.base_port + p) for p in range(options.players)
+    ]
+    session = netplay.Lockstep(
+        game, player, addresses, delay=options.delay, window=options.window
+    )
+    session.sock = ImpairedSocket(
+        session.sock, options.latency_ms, options.loss, options.seed * 31 + player
+    )
+    session.connect(options.seed, timeout_ms=10000)
+    game.initialize_game()
+
+    # Player 0 dodges, the others wander; only left and right mean anything
+    if player == 0:
+        policy = policies.dodger(options.seed)
+    else:
+        policy = policies.random_walk(options.seed + player)
+
+    while session.tick < options.ticks:
+        emulator.clock.advance(game.update_period)
+        direction = policy(game)
+        if direction not in ("left", "right"):
+            direction = None
+        while not session.advance(direction):
+            _wait(session, 10)
+        session.poll()
+        if options.tick_ms:
+            time.sleep(options.tick_ms / 1000)
+
+    # Wait for the last inputs, then stay around to answer late resends
+    deadline = time.monotonic() + 10
+    while not session.settled() and time.monotonic() < deadline:
+        _wait(session, 20)
+    linger = time.monotonic() + 0.5
+    while time.monotonic() < linger:
+        _wait(session, 20)
+    settled = session.settled()
+    session.close()
+    # Settle the score and rating as Lockstep.run() does before its end screen
+    game.finish()
+
+    state = repr(game.save_state()).encode()
+    return (
+        player,
+        zlib.crc32(state),
+        game.game_over_flag,
+        settled,
+        session.report(),
+        STORE.get(skill_key) == SKILL,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--game", default="Dodge Objects")
+    parser.add_argument("--ticks", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--delay", type=int, default=2, help="input delay in ticks")
+    parser.add_argument("--window", type=int, default=8, help="rollback window in ticks")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--loss", type=float, default=0, help="packet drop probability")
+    parser.add_argument(
+        "--tick-ms", type=float, default=10, help="real milliseconds per tick"
+    )
+    parser.add_argument("--base-port", type=int, default=47000)
+    options = parser.parse_args()
+
+    jobs = [(p, options) for p in range(options.players)]
+    with multiprocessing.Pool(options.players) as pool:
+        results = sorted(pool.map(_player, jobs))
+
+    hashes = set()
+    for player, digest, over, settled, report, skill_kept in results:
+        hashes.add(digest)
+        print(
+            f"player {player}: state={digest:08x} over={over} settled={settled} {report}"
+        )
+    if not all(r[5] for r in results):
+        print("SKILL CHANGED: a netplay match rewrote the stored rating")
+        return 1
+    if len(hashes) == 1 and all(r[3] for r in results):
+        print("in sync")
+        return 0
+    print("DESYNC")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
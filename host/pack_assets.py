@@ -0,0 +1,150 @@
+# pack_assets.py
+"""
+Pack images and level maps into the asset format read by ``src/assets.py``.
+
+PBM images (``.pbm``, plain P1 or raw P4) become bitmaps; set (black) pixels
+are the lit pixels on the OLED unless ``--invert`` is given. Text files
+(``.txt``) become tile maps, one character per cell and one line per row;
+short lines are padded with spaces. The output goes next to each input with
+the extension ``.img`` or ``.map`` unless ``--out`` names a directory.
+
+Example::
+
+    python host/pack_assets.py levels/maze.txt sprites/ship.pbm --out build
+"""
+
+import argparse
+import os
+import struct
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from assets import HEADER_FMT, KIND_BITMAP, KIND_MAP, MAGIC, VERSION  # noqa: E402
+
+
+def encode_runs(data):
+    """
+    :return: `data` as (count, byte) runs of at most 255.
+    """
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        value = data[i]
+        run = 1
+        while i + run < len(data) and run < 255 and data[i + run] == value:
+            run += 1
+        out += bytes((run, value))
+        i += run
+    return bytes(out)
+
+
+def _pbm_tokens(data):
+    """
+    Split a PBM header into tokens, skipping comments.
+
+    :return: Tuple of (magic, width, height, offset of the pixel data).
+    """
+    tokens = []
+    pos = 0
+    while len(tokens) < 3:
+        while data[pos : pos + 1].isspace():
+            pos += 1
+        if data[pos : pos + 1] == b"#":
+            pos = data.index(b"\n", pos)
+            continue
+        start = pos
+        while pos < len(data) and not data[pos : pos + 1].isspace():
+            pos += 1
+        tokens.append(data[start:pos])
+    # Exactly one whitespace byte separates the header from raw pixel data
+    return tokens[0], int(tokens[1]), int(tokens[2]), pos + 1
+
+
+def read_pbm(path):
+    """
+    :return: Tuple of (width, height, rows of 0/1 pixels).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, width, height, pos = _pbm_tokens(data)
+    if magic == b"P1":
+        bits = [int(c) for c in data[pos:].decode() if c in "01"]
+        rows = [bits[y * width : (y + 1) * width] for y in range(height)]
+    elif magic == b"P4":
+        stride = (width + 7) // 8
+        rows = []
+        for y in range(height):
+            line = data[pos + y * stride : pos + (y + 1) * stride]
+            rows.append([(line[x >> 3] >> (7 - (x & 7))) & 1 for x in range(width)])
+    else:
+        raise ValueError(f"{path}: not a PBM image")
+    if len(rows) < height or any(len(row) < width for row in rows):
+        raise ValueError(f"{path}: truncated PBM image")
+    return width, height, rows
+
+
+def pack_bitmap(path, invert=False):
+    width, height, rows = read_pbm(path)
+    pages = (height + 7) // 8
+    # MONO_VLSB: one byte per column per 8-pixel page, bit 0 at the top
+    data = bytearray(width * pages)
+    for y in range(height):
+        for x in range(width):
+            if rows[y][x] != invert:
+                data[(y >> 3) * width + x] |= 1 << (y & 7)
+    header = struct.pack(HEADER_FMT, MAGIC, KIND_BITMAP, VERSION, width, height)
+    return header + encode_runs(data)
+
+
+def pack_map(path):
+    with open(path) as f:
+        lines = [line.rstrip("\r\n") for line in f]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    height = len(lines)
+    width = max(len(line) for line in lines)
+    encoded = [encode_runs(line.ljust(width).encode("ascii")) for line in lines]
+    offset = struct.calcsize(HEADER_FMT) + 2 * height
+    offsets = []
+    for row in encoded:
+        offsets.append(offset)
+        offset += len(row)
+    if offset > 0xFFFF:
+        raise ValueError(f"{path}: map too large")
+    header = struct.pack(HEADER_FMT, MAGIC, KIND_MAP, VERSION, width, height)
+    return header + struct.pack(f"<{height}H", *offsets) + b"".join(encoded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("inputs", nargs="+", metavar="FILE")
+    parser.add_argument("--out", metavar="DIR", help="directory for the assets")
+    parser.add_argument(
+        "--invert", action="store_true", help="light the white pixels of images"
+    )
+    args = parser.parse_args(argv)
+
+    for path in args.inputs:
+        base, ext = os.path.splitext(path)
+        if ext.lower() == ".pbm":
+            data = pack_bitmap(path, args.invert)
+            target = base + ".img"
+        elif ext.lower() == ".txt":
+            data = pack_map(path)
+            target = base + ".map"
+        else:
+            print(f"{path}: unknown input type, skipped")
+            continue
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            target = os.path.join(args.out, os.path.basename(target))
+        with open(target, "wb") as f:
+            f.write(data)
+        print(f"{path} -> {target} ({os.path.getsize(path)} -> {len(data)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
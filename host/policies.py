@@ -0,0 +1,130 @@
+# policies.py
+"""
+Scripted players for headless simulation.
+
+A policy factory takes an integer seed and returns a callable that is asked
+for a move every time the emulated buttons could register a press. The
+callable receives the game instance and returns a direction string for
+``handle_input`` or ``None`` to stay put. Policies only look at the map
+through ``get_cell`` and the game's tile characters, so they work with any
+grid game, including ones larger than the screen.
+"""
+
+from _random import Random
+
+DIRECTIONS = ("left", "right", "up", "down")
+_STEPS = ((0, -1, "left"), (0, 1, "right"), (-1, 0, "up"), (1, 0, "down"))
+
+
+def idle(seed):
+    """
+    Never press anything.
+    """
+    return lambda game: None
+
+
+def random_walk(seed):
+    """
+    Press a random direction, or nothing, each time a press is possible.
+    """
+    rng = Random(seed)
+
+    def policy(game):
+        r = rng.getrandbits(3)
+        return DIRECTIONS[r] if r < 4 else None
+
+    return policy
+
+
+def _first_step(game, start, targets, blocked):
+    """
+    Breadth-first search from ``start`` to the nearest cell holding one of
+    ``targets``. Returns the direction of the first step, or ``None`` when no
+    target is reachable.
+    """
+    get_cell = game.get_cell
+    height = game.map_height
+    width = game.map_width
+    first = {start: None}
+    queue = [start]
+    for y, x in queue:
+        if get_cell(y, x) in targets and (y, x) != start:
+            return first[(y, x)]
+        for dy, dx, name in _STEPS:
+            ny = y + dy
+            nx = x + dx
+            if not (0 < ny < height - 1 and 0 < nx < width - 1):
+                continue
+            if (ny, nx) in first or get_cell(ny, nx) in blocked:
+                continue
+            first[(ny, nx)] = first[(y, x)] or name
+            queue.append((ny, nx))
+    return None
+
+
+def greedy(seed):
+    """
+    Walk the shortest path to the nearest star (if the game has any) and
+    then to the goal, treating walls and zombies as obstacles. Falls back to
+    a random step when boxed in.
+    """
+    fallback = random_walk(seed)
+
+    def policy(game):
+        start = game.player_pos
+        blocked = (game.WALL_CHAR, getattr(game, "ZOMBIE_CHAR", None))
+        star = getattr(game, "STAR_CHAR", None)
+        step = None
+        if star is not None:
+            step = _first_step(game, start, (star,), blocked)
+        if step is None:
+            step = _first_step(game, start, (game.END_CHAR,), blocked)
+        return step or fallback(game)
+
+    return policy
+
+
+def dodger(seed):
+    """
+    Stay under the column whose nearest falling object is furthest away,
+    moving at most one cell per press.
+    """
+
+    def clearance(game, x):
+        y = game.player_pos[0]
+        if not 0 <= x < game.map_width or game.get_cell(y, x) == game.WALL_CHAR:
+            return -1
+        for dy in range(1, y + 1):
+            if game.get_cell(y - dy, x) == game.OBJECT_CHAR:
+                return dy
+        return y + 1
+
+    def policy(game):
+        x = game.player_pos[1]
+        best = clearance(game, x)
+        choice = None
+        for dx, name in ((-1, "left"), (1, "right")):
+            c = clearance(game, x + dx)
+            if c > best:
+                best = c
+                choice = name
+        return choice
+
+    return policy
+
+
+POLICIES = {
+    "idle": idle,
+    "random": random_walk,
+    "greedy": greedy,
+    "dodger": dodger,
+}
+
+
+def default_for(game_class):
+    """
+    Pick the most sensible built-in policy for a game class.
+    """
+    if hasattr(game_class, "OBJECT_CHAR"):
+        return "dodger"
+    return "greedy"
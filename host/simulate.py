@@ -0,0 +1,325 @@
+# simulate.py
+"""
+Headless bulk simulation runner for balancing game parameters.
+
+Plays the games listed in ``GameManager.games`` under the host emulator with
+rendering disabled, driven by a scripted policy from ``policies.py``, across
+many seeds in a process pool. For every combination of swept parameters it
+reports the win rate and the distribution of survival ticks and score.
+
+Example:
+
+    python host/simulate.py --game "Zombie Game" --seeds 2000 \\
+        --param num_zombies=2,3,4 --param zombie_move_period=1000,2000
+
+Time is simulated, not waited for: the virtual clock jumps straight from one
+button poll or timer tick to the next. Button presses are offered to the
+policy at the rate a held button repeats on the device (the game's repeat
+rate rounded up to the next poll of ``Game.run``).
+
+With ``--stream`` the games render after every event and each frame is sent
+to ``viewer.py`` or recorded to a file for it.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import multiprocessing.pool
+import os
+import sys
+
+import emulator
+import policies
+
+# Game.run polls the buttons every 50 ms
+POLL_MS = 50
+
+_games = None
+# Print the difficulty settings every this many ticks, 0 for never
+_trace = 0
+
+
+def trace_line(game, ticks):
+    """
+    Describe where the difficulty controller has taken a game.
+    """
+    parts = [f"  tick {ticks:5d} score {game.score:5d}"]
+    for curve in game.DIFFICULTY:
+        parts.append(f"{curve.attr}={getattr(game, curve.attr)}")
+    if game.difficulty is not None:
+        parts.append(f"entity_cap={game.difficulty.entity_cap}")
+    return " ".join(parts)
+
+
+def load_games():
+    """
+    Install the emulator and return the menu entries keyed by name.
+    """
+    global _games
+    if _games is None:
+        emulator.install()
+        from game_manager import GameManager
+
+        _games = {entry["name"]: entry for entry in GameManager().games}
+    return _games
+
+
+def play(game_name, params, seed, policy_name, max_ticks):
+    """
+    Play one game until it is won, lost or runs out of ticks.
+
+    :param game_name: Name of the game as listed in the menu.
+    :param params: Constructor parameters for the game class.
+    :param seed: Seed for both the game's random source and the policy.
+    :param policy_name: Key into ``policies.POLICIES``.
+    :param max_ticks: Number of update ticks after which the run is stopped.
+    :return: Tuple of (won, ticks survived, final score).
+    """
+    entry = load_games()[game_name]
+    from display_module import Display
+    from game_framework import RENDER_NEVER
+    from randpool import POOL, REFILL_BYTES
+
+    POOL.seed(seed)
+    emulator.clock.reset()
+    game = entry["class"](**params)
+    # Only draw when somebody is watching the frames
+    streaming = Display.stream is not None
+    if not streaming:
+        game.set_render_policy(RENDER_NEVER)
+    game.initialize_game()
+    policy = policies.POLICIES[policy_name](seed)
+
+    # A scripted player acts as often as a held button repeats
+    rate = game.input.repeat_rate
+    input_period = max((rate + POLL_MS - 1) // POLL_MS, 1) * POLL_MS
+    next_input = 0
+    next_tick = game.update_period
+    ticks = 0
+    while ticks < max_ticks and not (game.game_over_flag or game.game_win_flag):
+        if next_input < next_tick:
+            emulator.clock.reset(next_input)
+            # Button polls stand in for the idle time the pool refills in
+            POOL.refill(REFILL_BYTES)
+            direction = policy(game)
+            if direction is not None:
+                game.handle_input(direction)
+            next_input += input_period
+        else:
+            emulator.clock.reset(next_tick)
+            game.tick(game.timer)
+            ticks += 1
+            next_tick += game.update_period
+            if _trace and ticks % _trace == 0:
+                print(trace_line(game, ticks))
+        if streaming:
+            game.present()
+    return game.game_win_flag, ticks, game.score
+
+
+def _play_job(job):
+    index, game_name, params, seed, policy_name, max_ticks = job
+    return (index,) + play(game_name, params, seed, policy_name, max_ticks)
+
+
+def _percentiles(values):
+    values = sorted(values)
+    last = len(values) - 1
+    return tuple(values[int(q * last)] for q in (0.1, 0.5, 0.9))
+
+
+def summarize(results):
+    """
+    Reduce a list of (won, ticks, score) tuples to summary statistics.
+    """
+    n = len(results)
+    ticks = [r[1] for r in results]
+    scores = [r[2] for r in results]
+    return {
+        "runs": n,
+        "win_rate": sum(1 for r in results if r[0]) / n,
+        "ticks_mean": sum(ticks) / n,
+        "ticks_p10_p50_p90": _percentiles(ticks),
+        "score_mean": sum(scores) / n,
+        "score_p10_p50_p90": _percentiles(scores),
+        "score_max": max(scores),
+    }
+
+
+def parse_sweep(specs):
+    """
+    Turn ``name=v1,v2`` arguments into a list of (name, values) pairs.
+    Values that are not integers, such as asset paths, stay strings.
+    """
+    sweep = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if not values:
+            raise ValueError("expected name=value[,value...]: " + spec)
+        values = [int(v) if v.lstrip("-").isdigit() else v for v in values.split(",")]
+        sweep.append((name, values))
+    return sweep
+
+
+def grid(base_params, sweep):
+    """
+    Yield one parameter dict per combination of swept values.
+    """
+    names = [name for name, _ in sweep]
+    for values in itertools.product(*(values for _, values in sweep)):
+        params = dict(base_params)
+        params.update(zip(names, values))
+        yield params
+
+
+def run(game_names, sweep, seeds, first_seed, policy_name, max_ticks, workers):
+    """
+    Simulate every parameter combination of every requested game.
+
+    :return: List of report dicts, one per (game, parameter set).
+    """
+    games = load_games()
+    reports = []
+    jobs = []
+    for game_name in game_names:
+        entry = games[game_name]
+        name = policy_name or policies.default_for(entry["class"])
+        for params in grid(entry["params"], sweep):
+            index = len(reports)
+            reports.append(
+                {"game": game_name, "policy": name, "params": params, "results": []}
+            )
+            for seed in range(first_seed, first_seed + seeds):
+                jobs.append((index, game_name, params, seed, name, max_ticks))
+
+    if workers == 1:
+        outcomes = map(_play_job, jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=load_games)
+        chunksize = max(1, len(jobs) // (workers * 16))
+        outcomes = pool.imap_unordered(_play_job, jobs, chunksize)
+    try:
+        for index, won, ticks, score in outcomes:
+            reports[index]["results"].append((won, ticks, score))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    for report in reports:
+        report["stats"] = summarize(report.pop("results"))
+    return reports
+
+
+def open_stream(target):
+    """
+    Mirror every display flush of this process to a viewer, without a
+    bandwidth cap.
+
+    :param target: Path of a file to record to, or ``udp:HOST:PORT``.
+    """
+    emulator.install()
+    from display_module import Display
+    from stream import FrameStream, UdpSink
+
+    if target.startswith("udp:"):
+        _, host, port = target.split(":")
+        sink = UdpSink(host, int(port))
+    else:
+        sink = open(target, "wb")
+    Display.stream = FrameStream(sink)
+
+
+def print_reports(reports, sweep):
+    swept = [name for name, _ in sweep]
+    current = None
+    for report in reports:
+        if report["game"] != current:
+            current = report["game"]
+            print(f"\n{current} (policy: {report['policy']})")
+            print(
+                f"{'params':<40} {'win%':>6} {'ticks mean':>10} {'p10/p50/p90':>14}"
+                f" {'score mean':>10} {'p10/p50/p90':>14}"
+            )
+        params = report["params"]
+        label = " ".join(f"{n}={params[n]}" for n in swept if n in params) or "defaults"
+        stats = report["stats"]
+        print(
+            f"{label:<40} {stats['win_rate'] * 100:6.1f}"
+            f" {stats['ticks_mean']:10.1f}"
+            f" {'/'.join(str(v) for v in stats['ticks_p10_p50_p90']):>14}"
+            f" {stats['score_mean']:10.1f}"
+            f" {'/'.join(str(v) for v in stats['score_p10_p50_p90']):>14}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--game",
+        action="append",
+        help="Menu name of a game to simulate (repeatable, default: all).",
+    )
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        help="Parameter to sweep as name=v1,v2,... (repeatable).",
+    )
+    parser.add_argument("--seeds", type=int, default=1000)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument(
+        "--policy",
+        choices=sorted(policies.POLICIES),
+        help="Player policy (default: greedy for grid games, dodger for Dodge).",
+    )
+    parser.add_argument("--max-ticks", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", help="Also write the reports to this file.")
+    parser.add_argument(
+        "--stream",
+        help="Render and send every frame to a file or to udp:HOST:PORT for"
+        " viewer.py (runs in one process).",
+    )
+    parser.add_argument(
+        "--trace",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Print the difficulty settings every N ticks (runs in one process).",
+    )
+    args = parser.parse_args(argv)
+
+    games = load_games()
+    game_names = args.game or list(games)
+    for name in game_names:
+        if name not in games:
+            parser.error(f"unknown game {name!r}, choose from {sorted(games)}")
+    sweep = parse_sweep(args.param)
+    if args.stream:
+        open_stream(args.stream)
+        args.workers = 1
+    if args.trace:
+        global _trace
+        _trace = args.trace
+        args.workers = 1
+
+    reports = run(
+        game_names,
+        sweep,
+        args.seeds,
+        args.first_seed,
+        args.policy,
+        args.max_ticks,
+        args.workers,
+    )
+    print_reports(reports, sweep)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+# soak.py
+"""
+Soak test every game under the emulator with random input streams.
+
+Games are played back to back, each with a new seed, until the requested
+number of update ticks has run. Button presses come from a mix of random
+presses and the game's scripted player (``policies.py``), so games are both
+won and lost. Grid games sometimes get a map larger than the screen. Every
+few ticks the game is checked against these invariants:
+
+- exactly one player tile per player, where the player is;
+- every entity's tile is on the map where the entity is, no tile is left
+  over on the map, and chasers agree with the swarm kernel;
+- nothing is written outside the map;
+- the buzzer is silent whenever no sound effect is playing;
+- an update tick takes less than ``--tick-budget-us`` of real time;
+- the interpreter's allocated blocks stop growing once warmed up.
+
+Work is split across processes. The exit status is 1 if any check failed.
+
+Example::
+
+    python host/soak.py --ticks 1000000
+"""
+
+import argparse
+import gc
+import multiprocessing
+import multiprocessing.pool
+import os
+import sys
+import time
+from _random import Random
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import emulator  # noqa: E402
+import policies  # noqa: E402
+
+# Game.run polls the buttons every 50 ms
+POLL_MS = 50
+# Share of games on a grid game that get a scrolling map
+LARGE_MAP_EVERY = 4
+LARGE_MAP = {"map_width": 40, "map_height": 24}
+# Allocated blocks may grow this much past the warm-up level
+HEAP_SLACK_BLOCKS = 2000
+
+
+class InvariantError(AssertionError):
+    pass
+
+
+def _load_games(options=None):
+    emulator.install()
+    if options is not None and options.panel:
+        from display_module import Display
+
+        Display.panel = options.panel
+        if options.hud:
+            Display.hud_panel = (128, 32, 0x3D)
+    from game_manager import GameManager
+
+    return {entry["name"]: entry for entry in GameManager().games}
+
+
+def _guard_writes(game):
+    """
+    Make set_cell() refuse cells outside the map, which a list of rows
+    would otherwise take silently through negative indices.
+    """
+    set_cell = game.set_cell
+
+    def checked(y, x, char):
+        if not (0 <= y < game.map_height and 0 <= x < game.map_width):
+            raise InvariantError(f"write outside the map at ({y}, {x})")
+        set_cell(y, x, char)
+
+    game.set_cell = checked
+
+
+def check(game):
+    """
+    Check the map, players and entities of a running game.
+
+    :raises InvariantError: On the first broken invariant.
+    """
+    from game_framework import CHASE, TILE
+
+    height = game.map_height
+    width = game.map_width
+    get_cell = game.get_cell
+    players = getattr(game, "players", None) or [game.player_pos]
+    player_char = game.PLAYER_CHAR
+
+    # Expected count of each entity tile on the map
+    expected = {player_char: len(players)}
+    for y, x in players:
+        if not (0 <= y < height and 0 <= x < width):
+            raise InvariantError(f"player outside the map at ({y}, {x})")
+        if get_cell(y, x) != player_char:
+            raise InvariantError(f"no player tile at ({y}, {x})")
+
+    entities = game.entities
+    if entities is not None:
+        count = 0
+        for e in range(entities.end):
+            mask = entities.masks[e]
+            if not mask:
+                continue
+            count += 1
+            y = entities.ys[e]
+            x = entities.xs[e]
+            if not (0 <= y < height and 0 <= x < width):
+                raise InvariantError(f"entity {e} outside the map at ({y}, {x})")
+            if not mask & TILE:
+                continue
+            tile = chr(entities.tiles[e])
+            cell = get_cell(y, x)
+            if cell == tile:
+                expected[tile] = expected.get(tile, 0) + 1
+            elif not (mask & CHASE and cell in game.chase.hidden):
+                raise InvariantError(f"entity {e} {tile!r} at ({y}, {x}) shows {cell!r}")
+            expected.setdefault(tile, 0)
+        if count != entities.count:
+            raise InvariantError(f"{count} live entities, count says {entities.count}")
+
+    chase = getattr(game, "chase", None)
+    if chase is not None:
+        swarm = chase.swarm
+        for k in range(swarm.count):
+            e = chase.entity[k]
+            if (entities.ys[e], entities.xs[e]) != (swarm.ys[k], swarm.xs[k]):
+                raise InvariantError(f"chaser {k} and entity {e} disagree")
+
+    from audio import AUDIO
+
+    if not AUDIO.playing and AUDIO.pwm.duty():
+        raise InvariantError("buzzer on with no effect playing")
+
+    found = dict.fromkeys(expected, 0)
+    for y in range(height):
+        for x in range(width):
+            cell = get_cell(y, x)
+            if cell in found:
+                found[cell] += 1
+    if found != expected:
+        raise InvariantError(f"tiles on the map {found}, expected {expected}")
+
+
+def _play(entry, params, seed, max_ticks, options, stats):
+    """
+    Play one game with random inputs, checking it as it goes.
+
+    :return: Number of ticks played.
+    """
+    from game_framework import RENDER_ON_CHANGE
+    from machine import Timer
+    from audio import AUDIO
+    from randpool import POOL, REFILL_BYTES
+
+    POOL.seed(seed)
+    emulator.clock.reset()
+    # The clock starts again, so must the sequencer; keep the fake PWM's
+    # record from growing
+    AUDIO.stop()
+    AUDIO.pwm.timeline.clear()
+    game = entry["class"](**params)
+    game.set_render_policy(RENDER_ON_CHANGE)
+    _guard_writes(game)
+    game.initialize_game()
+    rng = Random(seed)
+    scripted = policies.POLICIES[policies.default_for(entry["class"])](seed)
+    directions = policies.DIRECTIONS
+    budget = options.tick_budget_us
+    tick_us = stats["tick_us"]
+    # Inputs come as often as a held button repeats
+    rate = game.input.repeat_rate
+    input_period = max((rate + POLL_MS - 1) // POLL_MS, 1) * POLL_MS
+
+    ticks = 0
+    now = 0
+    next_tick = game.update_period
+    while ticks < max_ticks and not (game.game_over_flag or game.game_win_flag):
+        if now < next_tick:
+            emulator.clock.reset(now)
+            POOL.refill(REFILL_BYTES)
+            Timer.fire_due()
+            # Mostly random presses, with the scripted player every eighth
+            # poll so that games also get won
+            r = rng.getrandbits(3)
+            if r < 4:
+                game.handle_input(directions[r])
+            elif r == 4:
+                direction = scripted(game)
+                if direction is not None:
+                    game.handle_input(direction)
+            now += input_period
+            continue
+        emulator.clock.reset(next_tick)
+        start = time.perf_counter()
+        game.tick(game.timer)
+        elapsed = int((time.perf_counter() - start) * 1e6)
+        tick_us.append(elapsed)
+        if elapsed > budget:
+            raise InvariantError(f"tick {ticks} took {elapsed} us")
+        ticks += 1
+        next_tick += game.update_period
+        if game.game_over_flag or game.game_win_flag:
+            break
+        if ticks % options.check_every == 0:
+            check(game)
+        if ticks % options.render_every == 0:
+            game.present()
+    stats["wins"] += game.game_win_flag
+    return ticks
+
+
+def _soak_job(job):
+    """
+    Play games of one kind back to back until `ticks` have run.
+
+    :return: Stats dict for the job.
+    """
+    name, first_seed, ticks, options = job
+    entry = _load_games(options)[name]
+    from audio import AUDIO
+
+    AUDIO.enable(15)  # Any pin: the emulated PWM only keeps a timeline
+    stats = {
+        "game": name,
+        "ticks": 0,
+        "games": 0,
+        "wins": 0,
+        "tick_us": [],
+        "failures": [],
+    }
+    grid = hasattr(entry["class"], "generate_chunk")
+    seed = first_seed
+    start = time.perf_counter()
+    warm = None
+    while stats["ticks"] < ticks:
+        params = dict(entry["params"])
+        if grid and seed % LARGE_MAP_EVERY == 0:
+            params.update(LARGE_MAP)
+        try:
+            stats["ticks"] += _play(
+                entry, params, seed, ticks - stats["ticks"], options, stats
+            )
+        except InvariantError as e:
+            stats["failures"].append((seed, params, str(e)))
+            stats["ticks"] += 1
+        stats["games"] += 1
+        seed += 1
+        # Let the first tenth of the run settle caches, then watch for growth
+        if warm is None and stats["ticks"] >= ticks // 10:
+            # Finished games wait in reference cycles for the collector
+            gc.collect()
+            warm = sys.getallocatedblocks()
+    stats["seconds"] = time.perf_counter() - start
+    gc.collect()
+    end = sys.getallocatedblocks()
+    if warm is not None and end - warm > HEAP_SLACK_BLOCKS:
+        stats["failures"].append(
+            (seed, {}, f"allocated blocks grew from {warm} to {end}")
+        )
+    # Keep the job result small: summarize tick times here
+    tick_us = sorted(stats.pop("tick_us")) or [0]
+    last = len(tick_us) - 1
+    stats["tick_us"] = (tick_us[last // 2], tick_us[last * 99 // 100], tick_us[last])
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ticks", type=int, default=100000, help="ticks per game kind")
+    parser.add_argument(
+        "--game",
+        action="append",
+        help="Menu name of a game to soak (repeatable, default: all).",
+    )
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--panel",
+        type=lambda s: tuple(int(v) for v in s.split("x")),
+        help="Playfield panel as WIDTHxHEIGHT, e.g. 128x32 (default: 128x64).",
+    )
+    parser.add_argument(
+        "--hud", action="store_true", help="Add a 128x32 score panel at 0x3D."
+    )
+    parser.add_argument("--check-every", type=int, default=5, metavar="N")
+    parser.add_argument("--render-every", type=int, default=10, metavar="N")
+    parser.add_argument(
+        "--tick-budget-us",
+        type=int,
+        default=20000,
+        help="Real time an update tick may take on this machine.",
+    )
+    options = parser.parse_args(argv)
+
+    games = _load_games()
+    names = options.game or list(games)
+    for name in names:
+        if name not in games:
+            parser.error(f"unknown game {name!r}, choose from {sorted(games)}")
+
+    # Split each game's ticks over the workers, with disjoint seed ranges
+    jobs = []
+    share = max(options.ticks // options.workers, 1)
+    for name in names:
+        done = 0
+        part = 0
+        while done < options.ticks:
+            n = min(share, options.ticks - done)
+            seed = options.first_seed + part * 1000003
+            jobs.append((name, seed, n, options))
+            done += n
+            part += 1
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(options.workers) as pool:
+        results = pool.map(_soak_job, jobs, chunksize=1)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{'game':<16} {'ticks':>9} {'games':>7} {'win%':>6}"
+        f" {'ticks/s':>9} {'tick us p50/p99/max':>20} {'failures':>8}"
+    )
+    failed = False
+    for name in names:
+        mine = [r for r in results if r["game"] == name]
+        ticks = sum(r["ticks"] for r in mine)
+        played = sum(r["games"] for r in mine)
+        wins = sum(r["wins"] for r in mine)
+        cpu = sum(r["seconds"] for r in mine)
+        p50 = max(r["tick_us"][0] for r in mine)
+        p99 = max(r["tick_us"][1] for r in mine)
+        worst = max(r["tick_us"][2] for r in mine)
+        failures = [f for r in mine for f in r["failures"]]
+        print(
+            f"{name:<16} {ticks:9d} {played:7d} {wins * 100 / max(played, 1):6.1f}"
+            f" {ticks / max(cpu, 1e-9):9.0f} {f'{p50}/{p99}/{worst}':>20}"
+            f" {len(failures):8d}"
+        )
+        for seed, params, message in failures[:5]:
+            print(f"  seed {seed} {params}: {message}")
+        failed = failed or bool(failures)
+    print(f"{elapsed:.1f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
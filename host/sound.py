@@ -0,0 +1,167 @@
+# sound.py
+"""
+Play the arcade's sound effects on the emulator and print the note timeline
+the buzzer would follow, optionally rendered to a WAV file of square waves.
+
+Effects are named as in ``audio.py``, or a whole game is played by its
+scripted player with sound on:
+
+    python host/sound.py star crash star --wav fx.wav
+    python host/sound.py --game "Dodge Objects" --seed 3
+
+The sequencer's timer fires from the emulator's virtual clock, so the
+timeline shows exactly when each note would start and stop.
+"""
+
+import argparse
+import multiprocessing.pool  # noqa: F401  (before src/random.py shadows random)
+import os
+import struct
+import sys
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import emulator  # noqa: E402
+import policies  # noqa: E402
+
+# Game.run polls the buttons every 50 ms
+POLL_MS = 50
+# Sample rate and amplitude of the rendered WAV
+RATE = 22050
+AMPLITUDE = 8000
+
+
+def _advance(until):
+    """
+    Move the virtual clock to `until`, firing every timer due on the way
+    at its own deadline.
+    """
+    import time
+    from machine import Timer
+
+    while True:
+        deadline = Timer.next_deadline()
+        if deadline is None or time.ticks_diff(deadline, until) > 0:
+            break
+        emulator.clock.reset(deadline)
+        Timer.fire_due()
+    emulator.clock.reset(until)
+
+
+def _drain():
+    """
+    Let the queued effects play out.
+    """
+    from machine import Timer
+
+    deadline = Timer.next_deadline()
+    while deadline is not None:
+        _advance(deadline)
+        deadline = Timer.next_deadline()
+
+
+def play_effects(names, gap_ms):
+    import audio
+
+    t = 0
+    for name in names:
+        audio.AUDIO.play(getattr(audio, name.upper()))
+        t += gap_ms
+        _advance(t)
+    _drain()
+
+
+def play_game(name, seed, max_ticks):
+    from game_manager import GameManager
+    from randpool import POOL
+
+    entry = {e["name"]: e for e in GameManager().games}[name]
+    POOL.seed(seed)
+    game = entry["class"](**entry["params"])
+    game.initialize_game()
+    policy = policies.POLICIES[policies.default_for(entry["class"])](seed)
+    now = 0
+    next_tick = game.update_period
+    ticks = 0
+    while ticks < max_ticks and not (game.game_over_flag or game.game_win_flag):
+        if now < next_tick:
+            _advance(now)
+            direction = policy(game)
+            if direction is not None:
+                game.handle_input(direction)
+            now += POLL_MS
+        else:
+            _advance(next_tick)
+            game.tick(game.timer)
+            ticks += 1
+            next_tick += game.update_period
+    _drain()
+    print(f"{name} seed {seed}: {ticks} ticks, score {game.score}")
+
+
+def notes(timeline):
+    """
+    Turn the PWM timeline into (start ms, length ms, Hz) notes.
+    """
+    result = []
+    start = None
+    freq = 0
+    for t, f, duty in timeline:
+        if start is not None and t > start:
+            result.append((start, t - start, freq))
+        start = t if duty else None
+        freq = f
+    return result
+
+
+def write_wav(path, played):
+    end = max(start + length for start, length, _ in played)
+    samples = bytearray(2 * (end * RATE // 1000 + 1))
+    for start, length, freq in played:
+        half = RATE / (2 * freq)
+        first = start * RATE // 1000
+        for i in range(length * RATE // 1000):
+            level = AMPLITUDE if int(i / half) % 2 == 0 else -AMPLITUDE
+            struct.pack_into("<h", samples, 2 * (first + i), level)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("effects", nargs="*", help="Effects to play, e.g. star crash.")
+    parser.add_argument("--gap-ms", type=int, default=100, help="Between effects.")
+    parser.add_argument("--game", help="Menu name of a game to play with sound.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=1000)
+    parser.add_argument("--wav", help="Also render the notes to this WAV file.")
+    args = parser.parse_args(argv)
+    if not args.effects and not args.game:
+        parser.error("name some effects or a --game")
+
+    emulator.install()
+    emulator.clock.reset()
+    from audio import AUDIO
+
+    AUDIO.enable(15)  # Any pin: the emulated PWM only keeps a timeline
+    if args.game:
+        play_game(args.game, args.seed, args.max_ticks)
+    else:
+        play_effects(args.effects, args.gap_ms)
+
+    played = notes(AUDIO.pwm.timeline)
+    for start, length, freq in played:
+        print(f"{start:7d} ms {length:5d} ms {freq:5d} Hz")
+    if AUDIO.dropped:
+        print(f"{AUDIO.dropped} effects dropped, queue full")
+    if args.wav and played:
+        write_wav(args.wav, played)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
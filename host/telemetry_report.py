@@ -0,0 +1,234 @@
+# telemetry_report.py
+"""
+Aggregate the telemetry of many devices from their serial logs.
+
+Each device enabled with ``TELEMETRY_TO`` in ``boot.py`` prints ``TLM:``
+lines (or appends them to a file on its flash) holding binary records from
+``telemetry.py``: sessions with their score and heap low-water mark, frame
+times and the time from a button press to the frame showing it. This reads
+any number of logs, which may mix devices and ordinary output, and reports
+per game and per device.
+
+Examples:
+
+    python host/telemetry_report.py logs/*.log
+    python host/telemetry_report.py /dev/ttyUSB0 --json fleet.json
+"""
+
+import argparse
+import binascii
+import json
+import struct
+import sys
+
+import emulator
+
+emulator.install()
+
+from telemetry import (  # noqa: E402
+    BOOT,
+    ERROR,
+    FRAMES,
+    INPUT,
+    LOST,
+    NO_GAME,
+    PREFIX,
+    RECORD_FMT,
+    RECORD_SIZE,
+    START,
+    WON,
+)
+
+
+def game_names():
+    """
+    Menu names by index, as GameManager lists them in this tree.
+    """
+    from game_manager import GameManager
+
+    return [entry["name"] for entry in GameManager().games]
+
+
+def read_records(paths):
+    """
+    Yield (device, record tuple) for every record in the logs, in order.
+    """
+    prefix = PREFIX.encode()
+    for path in paths:
+        with open(path, "rb") if path != "-" else sys.stdin.buffer as f:
+            for line in f:
+                start = line.find(prefix)
+                if start < 0:
+                    continue
+                device, _, data = line[start + len(prefix) :].partition(b":")
+                try:
+                    data = binascii.a2b_base64(data)
+                except binascii.Error:
+                    continue
+                device = device.decode()
+                for pos in range(0, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+                    yield device, struct.unpack_from(RECORD_FMT, data, pos)
+
+
+def _device():
+    return {
+        "boots": 0,
+        "starts": 0,
+        "sessions": 0,
+        "errors": 0,
+        "lost_records": 0,
+        "heap_low": None,
+        "busy_max_us": 0,
+        "last_seq": None,
+    }
+
+
+def _game():
+    return {
+        "sessions": 0,
+        "wins": 0,
+        "scores": [],
+        "ticks": [],
+        "heap_lows": [],
+        "frames": 0,
+        "busy_total": 0,
+        "busy_maxes": [],
+        "presses": 0,
+        "latency_total": 0,
+        "latency_max": 0,
+    }
+
+
+def aggregate(records):
+    """
+    Fold records into per-device and per-game statistics.
+
+    :return: Tuple of (devices, games) dicts; games are keyed by menu index.
+    """
+    devices = {}
+    games = {}
+    for device_id, record in records:
+        kind, game, seq, _, a, b, c = record
+        device = devices.get(device_id)
+        if device is None:
+            device = devices[device_id] = _device()
+        last = device["last_seq"]
+        if last is not None:
+            device["lost_records"] += (seq - last - 1) & 0xFFFF
+        device["last_seq"] = seq
+        stats = games.get(game)
+        if stats is None and game != NO_GAME:
+            stats = games[game] = _game()
+
+        if kind == BOOT:
+            device["boots"] += 1
+        elif kind == ERROR:
+            device["errors"] += 1
+        elif kind == START:
+            device["starts"] += 1
+        elif kind == FRAMES and stats is not None:
+            stats["frames"] += a
+            stats["busy_total"] += a * b
+            stats["busy_maxes"].append(c)
+            device["busy_max_us"] = max(device["busy_max_us"], c)
+        elif kind == INPUT and stats is not None:
+            stats["presses"] += a
+            stats["latency_total"] += a * b
+            stats["latency_max"] = max(stats["latency_max"], c)
+        elif kind in (LOST, WON) and stats is not None:
+            device["sessions"] += 1
+            stats["sessions"] += 1
+            stats["wins"] += kind == WON
+            stats["scores"].append(a)
+            stats["ticks"].append(b)
+            stats["heap_lows"].append(c)
+            if device["heap_low"] is None or c < device["heap_low"]:
+                device["heap_low"] = c
+    return devices, games
+
+
+def _pct(values, q):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def summarize(games, names):
+    rows = []
+    for index in sorted(games):
+        stats = games[index]
+        n = stats["sessions"]
+        frames = stats["frames"]
+        presses = stats["presses"]
+        rows.append(
+            {
+                "game": names[index] if index < len(names) else f"#{index}",
+                "sessions": n,
+                "win_rate": stats["wins"] / n if n else 0,
+                "score_mean": sum(stats["scores"]) / n if n else 0,
+                "score_max": max(stats["scores"], default=0),
+                "ticks_mean": sum(stats["ticks"]) / n if n else 0,
+                "busy_avg_us": stats["busy_total"] // frames if frames else 0,
+                "busy_p99_us": _pct(stats["busy_maxes"], 0.99),
+                "busy_max_us": max(stats["busy_maxes"], default=0),
+                "latency_avg_us": stats["latency_total"] // presses if presses else 0,
+                "latency_max_us": stats["latency_max"],
+                "heap_low_p10": _pct(stats["heap_lows"], 0.1),
+                "heap_low_min": min(stats["heap_lows"], default=0),
+            }
+        )
+    return rows
+
+
+def _join(row, *keys):
+    return "/".join(str(row[key]) for key in keys)
+
+
+def print_report(devices, rows):
+    print(
+        f"{'game':<16} {'sessions':>8} {'win%':>6} {'score':>7} {'max':>5}"
+        f" {'frame us avg/p99/max':>21} {'input us avg/max':>17}"
+        f" {'heap low p10/min':>17}"
+    )
+    for row in rows:
+        print(
+            f"{row['game']:<16} {row['sessions']:8d} {row['win_rate'] * 100:6.1f}"
+            f" {row['score_mean']:7.1f} {row['score_max']:5d}"
+            f" {_join(row, 'busy_avg_us', 'busy_p99_us', 'busy_max_us'):>21}"
+            f" {_join(row, 'latency_avg_us', 'latency_max_us'):>17}"
+            f" {_join(row, 'heap_low_p10', 'heap_low_min'):>17}"
+        )
+    print()
+    print(
+        f"{'device':<16} {'boots':>5} {'sessions':>8} {'unended':>7} {'errors':>6}"
+        f" {'lost':>5} {'heap low':>8} {'frame max us':>12}"
+    )
+    for device_id in sorted(devices):
+        d = devices[device_id]
+        print(
+            f"{device_id:<16} {d['boots']:5d} {d['sessions']:8d}"
+            f" {d['starts'] - d['sessions']:7d} {d['errors']:6d}"
+            f" {d['lost_records']:5d} {d['heap_low'] or 0:8d} {d['busy_max_us']:12d}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("logs", nargs="+", help="Serial logs or devices, - for stdin.")
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args(argv)
+
+    devices, games = aggregate(read_records(args.logs))
+    rows = summarize(games, game_names())
+    print_report(devices, rows)
+    if args.json:
+        for d in devices.values():
+            del d["last_seq"]
+        with open(args.json, "w") as f:
+            json.dump({"games": rows, "devices": devices}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
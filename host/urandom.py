@@ -0,0 +1,23 @@
+# urandom.py
+"""
+Host emulation of the MicroPython ``urandom`` module.
+
+Like the ESP8266 port, only ``seed`` and ``getrandbits`` (up to 32 bits) are
+provided; ``src/random.py`` builds everything else on top of them. The
+generator comes from CPython's ``_random`` so that importing this module never
+pulls in the standard library ``random`` that ``src/random.py`` shadows.
+"""
+
+import _random
+
+_rng = _random.Random()
+
+
+def seed(n=None):
+    _rng.seed(n)
+
+
+def getrandbits(bits):
+    if not 0 < bits <= 32:
+        raise ValueError("bits must be 32 or less")
+    return _rng.getrandbits(bits)
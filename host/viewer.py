@@ -0,0 +1,181 @@
+# viewer.py
+"""
+Watch and record the display stream sent by ``stream.FrameStream``.
+
+Frames come from UDP (a device or ``simulate.py --stream udp:...``), from a
+recording made with ``--record`` or ``simulate.py --stream FILE``, or from a
+serial console log where each frame is a base64 ``FB:`` line. Frames are
+drawn in the terminal with half-block characters, two pixel rows per line.
+
+Examples:
+
+    python host/viewer.py --udp 5005 --record session.fb
+    python host/viewer.py --file session.fb --every 10
+    python host/viewer.py --serial /dev/ttyUSB0
+"""
+
+import argparse
+import binascii
+import os
+import socket
+import struct
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from stream import (  # noqa: E402
+    HEADER_FMT,
+    HEADER_SIZE,
+    MAGIC,
+    PAGE_FMT,
+    PAGE_HEADER,
+    rle_decode,
+)
+
+_BLOCKS = (" ", "▀", "▄", "█")
+
+
+class Decoder:
+    def __init__(self):
+        self.width = 0
+        self.pages = 0
+        self.buffer = bytearray()
+        self.frames = 0
+        self.lost = 0
+        self.bytes = 0
+        self.seq = None
+
+    def apply(self, packet):
+        """
+        Apply one packet to the frame buffer.
+
+        :return: False if the packet is not a frame.
+        """
+        if len(packet) < HEADER_SIZE or packet[:2] != MAGIC:
+            return False
+        _, seq, length, width, pages, count = struct.unpack_from(HEADER_FMT, packet)
+        if len(packet) < length:
+            return False
+        if width != self.width or pages != self.pages:
+            self.width = width
+            self.pages = pages
+            self.buffer = bytearray(width * pages)
+        if self.seq is not None:
+            self.lost += (seq - self.seq - 1) & 0xFFFF
+        self.seq = seq
+        pos = HEADER_SIZE
+        for _ in range(count):
+            page, size = struct.unpack_from(PAGE_FMT, packet, pos)
+            pos += PAGE_HEADER
+            rle_decode(packet, pos, size, self.buffer, page * width)
+            pos += size
+        self.frames += 1
+        self.bytes += length
+        return True
+
+    def pixel(self, x, y):
+        return (self.buffer[(y >> 3) * self.width + x] >> (y & 7)) & 1
+
+    def text(self):
+        """
+        Render the frame buffer as text, two pixel rows per line.
+        """
+        lines = []
+        for y in range(0, self.pages * 8, 2):
+            lines.append(
+                "".join(
+                    _BLOCKS[self.pixel(x, y) | self.pixel(x, y + 1) << 1]
+                    for x in range(self.width)
+                )
+            )
+        return "\n".join(lines)
+
+
+def udp_packets(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("0.0.0.0", port))
+    while True:
+        yield sock.recv(65536)
+
+
+def file_packets(path):
+    """
+    Split a recording, a plain concatenation of packets, using the length
+    field of each header.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while pos + HEADER_SIZE <= len(data):
+        length = struct.unpack_from(HEADER_FMT, data, pos)[2]
+        if data[pos : pos + 2] != MAGIC or length < HEADER_SIZE:
+            break
+        yield data[pos : pos + length]
+        pos += length
+
+
+def serial_packets(path):
+    with open(path, "rb") if path != "-" else sys.stdin.buffer as f:
+        for line in f:
+            if line.startswith(b"FB:"):
+                try:
+                    yield binascii.a2b_base64(line[3:])
+                except binascii.Error:
+                    continue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--udp", type=int, metavar="PORT")
+    source.add_argument("--file", metavar="PATH")
+    source.add_argument(
+        "--serial", metavar="PATH", help="serial log or device, - for stdin"
+    )
+    parser.add_argument(
+        "--record", metavar="PATH", help="append the packets to a file"
+    )
+    parser.add_argument(
+        "--every", type=int, default=1, help="draw every Nth frame, 0 to never draw"
+    )
+    parser.add_argument("--fps", type=float, default=0, help="limit playback speed")
+    args = parser.parse_args(argv)
+
+    if args.udp is not None:
+        packets = udp_packets(args.udp)
+    elif args.file:
+        packets = file_packets(args.file)
+    else:
+        packets = serial_packets(args.serial)
+    record = open(args.record, "ab") if args.record else None
+    decoder = Decoder()
+    start = time.monotonic()
+    try:
+        for packet in packets:
+            if not decoder.apply(packet):
+                continue
+            if record is not None:
+                record.write(packet)
+            if args.every and decoder.frames % args.every == 0:
+                sys.stdout.write("\x1b[H\x1b[2J" + decoder.text() + "\n")
+                sys.stdout.write(f"frame {decoder.frames} seq {decoder.seq}\n")
+                sys.stdout.flush()
+            if args.fps:
+                time.sleep(1 / args.fps)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if record is not None:
+            record.close()
+    elapsed = time.monotonic() - start
+    print(
+        f"{decoder.frames} frames, {decoder.lost} lost, {decoder.bytes} bytes"
+        f" ({decoder.bytes // max(decoder.frames, 1)} per frame),"
+        f" {decoder.frames / max(elapsed, 1e-6):.0f} frames/s"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
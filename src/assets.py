@@ -0,0 +1,200 @@
+# assets.py
+
+import struct
+from memory import heap_bytes
+
+# File header: magic, kind, version, width, height
+HEADER_FMT = "<2sBBHH"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+MAGIC = b"AS"
+VERSION = 1
+# 1-bit image in MONO_VLSB layout, the whole payload is one stream of runs
+KIND_BITMAP = 1
+# Grid of tile characters; a table of row offsets (uint16 each) follows the
+# header and every row is its own stream of runs, so rows can be read alone
+KIND_MAP = 2
+# Bytes read from flash at a time
+READ_SIZE = 64
+
+
+class AssetError(ValueError):
+    pass
+
+
+class _Runs:
+    def __init__(self, f):
+        """
+        Read (count, byte) runs from a file through a small fixed buffer.
+        """
+        self.f = f
+        self.buf = bytearray(READ_SIZE)
+        self.pos = 0
+        self.end = 0
+
+    def seek(self, offset):
+        self.f.seek(offset)
+        self.pos = 0
+        self.end = 0
+
+    def next(self):
+        """
+        :return: Tuple of (count, byte) for the next run.
+        """
+        if self.pos + 2 > self.end:
+            # Keep a half-read run, then refill the rest of the buffer
+            left = self.end - self.pos
+            if left:
+                self.buf[0] = self.buf[self.pos]
+            n = self.f.readinto(memoryview(self.buf)[left:])
+            self.pos = 0
+            self.end = left + (n or 0)
+            if self.end < 2:
+                raise AssetError("truncated asset")
+        pos = self.pos
+        self.pos = pos + 2
+        return self.buf[pos], self.buf[pos + 1]
+
+
+def _read_header(f, kind):
+    header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE:
+        raise AssetError("truncated asset")
+    magic, found, version, width, height = struct.unpack(HEADER_FMT, header)
+    if magic != MAGIC or version != VERSION:
+        raise AssetError("not an asset file")
+    if found != kind:
+        raise AssetError("wrong asset kind")
+    return width, height
+
+
+def load_bitmap(path, buf=None, offset=0):
+    """
+    Decode a bitmap asset into a MONO_VLSB buffer, ready for Canvas.blit()
+    or framebuf.FrameBuffer(buf, width, height, framebuf.MONO_VLSB).
+
+    :param path: Path of the asset file.
+    :param buf: Buffer to decode into, e.g. the display's own buffer for a
+        full-screen image. A new bytearray is made when None.
+    :param offset: Index in `buf` where the image starts.
+    :return: Tuple of (buffer, width, height).
+    """
+    with open(path, "rb") as f:
+        width, height = _read_header(f, KIND_BITMAP)
+        size = width * ((height + 7) >> 3)
+        if buf is None:
+            buf = bytearray(size)
+        elif offset + size > len(buf):
+            raise AssetError("bitmap does not fit the buffer")
+        runs = _Runs(f)
+        i = offset
+        end = offset + size
+        while i < end:
+            count, value = runs.next()
+            if i + count > end:
+                raise AssetError("corrupt bitmap")
+            for j in range(i, i + count):
+                buf[j] = value
+            i += count
+    return buf, width, height
+
+
+class TileMap:
+    def __init__(self, path, markers="", fill=" "):
+        """
+        Tile map asset read row by row from flash. Only the row offset
+        table stays in RAM; the file stays open until close().
+
+        :param path: Path of the asset file.
+        :param markers: Tile characters that mark positions, such as the
+            player start. They read as `fill` and are found with positions().
+        :param fill: Tile character for markers and for cells past the
+            edges of the map.
+        """
+        self.f = open(path, "rb")
+        try:
+            self.width, self.height = _read_header(self.f, KIND_MAP)
+            self.offsets = struct.unpack(
+                "<%dH" % self.height, self.f.read(2 * self.height)
+            )
+        except (AssetError, struct.error):
+            self.f.close()
+            raise AssetError("bad tile map")
+        self.runs = _Runs(self.f)
+        self.markers = bytes(markers, "ascii")
+        self.fill = ord(fill)
+        self.row = bytearray(self.width)
+
+    @staticmethod
+    def budget(width, height):
+        """
+        Heap taken by an open TileMap of this size: the row offsets, the
+        row buffer and the read buffer.
+        """
+        return heap_bytes(4 * height) + heap_bytes(width) + heap_bytes(READ_SIZE)
+
+    def read_row(self, y, dst, start=0, x=0, count=None, raw=False):
+        """
+        Decode cells [x, x + count) of row `y` into dst[start:] as tile codes.
+        Cells past the right edge read as the fill tile.
+
+        :param raw: Keep the markers instead of reading them as fill.
+        """
+        if count is None:
+            count = self.width - x
+        end = x + count
+        runs = self.runs
+        runs.seek(self.offsets[y])
+        markers = b"" if raw else self.markers
+        fill = self.fill
+        cell = 0
+        while cell < end and cell < self.width:
+            n, value = runs.next()
+            if value in markers:
+                value = fill
+            lo = max(cell, x)
+            hi = min(cell + n, end)
+            for i in range(lo, hi):
+                dst[start + i - x] = value
+            cell += n
+        for i in range(max(cell, x), end):
+            dst[start + i - x] = fill
+
+    def positions(self, char):
+        """
+        :return: List of (y, x) of every cell holding `char` in the file.
+        """
+        code = ord(char)
+        row = self.row
+        found = []
+        for y in range(self.height):
+            self.read_row(y, row, raw=True)
+            for x in range(self.width):
+                if row[x] == code:
+                    found.append((y, x))
+        return found
+
+    def load(self, game_map):
+        """
+        Fill a list-of-rows game map (as in Game.game_map) with the tiles.
+        """
+        for y in range(self.height):
+            self.read_row(y, self.row)
+            line = game_map[y]
+            for x in range(self.width):
+                line[x] = chr(self.row[x])
+
+    def read_block(self, block_y, block_x, dst, size):
+        """
+        Decode a square of size x size cells, row by row, into dst. Serves
+        as a ChunkedMap generator with size=CHUNK_SIZE.
+        """
+        for row in range(size):
+            y = block_y * size + row
+            if y < self.height:
+                self.read_row(y, dst, row * size, block_x * size, size)
+            else:
+                for i in range(row * size, row * size + size):
+                    dst[i] = self.fill
+
+    def close(self):
+        self.f.close()
@@ -0,0 +1,132 @@
+# audio.py
+
+from array import array
+from machine import Pin, PWM, Timer
+
+# Half the PWM period high: the loudest square wave a passive buzzer gives
+DUTY = 512
+# Effects waiting to play; more are dropped
+QUEUE_SIZE = 4
+
+# Effects, as indices into EFFECTS
+STAR = 0
+CRASH = 1
+
+# Note tables: pairs of frequency in Hz (0 for a rest) and length in ms.
+# ESP8266 PWM tops out at 1 kHz.
+EFFECTS = (
+    # Rising arpeggio for a pickup
+    array("H", (523, 40, 659, 40, 784, 60)),
+    # Falling buzz for a collision
+    array("H", (220, 80, 0, 20, 165, 80, 0, 20, 110, 160)),
+)
+
+
+class Audio:
+    def __init__(self):
+        """
+        Sound effects on a buzzer, played in the background.
+
+        play() queues an effect; the notes are stepped by the sequencer's
+        own one-shot Timer, separate from the game's update timer, so a
+        game never waits for a sound. Stepping reads the preallocated note
+        tables and allocates nothing.
+
+        Instrumented code may call play() while audio is disabled, which
+        costs one attribute lookup.
+        """
+        self.enabled = False
+        self.pwm = None
+        self.timer = None
+        self.queue = bytearray(QUEUE_SIZE)
+        self.head = 0
+        self.tail = 0
+        self.notes = None
+        self.index = 0
+        self.playing = False
+        self.dropped = 0
+        # Bound once, so that restarting the timer does not allocate
+        self._callback = self._step
+
+    def enable(self, pin):
+        """
+        Set up the buzzer PWM and the sequencer timer.
+
+        :param pin: GPIO of the buzzer, BUZZER_PIN in boot.py.
+        """
+        if self.pwm is None:
+            self.pwm = PWM(Pin(pin), freq=440, duty=0)
+            self.timer = Timer(-1)
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stop the current effect, clear the queue and silence the buzzer.
+        """
+        self.enabled = False
+        self.stop()
+
+    def stop(self):
+        """
+        Silence the buzzer and forget the queued effects.
+        """
+        if self.timer is not None:
+            self.timer.deinit()
+            self.pwm.duty(0)
+        self.head = self.tail = 0
+        self.notes = None
+        self.playing = False
+
+    def play(self, effect):
+        """
+        Queue an effect, starting it right away if nothing is playing.
+
+        :param effect: Index into EFFECTS, e.g. STAR.
+        """
+        if not self.enabled:
+            return
+        tail = self.tail
+        nxt = (tail + 1) % QUEUE_SIZE
+        if nxt == self.head:
+            self.dropped += 1
+            return
+        self.queue[tail] = effect
+        # Queue before checking `playing`: a sequencer step that finishes
+        # in between still finds the effect
+        self.tail = nxt
+        if not self.playing:
+            self.playing = True
+            self._step(None)
+
+    def _step(self, timer):
+        """
+        Start the next note, or the next queued effect. Runs from the
+        sequencer timer.
+        """
+        notes = self.notes
+        i = self.index
+        if notes is None or i >= len(notes):
+            head = self.head
+            if head == self.tail:
+                self.pwm.duty(0)
+                self.notes = None
+                self.playing = False
+                return
+            notes = EFFECTS[self.queue[head]]
+            self.notes = notes
+            self.head = (head + 1) % QUEUE_SIZE
+            i = 0
+        freq = notes[i]
+        if freq:
+            self.pwm.freq(freq)
+            self.pwm.duty(DUTY)
+        else:
+            self.pwm.duty(0)
+        self.index = i + 2
+        self.timer.init(
+            period=notes[i + 1], mode=Timer.ONE_SHOT, callback=self._callback
+        )
+
+
+# Shared instance, enabled from boot.py when BUZZER_PIN is set
+AUDIO = Audio()
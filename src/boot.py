@@ -1,9 +1,51 @@
 # boot.py
 
 from game_manager import GameManager
+from profiler import PROFILER
+from display_module import Display
+from audio import AUDIO
+from telemetry import TELEMETRY
+
+# Print per-phase timings over serial every few seconds
+PROFILE = False
+# Also overlay the worst timings and lowest free heap on the OLED
+PROFILE_HUD = False
+# Size of the playfield panel: (128, 64), (128, 32) or (64, 48)
+PANEL = (128, 64)
+# Second panel for the score on the same I2C bus, as (width, height,
+# address), e.g. (128, 32, 0x3D); None draws the score on the playfield
+HUD = None
+# GPIO of a passive buzzer for sound effects, e.g. 15 (the display and
+# buttons use 4, 5, 0, 12, 13 and 14); None if there is none
+BUZZER_PIN = None
+# Mirror the display to a host viewer (host/viewer.py): None, "serial",
+# or ("host", port) for UDP once the network is up
+STREAM = None
+# Bandwidth cap for the mirror in bytes per second
+STREAM_RATE = 8000
+# Session telemetry for host/telemetry_report.py: None, "serial", or a file path
+TELEMETRY_TO = None
 
 
 def main():
+    if PROFILE:
+        PROFILER.enable(hud=PROFILE_HUD)
+    if BUZZER_PIN is not None:
+        AUDIO.enable(BUZZER_PIN)
+    Display.panel = PANEL
+    Display.hud_panel = HUD
+    if STREAM is not None:
+        from stream import FrameStream, SerialSink, UdpSink
+
+        sink = SerialSink() if STREAM == "serial" else UdpSink(*STREAM)
+        Display.stream = FrameStream(sink, *PANEL, max_rate=STREAM_RATE)
+
+    if TELEMETRY_TO == "serial":
+        import sys
+
+        TELEMETRY.enable(sys.stdout)
+    elif TELEMETRY_TO is not None:
+        TELEMETRY.enable(open(TELEMETRY_TO, "a"))
 
     # Entry point, initializes and runs the Game Manager
     manager = GameManager()
@@ -0,0 +1,145 @@
+# difficulty.py
+
+from power import FRAME_MS
+from store import STORE
+
+# What a curve's progress is measured in
+TICKS = 0
+SCORE = 1
+# An update tick longer than this delays the next frame noticeably
+TICK_BUDGET_US = FRAME_MS * 1000 // 2
+# Consecutive slow ticks before the entity cap is lowered
+SLOW_TICKS = 3
+# Consecutive ticks under half the budget before the cap is raised again
+FAST_TICKS = 50
+# Entity caps never go below this, and start at ENTITY_CAP_MAX (no cap)
+ENTITY_CAP_MIN = 2
+ENTITY_CAP_MAX = 255
+# Skill ratings run from 0 to this; each point starts the curves one stage on
+RATING_MAX = 5
+
+
+class Curve:
+    def __init__(self, attr, step, every, limit, by=TICKS):
+        """
+        One game attribute that changes in stages as the game goes on.
+
+        :param attr: Name of the game attribute, e.g. "update_period".
+        :param step: Change per stage, negative to decrease.
+        :param every: Ticks or score points per stage.
+        :param limit: Value the attribute never goes past.
+        :param by: TICKS or SCORE.
+        """
+        self.attr = attr
+        self.step = step
+        self.every = every
+        self.limit = limit
+        self.by = by
+
+    def value(self, base, progress, offset=0):
+        """
+        :param base: Value of the attribute at the start of the game.
+        :param progress: Ticks or score so far.
+        :param offset: Stages to add, from the player's skill rating.
+        :return: Value of the attribute at that point.
+        """
+        value = base + self.step * (progress // self.every + offset)
+        if self.step < 0:
+            return max(value, self.limit)
+        return min(value, self.limit)
+
+
+class Difficulty:
+    def __init__(self, name, curves, survival_ticks):
+        """
+        Make a game harder as it goes on, and lighter on slow devices.
+
+        The curves move game attributes in stages from the values the game
+        started with. The player's skill rating, kept in the store, starts
+        good players some stages further on: it rises after a win or a game
+        that lasted `survival_ticks`, and falls after a game that ended in
+        under a quarter of that. Update ticks that run over TICK_BUDGET_US
+        lower `entity_cap`, which games check before adding entities.
+
+        Networked games skip the rating and the cap, which differ between
+        devices, so that all peers play the same game.
+
+        :param name: Name of the game, for the stored rating.
+        :param curves: Tuple of Curve.
+        :param survival_ticks: Ticks a player must last to count as coping.
+        """
+        self.key = "skill:" + name
+        self.curves = curves
+        self.survival_ticks = survival_ticks
+        self.bases = None
+        self.rating = 0
+        # Set by start(); a game whose ticks never reached it, such as a
+        # netplay match stepped by Lockstep, must not touch the rating
+        self.adaptive = False
+        self.entity_cap = ENTITY_CAP_MAX
+        self.slow_ticks = 0
+        self.fast_ticks = 0
+
+    def start(self, game):
+        """
+        Remember the starting values of the curve attributes.
+        """
+        self.bases = [getattr(game, curve.attr) for curve in self.curves]
+        self.adaptive = game.rng is None
+        if self.adaptive:
+            self.rating = STORE.get(self.key, 0)
+
+    def update(self, game, elapsed_us):
+        """
+        Move the curve attributes on and check the cost of the last tick.
+        Called by Game.tick() after every update.
+
+        :param elapsed_us: Time the update took in microseconds.
+        """
+        if self.bases is None:
+            self.start(game)
+        for i in range(len(self.curves)):
+            curve = self.curves[i]
+            progress = game.score if curve.by == SCORE else game.tick_count
+            value = curve.value(self.bases[i], progress, self.rating)
+            if getattr(game, curve.attr) != value:
+                if curve.attr == "update_period":
+                    game.set_update_period(value)
+                else:
+                    setattr(game, curve.attr, value)
+        if self.adaptive:
+            self.throttle(game.entity_count(), elapsed_us)
+
+    def throttle(self, count, elapsed_us):
+        """
+        Lower the entity cap below `count` after a run of slow ticks, and
+        raise it again slowly once ticks are well within budget.
+        """
+        if elapsed_us > TICK_BUDGET_US:
+            self.fast_ticks = 0
+            self.slow_ticks += 1
+            if self.slow_ticks >= SLOW_TICKS:
+                self.slow_ticks = 0
+                self.entity_cap = max(min(self.entity_cap, count) - 1, ENTITY_CAP_MIN)
+        elif elapsed_us < TICK_BUDGET_US // 2:
+            self.slow_ticks = 0
+            self.fast_ticks += 1
+            if self.fast_ticks >= FAST_TICKS and self.entity_cap < ENTITY_CAP_MAX:
+                self.fast_ticks = 0
+                self.entity_cap += 1
+
+    def finish(self, game):
+        """
+        Update the skill rating from how the game went. Saved with the
+        next STORE.flush().
+        """
+        if not self.adaptive:
+            return
+        rating = self.rating
+        if game.game_win_flag or game.tick_count >= self.survival_ticks:
+            rating = min(rating + 1, RATING_MAX)
+        elif game.tick_count < self.survival_ticks // 4:
+            rating = max(rating - 1, 0)
+        if rating != self.rating:
+            self.rating = rating
+            STORE.set(self.key, rating)
@@ -1,21 +1,186 @@
 # display_module.py
 
 from machine import I2C, Pin
+import time
 import ssd1306
+from gfx import Canvas
+from profiler import PROFILER
+
+# Map cell sizes in pixels: 8 draws tiles as font characters, 4 as TILES_4
+CELL_TEXT = 8
+CELL_SMALL = 4
+# Glyphs for 4-pixel cells in MONO_VLSB layout, one byte per column
+TILES_4 = {
+    "#": b"\x0f\x0f\x0f\x0f",
+    "&": b"\x0f\x0f\x0f\x0f",
+    "P": b"\x02\x07\x02\x00",
+    "A": b"\x02\x07\x02\x00",
+    "Z": b"\x09\x06\x06\x09",
+    "O": b"\x06\x09\x09\x06",
+    "*": b"\x05\x02\x05\x00",
+    "E": b"\x0f\x09\x09\x0f",
+}
+# Drawn for tiles without a glyph of their own
+TILE_4_DEFAULT = b"\x00\x06\x06\x00"
+
+
+def rows_mask(y, h):
+    """
+    Mask of the pages (bit 0 for page 0) covering pixel rows y to y + h - 1.
+    """
+    return (1 << (((y + h - 1) >> 3) + 1)) - (1 << (y >> 3))
 
 
 class Display:
-    def __init__(self, scl_pin=5, sda_pin=4, width=128, height=64):
+    # Optional stream.FrameStream mirroring every flush to a viewer, shared
+    # by all Display instances
+    stream = None
+    # Playfield panel as (width, height): (128, 64), (128, 32) or (64, 48)
+    panel = (128, 64)
+    # Optional score panel on the same bus as (width, height, I2C address)
+    hud_panel = None
+
+    def __init__(self, scl_pin=5, sda_pin=4, width=None, height=None):
+        """
+        The playfield panel, and the score panel if `hud_panel` is set.
+        Both are set up from boot.py before the first Display is made.
+
+        :param width: Playfield width in pixels, default from `panel`.
+        :param height: Playfield height in pixels, default from `panel`.
+        """
+        if width is None:
+            width, height = self.panel
         self.i2c = I2C(scl=Pin(scl_pin), sda=Pin(sda_pin))
         self.display = ssd1306.SSD1306_I2C(width, height, self.i2c)
         self.width = width
         self.height = height
+        # Panels narrower than the controller's 128 columns sit in the middle
+        self.col_offset = (128 - width) // 2
+        self.canvas = Canvas(self.display)
+        self.hud = None
+        self.hud_score = None
+        # Score last drawn on the playfield's text row
+        self.field_score = None
+        # Microseconds spent flushing to the panels, reset by the game loop
+        self.flush_us = 0
+        if self.hud_panel is not None:
+            hud_width, hud_height, addr = self.hud_panel
+            self.hud = ssd1306.SSD1306_I2C(hud_width, hud_height, self.i2c, addr)
+        self.cell = CELL_TEXT
+
+    def layout(self, map_width, map_height, sizes=(CELL_TEXT,)):
+        """
+        Choose the cell size for a map: the first of `sizes` at which the
+        whole map fits on the panel, else the first size, with the map seen
+        through a camera.
+
+        :param sizes: Cell sizes the game can draw, in order of preference.
+        :return: True if the whole map fits.
+        """
+        for cell in sizes:
+            if (
+                map_width <= self.width // cell
+                and map_height <= self.height // cell
+            ):
+                self.cell = cell
+                return True
+        self.cell = sizes[0]
+        return False
+
+    def view_size(self):
+        """
+        Cells a camera can show: the whole panel, less the bottom text row
+        for the score unless that is on the score panel.
+
+        :return: Tuple of (columns, rows).
+        """
+        score_height = 0 if self.hud is not None else 8
+        return self.width // self.cell, (self.height - score_height) // self.cell
 
     def clear(self):
         self.display.fill(0)
 
     def show(self):
+        if PROFILER.enabled and PROFILER.hud:
+            PROFILER.draw_hud(self)
+        start = time.ticks_us()
         self.display.show()
+        self.flush_us += time.ticks_diff(time.ticks_us(), start)
+        if PROFILER.enabled:
+            PROFILER.stop("show", start)
+        if self.stream is not None:
+            self.stream.send(self.display.buffer)
+
+    def set_contrast(self, contrast):
+        self.display.contrast(contrast)
+        if self.hud is not None:
+            self.hud.contrast(contrast)
+
+    def poweroff(self):
+        self.display.poweroff()
+        if self.hud is not None:
+            self.hud.poweroff()
+
+    def poweron(self):
+        self.display.poweron()
+        if self.hud is not None:
+            self.hud.poweron()
+
+    def show_pages(self, first, last):
+        """
+        Flush only the pages (8-pixel rows) from `first` to `last` inclusive.
+        """
+        self._write_pages(first, last)
+        if self.stream is not None:
+            self.stream.send(self.display.buffer)
+
+    def show_page_mask(self, mask):
+        """
+        Flush the pages whose bits are set in `mask` (bit 0 for page 0),
+        one write per run of adjacent pages.
+        """
+        if PROFILER.enabled and PROFILER.hud:
+            # The overlay is drawn over the whole panel by show()
+            self.show()
+            return
+        # Rows below the panel, such as the score row of a map that fills it
+        mask &= (1 << (self.height >> 3)) - 1
+        page = 0
+        while mask:
+            if mask & 1:
+                first = page
+                while mask & 2:
+                    mask >>= 1
+                    page += 1
+                self._write_pages(first, page)
+            mask >>= 1
+            page += 1
+        if self.stream is not None:
+            self.stream.send(self.display.buffer)
+
+    def _write_pages(self, first, last):
+        display = self.display
+        x0 = self.col_offset
+        x1 = x0 + self.width - 1
+        start = time.ticks_us()
+        display.write_cmd(ssd1306.SET_COL_ADDR)
+        display.write_cmd(x0)
+        display.write_cmd(x1)
+        display.write_cmd(ssd1306.SET_PAGE_ADDR)
+        display.write_cmd(first)
+        display.write_cmd(last)
+        display.write_data(
+            memoryview(display.buffer)[first * self.width : (last + 1) * self.width]
+        )
+        self.flush_us += time.ticks_diff(time.ticks_us(), start)
+        if PROFILER.enabled:
+            PROFILER.stop("show", start)
+
+    def show_rows(self, y, h):
+        """
+        Flush the pages covering pixel rows y to y + h - 1.
+        """
+        self.show_pages(max(y, 0) >> 3, min(y + h - 1, self.height - 1) >> 3)
 
     def draw_text(self, text, x, y):
         self.display.text(text, x, y)
@@ -23,12 +188,108 @@ class Display:
     def draw_char(self, char, x, y):
         self.display.text(char, x, y)
 
+    def draw_tile(self, char, x, y):
+        """
+        Draw a map tile at the current cell size onto a cleared cell.
+        """
+        if self.cell == CELL_TEXT:
+            self.display.text(char, x, y)
+        else:
+            self.canvas.blit(TILES_4.get(char, TILE_4_DEFAULT), 4, 4, x, y)
+
     def update_display(self, game_map, score):
+        cell = self.cell
         self.clear()
         for y in range(len(game_map)):
             for x in range(len(game_map[y])):
                 char = game_map[y][x]
                 if char != ' ':
-                    self.draw_char(char, x * 8, y * 8)
-        self.draw_text(f"Score: {score}", 0, len(game_map) * 8)
-        self.show()
\ No newline at end of file
+                    self.draw_tile(char, x * cell, y * cell)
+        self.draw_score(score, len(game_map) * cell)
+        self.show()
+
+    def update_view(self, world, camera, score):
+        cell = self.cell
+        self.clear()
+        for row in range(camera.view_height):
+            y = camera.y + row
+            for col in range(camera.view_width):
+                char = world.get(y, camera.x + col)
+                if char != ' ':
+                    self.draw_tile(char, col * cell, row * cell)
+        self.draw_score(score, camera.view_height * cell)
+        self.show()
+
+    def draw_cell(self, char, col, row):
+        cell = self.cell
+        self.display.fill_rect(col * cell, row * cell, cell, cell, 0)
+        if char != ' ':
+            self.draw_tile(char, col * cell, row * cell)
+
+    def draw_score(self, score, y=0):
+        """
+        Draw the score on the text row at pixel row `y`, or on the score
+        panel, which is only redrawn and flushed when the score changed.
+        """
+        hud = self.hud
+        if hud is None:
+            self.field_score = score
+            self.display.fill_rect(0, y, self.width, 8, 0)
+            self.draw_text(f"Score: {score}", 0, y)
+        elif score != self.hud_score:
+            self.hud_score = score
+            hud.fill(0)
+            hud.text(f"Score: {score}", 0, (hud.height - 8) // 2)
+            start = time.ticks_us()
+            hud.show()
+            self.flush_us += time.ticks_diff(time.ticks_us(), start)
+
+    def _score_pages(self, score, y):
+        """
+        Redraw the score on the playfield if it changed.
+
+        :return: Mask of the pages to flush for it.
+        """
+        if self.hud is not None:
+            self.draw_score(score, y)
+            return 0
+        if score == self.field_score:
+            return 0
+        self.draw_score(score, y)
+        return rows_mask(y, 8)
+
+    def update_cells(self, game_map, cells, head, tail, score):
+        """
+        Redraw the cells logged in the ring `cells` from `head` up to
+        `tail` and flush only the pages they are on.
+        """
+        width = len(game_map[0])
+        cell = self.cell
+        size = len(cells)
+        mask = 0
+        while head != tail:
+            y, x = divmod(cells[head], width)
+            self.draw_cell(game_map[y][x], x, y)
+            mask |= rows_mask(y * cell, cell)
+            head = (head + 1) % size
+        mask |= self._score_pages(score, len(game_map) * cell)
+        if mask:
+            self.show_page_mask(mask)
+
+    def update_view_cells(self, world, camera, cells, head, tail, score):
+        """
+        As update_cells(), for cells of a ChunkedMap seen through a camera.
+        """
+        cell = self.cell
+        size = len(cells)
+        mask = 0
+        while head != tail:
+            y, x = divmod(cells[head], world.width)
+            if camera.contains(y, x):
+                row = y - camera.y
+                self.draw_cell(world.get(y, x), x - camera.x, row)
+                mask |= rows_mask(row * cell, cell)
+            head = (head + 1) % size
+        mask |= self._score_pages(score, camera.view_height * cell)
+        if mask:
+            self.show_page_mask(mask)
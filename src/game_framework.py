@@ -1,12 +1,570 @@
 # game_framework.py
 
+import gc
 import time
+from array import array
 from machine import Timer
-from display_module import Display
-from input_module import Input
+from audio import AUDIO
+from display_module import Display, CELL_TEXT, CELL_SMALL
+from difficulty import Difficulty
+from input_module import Input, NAMES, REPEAT_DELAY_MS, REPEAT_RATE_MS
+from memory import HeapMonitor, GC_STEP_BYTES, heap_bytes
+from power import IdleScheduler, ClockGovernor, FRAME_MS, FULL_CONTRAST
+from profiler import PROFILER
+from randpool import POOL, REFILL_BYTES, REFILL_SLACK_MS
+from store import STORE
+from swarm import Swarm
+from telemetry import TELEMETRY, DRAIN_SLACK_MS
+
+# Render policies for Game.set_render_policy()
+RENDER_ALWAYS = 0  # Redraw on every pass of the main loop
+RENDER_ON_CHANGE = 1  # Redraw only after the game called mark_dirty()
+RENDER_EVERY_N = 2  # Redraw changes at most once every N update ticks
+RENDER_NEVER = 3  # Headless: never draw or flush the display
+
+# Side length (in cells) of the square chunks of a ChunkedMap
+CHUNK_SIZE = 8
+CHUNK_AREA = CHUNK_SIZE * CHUNK_SIZE
+# Evict chunks early when less heap than this is free
+CHUNK_LOW_HEAP = 2048
+# Chunks a ChunkedMap holds in memory by default
+MAX_CHUNKS = 12
+
+# Changed cells remembered between frames before falling back to a full redraw
+DIRTY_CELLS_MAX = 32
+# Heap taken by the objects every game makes besides its buffers: the game,
+# display, input, timer, schedulers and their attribute dicts
+GAME_OBJECT_BYTES = 1536
+
+# Component bits of Entities
+POSITION = 1  # Cell in ys/xs
+VELOCITY = 2  # Cells per tick in dys/dxs
+TILE = 4  # Character in tiles, drawn on the map
+CHASE = 8  # Chases the player, moved by a ChaseSystem
+PICKUP = 16  # Collected when the player steps on it
+
+# Transition screens fade in, stay, then fade out (milliseconds)
+FADE_MS = 400
+HOLD_MS = 2500
+# Presses this early in a transition are still meant for the game
+SKIP_AFTER_MS = 300
+
+
+class Transition:
+    def __init__(self, display, input, tasks=()):
+        """
+        Show what is drawn in the display's buffer with a contrast fade in
+        and out, without blocking on a sleep: each frame runs one of the
+        background tasks, and a new button press ends the transition early.
+        Tasks still pending then run before it returns.
+
+        :param display: Display whose buffer holds the screen to show.
+        :param input: Input to watch for a press that skips the transition.
+        :param tasks: Functions to call during the transition, in order.
+        """
+        self.display = display
+        self.input = input
+        self.tasks = tasks
+
+    def contrast(self, elapsed):
+        """
+        :return: Contrast at `elapsed` ms into the transition, or -1 at the end.
+        """
+        if elapsed < FADE_MS:
+            return elapsed * FULL_CONTRAST // FADE_MS
+        elapsed -= FADE_MS + HOLD_MS
+        if elapsed < 0:
+            return FULL_CONTRAST
+        if elapsed < FADE_MS:
+            return (FADE_MS - elapsed) * FULL_CONTRAST // FADE_MS
+        return -1
+
+    def run(self, idle):
+        """
+        Play the transition, sleeping between frames.
+
+        :param idle: IdleScheduler used to sleep.
+        """
+        display = self.display
+        display.set_contrast(0)
+        display.show()
+        start = time.ticks_ms()
+        shown = 0
+        task = 0
+        while True:
+            frame_start = time.ticks_ms()
+            elapsed = time.ticks_diff(frame_start, start)
+            contrast = self.contrast(elapsed)
+            self.input.scan()
+            if contrast < 0 or (self.input.pressed and elapsed >= SKIP_AFTER_MS):
+                break
+            if contrast != shown:
+                display.set_contrast(contrast)
+                shown = contrast
+            if task < len(self.tasks):
+                self.tasks[task]()
+                task += 1
+            idle.sleep_until(time.ticks_add(frame_start, FRAME_MS))
+        while task < len(self.tasks):
+            self.tasks[task]()
+            task += 1
+        # Blank the panel before it comes back to full brightness
+        display.clear()
+        display.show()
+        display.set_contrast(FULL_CONTRAST)
+
+
+class ChunkedMap:
+    def __init__(self, width, height, generate, max_chunks=MAX_CHUNKS):
+        """
+        Tile map too large to keep in RAM, stored as square chunks of tile
+        codes that are generated on demand and evicted least recently used
+        first.
+
+        Evicted chunks are not saved: the next access generates them again.
+        Cells that were changed since generation are kept as a small table
+        of edits and reapplied, so only the differences stay in memory.
+
+        :param width: Width of the map in cells.
+        :param height: Height of the map in cells.
+        :param generate: Function (chunk_y, chunk_x, buffer) that fills a
+            CHUNK_AREA bytearray with the tile codes of that chunk, row by
+            row. It must produce the same tiles every time it is called.
+        :param max_chunks: Maximum number of chunks held in memory.
+        """
+        self.width = width
+        self.height = height
+        self.generate = generate
+        self.max_chunks = max_chunks
+        self.across = (width + CHUNK_SIZE - 1) // CHUNK_SIZE
+        self.chunks = {}
+        # Resident chunk keys, least recently used first
+        self.order = []
+        # Chunk key -> {cell index: tile code} for evicted chunks
+        self.edits = {}
+        self.scratch = bytearray(CHUNK_AREA)
+        self.loads = 0
+
+    @staticmethod
+    def budget(max_chunks=MAX_CHUNKS):
+        """
+        Heap taken by a ChunkedMap once all its chunks are resident, not
+        counting the edits of evicted chunks.
+        """
+        return (
+            (max_chunks + 1) * heap_bytes(CHUNK_AREA)
+            + heap_bytes(8 * max_chunks)
+            + heap_bytes(4 * max_chunks)
+        )
+
+    def _chunk(self, key):
+        chunk = self.chunks.get(key)
+        order = self.order
+        if chunk is not None:
+            if order[-1] != key:
+                order.remove(key)
+                order.append(key)
+            return chunk
+        if order and (
+            len(order) >= self.max_chunks or gc.mem_free() < CHUNK_LOW_HEAP
+        ):
+            chunk = self._evict()
+        else:
+            chunk = bytearray(CHUNK_AREA)
+        self.generate(key // self.across, key % self.across, chunk)
+        edits = self.edits.pop(key, None)
+        if edits:
+            for i, code in edits.items():
+                chunk[i] = code
+        self.chunks[key] = chunk
+        order.append(key)
+        self.loads += 1
+        return chunk
+
+    def _evict(self):
+        """
+        Drop the least recently used chunk, remembering its edits.
+
+        :return: The chunk's buffer, for reuse.
+        """
+        key = self.order.pop(0)
+        chunk = self.chunks.pop(key)
+        scratch = self.scratch
+        self.generate(key // self.across, key % self.across, scratch)
+        edits = None
+        for i in range(CHUNK_AREA):
+            if chunk[i] != scratch[i]:
+                if edits is None:
+                    edits = {}
+                edits[i] = chunk[i]
+        if edits:
+            self.edits[key] = edits
+        return chunk
+
+    def get(self, y, x):
+        """
+        Return the tile character at a cell, generating its chunk if needed.
+        """
+        key = (y // CHUNK_SIZE) * self.across + x // CHUNK_SIZE
+        return chr(self._chunk(key)[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE])
+
+    def set(self, y, x, char):
+        """
+        Change the tile character at a cell. Writes to a chunk that is not in
+        memory are recorded as edits without generating the chunk.
+        """
+        key = (y // CHUNK_SIZE) * self.across + x // CHUNK_SIZE
+        i = (y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            chunk[i] = ord(char)
+        else:
+            edits = self.edits.get(key)
+            if edits is None:
+                edits = self.edits[key] = {}
+            edits[i] = ord(char)
+
+    def generated(self, char):
+        """
+        Yield the (y, x) of every generated cell holding `char`, without
+        keeping any chunk in memory. Useful to index static tiles at start.
+        """
+        code = ord(char)
+        scratch = self.scratch
+        down = (self.height + CHUNK_SIZE - 1) // CHUNK_SIZE
+        for cy in range(down):
+            for cx in range(self.across):
+                self.generate(cy, cx, scratch)
+                for i in range(CHUNK_AREA):
+                    if scratch[i] == code:
+                        y = cy * CHUNK_SIZE + i // CHUNK_SIZE
+                        x = cx * CHUNK_SIZE + i % CHUNK_SIZE
+                        if y < self.height and x < self.width:
+                            yield y, x
+
+
+class Camera:
+    def __init__(self, view_width, view_height, world_width, world_height):
+        """
+        Window of cells of a larger map that is shown on the display.
+
+        :param view_width: Width of the window in cells.
+        :param view_height: Height of the window in cells.
+        :param world_width: Width of the whole map in cells.
+        :param world_height: Height of the whole map in cells.
+        """
+        self.view_width = min(view_width, world_width)
+        self.view_height = min(view_height, world_height)
+        self.world_width = world_width
+        self.world_height = world_height
+        self.y = 0
+        self.x = 0
+
+    def follow(self, y, x):
+        """
+        Center the window on a cell, without showing anything past the
+        edges of the map.
+
+        :return: True if the window moved.
+        """
+        new_y = min(
+            max(y - self.view_height // 2, 0), self.world_height - self.view_height
+        )
+        new_x = min(
+            max(x - self.view_width // 2, 0), self.world_width - self.view_width
+        )
+        if new_y == self.y and new_x == self.x:
+            return False
+        self.y = new_y
+        self.x = new_x
+        return True
+
+    def contains(self, y, x):
+        """
+        Check whether a cell is inside the window.
+        """
+        return (
+            self.y <= y < self.y + self.view_height
+            and self.x <= x < self.x + self.view_width
+        )
+
+
+class Entities:
+    def __init__(self, capacity):
+        """
+        Entity storage with one array per component, indexed by entity id.
+
+        An entity is a slot whose bit mask in `masks` says which components
+        it has; ids of destroyed entities are reused. Systems added with
+        add_system() run in that fixed order on every run(), each over the
+        entities that have all the components it requires.
+
+        :param capacity: Maximum number of entities (at most 255).
+        """
+        self.capacity = capacity
+        self.masks = bytearray(capacity)
+        self.ys = array("h", bytes(2 * capacity))
+        self.xs = array("h", bytes(2 * capacity))
+        self.dys = array("b", bytes(capacity))
+        self.dxs = array("b", bytes(capacity))
+        self.tiles = bytearray(capacity)
+        # Live entities, and one past the highest slot ever used
+        self.count = 0
+        self.end = 0
+        # Ids found by the last query()
+        self.matches = bytearray(capacity)
+        self.systems = []
+
+    @staticmethod
+    def budget(capacity):
+        """
+        Heap taken by the component arrays of an Entities store.
+        """
+        return 5 * heap_bytes(capacity) + 2 * heap_bytes(2 * capacity)
+
+    def create(self, mask, y=0, x=0, tile=" ", dy=0, dx=0):
+        """
+        Add an entity.
+
+        :param mask: Its component bits, not 0.
+        :return: The entity id, or -1 if storage is full.
+        """
+        masks = self.masks
+        e = 0
+        while e < self.end and masks[e]:
+            e += 1
+        if e == self.capacity:
+            return -1
+        if e == self.end:
+            self.end = e + 1
+        masks[e] = mask
+        self.ys[e] = y
+        self.xs[e] = x
+        self.dys[e] = dy
+        self.dxs[e] = dx
+        self.tiles[e] = ord(tile)
+        self.count += 1
+        return e
+
+    def destroy(self, e):
+        if self.masks[e]:
+            self.masks[e] = 0
+            self.count -= 1
+            while self.end and not self.masks[self.end - 1]:
+                self.end -= 1
+
+    def query(self, mask):
+        """
+        Find the entities that have all the components in `mask`.
+
+        :return: Number found; their ids are in matches[:count], lowest first.
+        """
+        masks = self.masks
+        matches = self.matches
+        n = 0
+        for e in range(self.end):
+            if masks[e] & mask == mask:
+                matches[n] = e
+                n += 1
+        return n
+
+    def find(self, y, x, mask):
+        """
+        :return: Id of an entity on a cell with the components in `mask`, or -1.
+        """
+        masks = self.masks
+        for e in range(self.end):
+            if masks[e] & mask == mask and self.ys[e] == y and self.xs[e] == x:
+                return e
+        return -1
+
+    def add_system(self, system):
+        """
+        Append a system to the per-tick order.
+        """
+        self.systems.append(system)
+        return system
+
+    def run(self, game):
+        """
+        Run every system once, in order, stopping when the game ends.
+        """
+        for system in self.systems:
+            system.update(game, self, self.query(system.REQUIRES))
+            if game.game_over_flag or game.game_win_flag:
+                return
+
+    def save(self):
+        """
+        :return: Tuple describing every live entity, for Game.save_state().
+        """
+        return tuple(
+            (
+                e,
+                self.masks[e],
+                self.ys[e],
+                self.xs[e],
+                self.dys[e],
+                self.dxs[e],
+                self.tiles[e],
+            )
+            for e in range(self.end)
+            if self.masks[e]
+        )
+
+    def load(self, saved):
+        """
+        Replace all entities with those from save(), keeping their ids.
+        """
+        for e in range(self.end):
+            self.masks[e] = 0
+        self.end = 0
+        self.count = len(saved)
+        for e, mask, y, x, dy, dx, tile in saved:
+            self.masks[e] = mask
+            self.ys[e] = y
+            self.xs[e] = x
+            self.dys[e] = dy
+            self.dxs[e] = dx
+            self.tiles[e] = tile
+            if e >= self.end:
+                self.end = e + 1
+
+
+class System:
+    # Components an entity needs for update() to see it
+    REQUIRES = 0
+
+    def update(self, game, entities, count):
+        """
+        Process the entities whose ids are in entities.matches[:count].
+        """
+        raise NotImplementedError("update() must be implemented by the subclass.")
+
+
+class MoveSystem(System):
+    REQUIRES = POSITION | VELOCITY | TILE
+
+    def update(self, game, entities, count):
+        """
+        Move every entity by its velocity on the map. All entities leave
+        their cells before any lands, so the order they are stored in does
+        not matter. Entities that leave the map go to game.entity_left(),
+        and those that land on a cell that is not empty to
+        game.entity_blocked().
+        """
+        matches = entities.matches
+        ys = entities.ys
+        xs = entities.xs
+        empty = game.EMPTY_CHAR
+        for i in range(count):
+            e = matches[i]
+            game.set_cell(ys[e], xs[e], empty)
+        for i in range(count):
+            e = matches[i]
+            y = ys[e] + entities.dys[e]
+            x = xs[e] + entities.dxs[e]
+            if not (0 <= y < game.map_height and 0 <= x < game.map_width):
+                game.entity_left(e)
+                continue
+            target = game.get_cell(y, x)
+            if target != empty:
+                game.entity_blocked(e, target)
+                if game.game_over_flag or game.game_win_flag:
+                    return
+                # Still alive: it stays where it was
+                if entities.masks[e] and game.get_cell(ys[e], xs[e]) == empty:
+                    game.set_cell(ys[e], xs[e], chr(entities.tiles[e]))
+                continue
+            ys[e] = y
+            xs[e] = x
+            game.set_cell(y, x, chr(entities.tiles[e]))
+
+
+class ChaseSystem(System):
+    REQUIRES = POSITION | CHASE
+
+    def __init__(self, capacity, map_width, map_height, hidden=()):
+        """
+        Move chasers towards game.player_pos with the batched Swarm kernel
+        and update the map only where they moved. Chasers cannot be
+        destroyed. On maps with a camera, chasers far outside the view
+        sleep until the player comes near.
+
+        :param capacity: Maximum number of chasers.
+        :param map_width: Width of the map in cells.
+        :param map_height: Height of the map in cells.
+        :param hidden: Tiles a chaser hides rather than overwrites.
+        """
+        self.swarm = Swarm(capacity, map_width, map_height)
+        self.hidden = hidden
+        # Entity id of each swarm index
+        self.entity = bytearray(capacity)
+
+    @staticmethod
+    def budget(capacity, map_width, map_height):
+        """
+        Heap taken by the buffers of a ChaseSystem made with these arguments.
+        """
+        return Swarm.budget(capacity, map_width, map_height) + heap_bytes(capacity)
+
+    def add(self, game, y, x, tile):
+        """
+        Create a chaser on a cell and draw it.
+
+        :return: The entity id.
+        """
+        e = game.entities.create(POSITION | CHASE | TILE, y, x, tile)
+        self.entity[self.swarm.add(y, x)] = e
+        game.set_cell(y, x, tile)
+        return e
+
+    def update(self, game, entities, count):
+        swarm = self.swarm
+        camera = game.camera
+        if camera is not None:
+            margin = CHUNK_SIZE // 2
+            swarm.set_window(
+                camera.y - margin,
+                camera.x - margin,
+                camera.y + camera.view_height + margin,
+                camera.x + camera.view_width + margin,
+            )
+        if swarm.step(game.player_pos[0], game.player_pos[1]):
+            game.game_over_flag = True
+
+        # Only the chasers that moved touch the map
+        for i in range(swarm.moved_count):
+            k = swarm.moved[i]
+            e = self.entity[k]
+            tile = chr(entities.tiles[e])
+            y = swarm.prev_ys[k]
+            x = swarm.prev_xs[k]
+            # A chaser that stood on a hidden tile leaves it in place
+            if game.get_cell(y, x) == tile:
+                game.set_cell(y, x, game.EMPTY_CHAR)
+            y = swarm.ys[k]
+            x = swarm.xs[k]
+            entities.ys[e] = y
+            entities.xs[e] = x
+            if game.get_cell(y, x) not in self.hidden:
+                game.set_cell(y, x, tile)
 
 
 class Game:
+    # CPU clock in Hz the game needs, or 0 to pick one from the measured load
+    CPU_FREQ = 0
+    # Auto-repeat of held buttons, see Input
+    REPEAT_DELAY_MS = REPEAT_DELAY_MS
+    REPEAT_RATE_MS = REPEAT_RATE_MS
+    # Difficulty curves (tuple of difficulty.Curve) and the ticks a player
+    # must last for the skill rating to rise; no curves means fixed difficulty
+    DIFFICULTY = ()
+    SURVIVAL_TICKS = 0
+    # Cell sizes in pixels the game can draw, in order of preference; the
+    # display picks the first at which the whole map fits on its panel
+    CELL_SIZES = (CELL_TEXT, CELL_SMALL)
+
     def __init__(self, map_width=16, map_height=8, update_period=1000):
         """
         Initialize the game framework.
@@ -16,15 +574,210 @@ class Game:
         :param update_period: Period (in milliseconds) for periodic updates (e.g., moving zombies).
         """
         self.display = Display()
-        self.input = Input()
+        self.display.layout(map_width, map_height, self.CELL_SIZES)
+        self.input = Input(
+            repeat_delay=self.REPEAT_DELAY_MS, repeat_rate=self.REPEAT_RATE_MS
+        )
         self.map_width = map_width
         self.map_height = map_height
         self.update_period = update_period
         self.game_map = []
+        self.world = None
+        self.camera = None
         self.score = 0
         self.game_over_flag = False
         self.game_win_flag = False
         self.timer = Timer(-1)
+        self.timer_running = False
+        # Deterministic generator with a `state`, set by netplay; None uses POOL
+        self.rng = None
+        # Set by netplay while it replays ticks that were already heard
+        self.muted = False
+        self.idle = IdleScheduler(self.display, self.input)
+        self.clock = ClockGovernor(self.CPU_FREQ)
+        self.render_policy = RENDER_ON_CHANGE
+        self.render_every = 1
+        self.dirty = True
+        # Ring of cells changed by set_cell() since the last draw_map(), as
+        # y * map_width + x. set_cell() runs from tick() on the timer and only
+        # moves dirty_tail; draw_map() only moves dirty_head.
+        self.dirty_cells = array("H", [0] * (DIRTY_CELLS_MAX + 1))
+        self.dirty_head = 0
+        self.dirty_tail = 0
+        self.full_redraw = True
+        self.tick_count = 0
+        self.rendered_tick = 0
+        self.next_tick_ms = 0
+        self.heap = None
+        self.best_score = 0
+        self.entities = None
+        self.difficulty = None
+        if self.DIFFICULTY:
+            self.difficulty = Difficulty(
+                type(self).__name__, self.DIFFICULTY, self.SURVIVAL_TICKS
+            )
+
+    @classmethod
+    def base_budget(cls, map_width, map_height):
+        """
+        Bytes of heap every game with a map this size needs: the display
+        buffers, the map as rows or as chunks, the framework's own objects
+        and room for the garbage made between collections.
+        """
+        budget = GAME_OBJECT_BYTES + GC_STEP_BYTES
+        panel_width, panel_height = Display.panel
+        budget += heap_bytes((panel_height + 7) // 8 * panel_width)
+        if Display.hud_panel is not None:
+            hud_width, hud_height, _ = Display.hud_panel
+            budget += heap_bytes((hud_height + 7) // 8 * hud_width)
+        budget += heap_bytes(2 * (DIRTY_CELLS_MAX + 1))
+        for cell in cls.CELL_SIZES:
+            if map_width <= panel_width // cell and map_height <= panel_height // cell:
+                # One list of tile characters per row; the characters are interned
+                rows = map_height * heap_bytes(4 * map_width)
+                return budget + heap_bytes(4 * map_height) + rows
+        return budget + ChunkedMap.budget()
+
+    @classmethod
+    def memory_budget(cls, params):
+        """
+        Bytes of free heap needed to launch the game with these constructor
+        parameters, checked by GameManager. Games that allocate buffers of
+        their own add them to base_budget().
+
+        :param params: Constructor parameters, as in the GameManager menu.
+        """
+        return cls.base_budget(params.get("map_width", 16), params.get("map_height", 8))
+
+    def use_world(self, generate, max_chunks=MAX_CHUNKS):
+        """
+        Store the map as a ChunkedMap shown through a Camera instead of in
+        game_map. For maps larger than the screen; call it from
+        initialize_game() before placing anything on the map.
+
+        :param generate: Chunk generator, see ChunkedMap.
+        :param max_chunks: Maximum number of chunks held in memory.
+        """
+        self.world = ChunkedMap(self.map_width, self.map_height, generate, max_chunks)
+        view_width, view_height = self.display.view_size()
+        self.camera = Camera(view_width, view_height, self.map_width, self.map_height)
+
+    def use_entities(self, capacity):
+        """
+        Keep the game's moving things in an Entities store; add its systems
+        in the order they should run and call entities.run() from
+        update_state().
+
+        :param capacity: Maximum number of entities.
+        :return: The Entities store.
+        """
+        self.entities = Entities(capacity)
+        return self.entities
+
+    def entity_left(self, e):
+        """
+        Called by MoveSystem when an entity moves off the map. Destroys it;
+        games override this to score or wrap around.
+        """
+        self.entities.destroy(e)
+
+    def entity_blocked(self, e, tile):
+        """
+        Called by MoveSystem when an entity would land on a tile that is not
+        empty. It stays where it was unless the game destroys it or ends.
+        """
+
+    def focus(self, y, x):
+        """
+        Keep a cell (usually the player) in the middle of the camera.
+        Does nothing when the whole map is on screen.
+
+        :return: True if the camera moved.
+        """
+        if self.camera is None or not self.camera.follow(y, x):
+            return False
+        self.full_redraw = True
+        self.mark_dirty()
+        return True
+
+    def fits_screen(self):
+        """
+        Check whether the whole map fits on the display at the cell size it
+        chose for the game.
+        """
+        cell = self.display.cell
+        return (
+            self.map_width <= self.display.width // cell
+            and self.map_height <= self.display.height // cell
+        )
+
+    def get_cell(self, y, x):
+        """
+        Return the tile character at a map cell.
+        """
+        if self.world is None:
+            return self.game_map[y][x]
+        return self.world.get(y, x)
+
+    def set_cell(self, y, x, char):
+        """
+        Change the tile character at a map cell and log it for the next
+        draw_map(). When the log is full the next frame is redrawn entirely.
+        """
+        if self.world is None:
+            self.game_map[y][x] = char
+        else:
+            self.world.set(y, x, char)
+        tail = self.dirty_tail
+        nxt = (tail + 1) % (DIRTY_CELLS_MAX + 1)
+        if nxt == self.dirty_head:
+            self.full_redraw = True
+        else:
+            self.dirty_cells[tail] = y * self.map_width + x
+            # Store the cell before publishing it
+            self.dirty_tail = nxt
+        self.dirty = True
+
+    def draw_map(self):
+        """
+        Draw the map and score to the display, through the camera when the
+        map is stored as a ChunkedMap. Only the cells logged by set_cell()
+        are redrawn, unless the log overflowed or the camera moved.
+        """
+        display = self.display
+        # tick() may run from the timer between any two lines of a draw and
+        # log more cells; those stay in the ring for the next frame
+        tail = self.dirty_tail
+        if self.full_redraw:
+            # Cleared before drawing, so an overflow while drawing is kept
+            self.full_redraw = False
+            if self.world is None:
+                display.update_display(self.game_map, self.score)
+            else:
+                display.update_view(self.world, self.camera, self.score)
+        elif self.world is None:
+            display.update_cells(
+                self.game_map, self.dirty_cells, self.dirty_head, tail, self.score
+            )
+        else:
+            display.update_view_cells(
+                self.world,
+                self.camera,
+                self.dirty_cells,
+                self.dirty_head,
+                tail,
+                self.score,
+            )
+        self.dirty_head = tail
+
+    def allocate_buffers(self):
+        """
+        Allocate any working buffers the game reuses during play.
+        Called once before initialize_game(), so that the allocations happen
+        before the heap is tidied and never inside update_state() or render().
+        Subclasses may override this; the default does nothing.
+        """
+        pass
 
     def initialize_game(self):
         """
@@ -44,6 +797,62 @@ class Game:
         """
         raise NotImplementedError("handle_input() must be implemented by the subclass.")
 
+    def handle_player_input(self, player, direction):
+        """
+        Handle input from one of several players in a networked game.
+        Single-player games only have player 0, which goes to handle_input().
+
+        :param player: Index of the player.
+        :param direction: Direction input by that player.
+        """
+        if player == 0:
+            self.handle_input(direction)
+
+    def save_state(self):
+        """
+        Capture everything update_state() and handle_player_input() depend on,
+        so netplay can roll back to it. Must be implemented by subclasses
+        that support netplay.
+        """
+        raise NotImplementedError("save_state() must be implemented for netplay.")
+
+    def load_state(self, state):
+        """
+        Restore a state captured by save_state(), including the map.
+        Must be implemented by subclasses that support netplay.
+        """
+        raise NotImplementedError("load_state() must be implemented for netplay.")
+
+    def random_bits(self, bits):
+        """
+        Draw random bits for game logic. Games must use this instead of the
+        random module so that netplay can make them deterministic.
+
+        :param bits: Number of bits, at most 16.
+        """
+        if self.rng is not None:
+            return self.rng.getrandbits(bits)
+        return POOL.bits(bits)
+
+    def random_below(self, n):
+        """
+        Draw a random number in range(n) for game logic, like random_bits().
+
+        :param n: Upper bound, at most 65536.
+        """
+        if self.rng is not None:
+            return self.rng.getrandbits(16) % n
+        return POOL.below(n)
+
+    def play_sound(self, effect):
+        """
+        Queue a sound effect, unless the game is muted.
+
+        :param effect: Effect from audio.py, e.g. audio.STAR.
+        """
+        if not self.muted:
+            AUDIO.play(effect)
+
     def update_state(self, timer):
         """
         Update game state periodically.
@@ -56,63 +865,269 @@ class Game:
     def render(self):
         """
         Render the current game state to the display.
-        Must be implemented by subclasses.
+        Must be implemented by subclasses. Games should not call this
+        directly; call mark_dirty() and let present() decide when to draw.
         """
         raise NotImplementedError("render() must be implemented by the subclass.")
 
+    def end_screen(self, title):
+        """
+        Draw an end screen with a title, the score and the high score into
+        the display buffer. The transition that follows shows it.
+        """
+        display = self.display
+        display.clear()
+        # Three lines 10 pixels apart from row 20, closer on short panels
+        line = 10 if display.height >= 48 else 8
+        y = min(20, display.height - 3 * line)
+        x = 30 if display.width >= 128 else 0
+        display.draw_text(title, max((display.width - len(title) * 8) // 2, 0), y)
+        display.draw_text(f"Score: {self.score}", x, y + line)
+        display.draw_text(f"Best: {self.best_score}", x, y + 2 * line)
+
     def game_over_screen(self):
         """
-        Display the game over screen.
-        Must be implemented by subclasses.
+        Draw the game over screen. Games may override it.
         """
-        raise NotImplementedError(
-            "game_over_screen() must be implemented by the subclass."
-        )
+        self.end_screen("GAME OVER")
 
     def game_win_screen(self):
         """
-        Display the game win screen.
-        Must be implemented by subclasses.
+        Draw the game win screen. Games may override it.
         """
-        raise NotImplementedError(
-            "game_win_screen() must be implemented by the subclass."
-        )
+        self.end_screen("YOU WIN!")
+
+    def set_render_policy(self, policy, every=1):
+        """
+        Choose when the main loop redraws the display.
+
+        :param policy: One of RENDER_ALWAYS, RENDER_ON_CHANGE, RENDER_EVERY_N or RENDER_NEVER.
+        :param every: Minimum number of update ticks between frames for RENDER_EVERY_N.
+        """
+        self.render_policy = policy
+        self.render_every = every
+
+    def mark_dirty(self):
+        """
+        Signal that the game state changed and the display is out of date.
+        """
+        self.dirty = True
+
+    def present(self):
+        """
+        Render the game if the current render policy calls for a new frame.
+
+        :return: True if a frame was rendered.
+        """
+        policy = self.render_policy
+        if policy == RENDER_NEVER:
+            return False
+        if policy != RENDER_ALWAYS:
+            if not self.dirty:
+                return False
+            if (
+                policy == RENDER_EVERY_N
+                and self.tick_count - self.rendered_tick < self.render_every
+            ):
+                return False
+        # Clear the flag first so an update landing mid-render is not lost
+        self.dirty = False
+        self.rendered_tick = self.tick_count
+        self.render()
+        return True
+
+    def tick(self, timer):
+        """
+        Advance the game logic by one update period.
+
+        :param timer: Timer object triggering the update.
+        """
+        self.next_tick_ms = time.ticks_add(time.ticks_ms(), self.update_period)
+        start = time.ticks_us()
+        self.update_state(timer)
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        if PROFILER.enabled:
+            PROFILER.record("update", elapsed)
+            PROFILER.count("ticks")
+        self.tick_count += 1
+        if self.difficulty is not None:
+            self.difficulty.update(self, elapsed)
 
     def start_timer(self):
         """
         Start the timer for periodic updates.
         """
+        self.next_tick_ms = time.ticks_add(time.ticks_ms(), self.update_period)
         self.timer.init(
             period=self.update_period,
             mode=Timer.PERIODIC,
-            callback=lambda t: self.update_state(t),
+            callback=self.tick,
         )
+        self.timer_running = True
 
     def stop_timer(self):
         """
         Stop the periodic timer.
         """
         self.timer.deinit()
+        self.timer_running = False
+
+    def set_update_period(self, period):
+        """
+        Change the update period, restarting the timer if it runs. Safe to
+        call from tick().
+
+        :param period: New period in milliseconds.
+        """
+        self.update_period = period
+        if self.timer_running:
+            self.start_timer()
+
+    def entity_count(self):
+        """
+        Number of entities, for the difficulty controller to cap when
+        updates get too slow.
+        """
+        return 0 if self.entities is None else self.entities.count
+
+    def can_add_entity(self):
+        """
+        Check whether the difficulty controller allows another entity.
+        """
+        return (
+            self.difficulty is None
+            or self.entity_count() < self.difficulty.entity_cap
+        )
+
+    def finish(self):
+        """
+        Stop the game clock and settle the score and difficulty rating in
+        memory before an end screen is shown.
+        """
+        self.stop_timer()
+        self.idle.wake()
+        self.record_score()
+        if self.difficulty is not None:
+            self.difficulty.finish(self)
+
+    def tidy_heap(self):
+        """
+        Collect the garbage left by the game and report heap usage over serial.
+        """
+        self.heap.collect()
+        self.heap.clear_threshold()
+        print(self.heap.report(type(self).__name__))
+
+    def end(self):
+        """
+        Stop the game, show how it ended, and return once the transition
+        is over or skipped. Results are saved and the heap tidied meanwhile.
+        """
+        self.finish()
+        if TELEMETRY.enabled:
+            self.heap.sample()
+            TELEMETRY.end(self, self.heap.low_water)
+        if self.game_over_flag:
+            self.game_over_screen()
+        else:
+            self.game_win_screen()
+        tasks = (self.save_results, self.tidy_heap)
+        Transition(self.display, self.input, tasks).run(self.idle)
+
+    def record_score(self):
+        """
+        Update this game's high score in the store's memory. Nothing is
+        written to flash until save_results().
+
+        :return: The high score, including this game.
+        """
+        key = "best:" + type(self).__name__
+        best = STORE.get(key, 0)
+        if self.score > best:
+            best = self.score
+            STORE.set(key, best)
+        self.best_score = best
+        return best
+
+    def save_results(self):
+        """
+        Write the high score and any other pending settings to flash.
+        Called from the end screens, once the game clock has stopped.
+        """
+        STORE.flush()
 
     def run(self):
         """
         Main game loop.
         """
+        self.heap = HeapMonitor()
+        self.allocate_buffers()
         self.initialize_game()
+        # Clear the garbage left by level generation before the clock starts
+        self.heap.collect()
+        self.heap.set_threshold()
+        self.clock.start()
         self.start_timer()
+        if TELEMETRY.enabled:
+            TELEMETRY.start(self)
+        # ticks_us() of the scan that saw a press not yet on screen, or -1
+        pressed_us = -1
 
         while True:
-            pressed = self.input.get_pressed()
-            if pressed:
-                for direction in pressed:
+            frame_start = time.ticks_ms()
+            busy_start = time.ticks_us()
+            self.display.flush_us = 0
+            profiling = PROFILER.enabled
+            if profiling:
+                start = time.ticks_us()
+            # The display is never dimmed or switched off here: the game keeps
+            # running without presses, so the idle limits only apply in the menu
+            triggered = self.input.scan()
+            if triggered:
+                for direction in NAMES[triggered]:
                     self.handle_input(direction)
-            self.render()
-            if self.game_over_flag:
-                self.stop_timer()
-                self.game_over_screen()
-                break
-            if self.game_win_flag:
-                self.stop_timer()
-                self.game_win_screen()
+                # Time the press to the frame that shows it, if it changed anything
+                if pressed_us < 0 and self.dirty:
+                    pressed_us = busy_start
+            drawn = False
+            if profiling:
+                start = PROFILER.stop("input", start)
+                if self.present():
+                    drawn = True
+                    PROFILER.stop("render", start)
+                    PROFILER.count("frames")
+                PROFILER.sample_mem()
+                PROFILER.maybe_dump()
+            else:
+                drawn = self.present()
+            busy_end = time.ticks_us()
+            busy = time.ticks_diff(busy_end, busy_start)
+            # One sample per frame, including any tick the timer ran during
+            # it. A faster clock barely shortens the I2C flush, so only the
+            # computation counts towards the clock decision.
+            self.clock.record(busy - self.display.flush_us, FRAME_MS * 1000)
+            if TELEMETRY.enabled:
+                TELEMETRY.frame(busy)
+                if drawn and pressed_us >= 0:
+                    TELEMETRY.shown(time.ticks_diff(busy_end, pressed_us))
+                    pressed_us = -1
+            self.clock.adjust()
+            self.heap.collect_if_needed(
+                time.ticks_diff(self.next_tick_ms, time.ticks_ms())
+            )
+            if self.game_over_flag or self.game_win_flag:
+                self.end()
                 break
-            time.sleep(0.05)
+            # Sleep until the next frame, or the next tick if that comes first
+            deadline = self.next_tick_ms
+            frame_end = time.ticks_add(frame_start, FRAME_MS)
+            if time.ticks_diff(frame_end, deadline) < 0:
+                deadline = frame_end
+            # Top up the random pool and drain telemetry with some of the
+            # slack first
+            slack = time.ticks_diff(deadline, time.ticks_ms())
+            if self.rng is None and slack >= REFILL_SLACK_MS:
+                POOL.refill(REFILL_BYTES)
+            if TELEMETRY.enabled and slack >= DRAIN_SLACK_MS and TELEMETRY.pending():
+                TELEMETRY.drain()
+            self.idle.sleep_until(deadline)
@@ -1,12 +1,26 @@
 # game_manager.py
 
 from display_module import Display
-from input_module import Input
+from game_framework import Transition
+from input_module import Input, UP, DOWN, RIGHT
+from memory import has_free_heap
+import gc
 import time
+import machine
+from profiler import PROFILER
+from telemetry import TELEMETRY, NO_GAME
+from store import STORE
+from power import IdleScheduler, FRAME_MS, LOW_FREQ, set_freq
 from games.zombie_game import ZombieGame
 from games.collect_stars import CollectStars
 from games.dodge_game import DodgeGame
 
+# Top pixel row of the first game name and pixels between names in the menu
+MENU_TOP = 30
+MENU_LINE = 10
+# First name row on panels less than 64 pixels high
+MENU_TOP_SHORT = 12
+
 
 class GameManager:
     def __init__(self):
@@ -15,6 +29,7 @@ class GameManager:
         """
         self.display = Display()
         self.input = Input()
+        self.idle = IdleScheduler(self.display, self.input)
         self.current_game = None
         self.games = [
             {
@@ -53,20 +68,107 @@ class GameManager:
             },
         ]
         self.selected_index = 0
+        # First game shown in the menu, when there are more than fit
+        self.menu_first = 0
+        self.menu_top = MENU_TOP if self.display.height >= 64 else MENU_TOP_SHORT
+        # Narrow panels get a short title and marker
+        self.narrow = self.display.width < 128
+        # Scores and settings survive resets; one scan of the log at boot
+        STORE.load()
+        if TELEMETRY.enabled:
+            TELEMETRY.boot(machine.freq())
+        self.apply_overrides()
+
+    def apply_overrides(self):
+        """
+        Replace default game parameters with the ones saved in the store
+        under "<game name>:<parameter>".
+        """
+        for game in self.games:
+            params = game["params"]
+            for param in params:
+                value = STORE.get(game["name"] + ":" + param)
+                if value is not None:
+                    params[param] = value
 
     def display_menu(self):
         """
-        Display the main menu allowing the player to select a game
+        Display the main menu allowing the player to select a game.
+        Draws the whole screen; moving the selection afterwards only
+        redraws the lines that change.
         """
+        if PROFILER.enabled:
+            start = time.ticks_us()
         self.display.clear()
-        self.display.draw_text("Select Game:", 20, 3)
-        for idx, game in enumerate(self.games):
-            y_position = 20 + (idx + 1) * 10
-            if idx == self.selected_index:
-                self.display.draw_text("-> " + game["name"], 5, y_position)
-            else:
-                self.display.draw_text("   " + game["name"], 5, y_position)
+        if self.narrow:
+            self.display.draw_text("Games:", 0, 2)
+        else:
+            self.display.draw_text("Select Game:", 20, 3)
+        self.draw_menu_items()
         self.display.show()
+        if PROFILER.enabled:
+            PROFILER.stop("menu_draw", start)
+
+    def menu_rows(self):
+        """
+        Number of game names that fit below the title.
+        """
+        return (self.display.height - self.menu_top) // MENU_LINE
+
+    def draw_menu_line(self, idx):
+        """
+        Draw one game name, with the selection marker if it is selected.
+
+        :return: Top pixel row of the line.
+        """
+        y = self.menu_top + (idx - self.menu_first) * MENU_LINE
+        self.display.display.fill_rect(0, y, self.display.width, 8, 0)
+        selected = idx == self.selected_index
+        if self.narrow:
+            marker = ">" if selected else " "
+            self.display.draw_text(marker + self.games[idx]["name"], 0, y)
+        else:
+            marker = "-> " if selected else "   "
+            self.display.draw_text(marker + self.games[idx]["name"], 5, y)
+        return y
+
+    def draw_menu_items(self):
+        """
+        Clear the list area and draw the visible game names.
+        """
+        display = self.display
+        display.display.fill_rect(
+            0, self.menu_top, display.width, display.height - self.menu_top, 0
+        )
+        last = min(self.menu_first + self.menu_rows(), len(self.games))
+        for idx in range(self.menu_first, last):
+            self.draw_menu_line(idx)
+
+    def move_selection(self, step):
+        """
+        Move the selection marker up or down, wrapping around the list.
+        Only the old and new lines are redrawn and flushed, unless the list
+        has to scroll, in which case just the list area is.
+
+        :param step: -1 to move up, 1 to move down.
+        """
+        if PROFILER.enabled:
+            start = time.ticks_us()
+        old = self.selected_index
+        new = (old + step) % len(self.games)
+        self.selected_index = new
+        rows = self.menu_rows()
+        if new < self.menu_first or new >= self.menu_first + rows:
+            self.menu_first = new if new < self.menu_first else new - rows + 1
+            self.draw_menu_items()
+            self.display.show_rows(
+                self.menu_top, self.display.height - self.menu_top
+            )
+        else:
+            self.display.show_rows(self.draw_menu_line(old), 8)
+            self.display.show_rows(self.draw_menu_line(new), 8)
+        if PROFILER.enabled:
+            PROFILER.stop("menu_draw", start)
 
     def get_menu_selection(self):
         """
@@ -76,23 +178,36 @@ class GameManager:
         :return: None
         """
         while True:
-            pressed = self.input.get_pressed()
-            if "up" in pressed:
-                self.selected_index = (self.selected_index - 1) % len(self.games)
-                self.display_menu()
-                # Debounce delay
-                time.sleep(0.3)
-            elif "down" in pressed:
-                self.selected_index = (self.selected_index + 1) % len(self.games)
-                self.display_menu()
-                time.sleep(0.3)
-            elif "right" in pressed:
+            frame_start = time.ticks_ms()
+            profiling = PROFILER.enabled
+            if profiling:
+                start = time.ticks_us()
+            triggered = self.input.scan()
+            if profiling:
+                PROFILER.stop("menu_input", start)
+                PROFILER.sample_mem()
+                PROFILER.maybe_dump()
+            if self.idle.activity(triggered):
+                # The press only switched the display back on
+                triggered = 0
+            self.idle.update()
+            # Holding a button scrolls at the input module's repeat rate
+            if triggered & UP:
+                self.move_selection(-1)
+            elif triggered & DOWN:
+                self.move_selection(1)
+            elif triggered & RIGHT:
                 selected_game = self.games[self.selected_index]
                 if selected_game["class"] is not None:
+                    TELEMETRY.game = self.selected_index
                     self.launch_game(selected_game["class"], selected_game["params"])
+                    TELEMETRY.game = NO_GAME
                 break
-            # Small delay to prevent CPU hogging
-            time.sleep(0.05)
+            # The menu has time to spare for sending telemetry
+            if TELEMETRY.enabled and TELEMETRY.pending():
+                TELEMETRY.drain()
+            # Sleep until the next poll, or until a button wakes the CPU
+            self.idle.sleep_until(time.ticks_add(frame_start, FRAME_MS))
 
     def launch_game(self, game_class, game_params):
         """
@@ -102,22 +217,36 @@ class GameManager:
         :param game_params: A dictionary of parameters specific to the game.
         """
         try:
+            # Refuse to start a game that would run out of heap mid-play
+            budget = game_class.memory_budget(game_params)
+            if not has_free_heap(budget):
+                raise MemoryError(f"Need {budget}B")
             # Instantiate the game with its specific parameters using ** unpacking
             game_instance = game_class(**game_params)
-            # Run the game (this will take over until the game ends and resets the device)
+            # Run the game until it ends and its end screen is dismissed
             game_instance.run()
-        except TypeError as e:
-            # Handle cases where incorrect parameters are passed
+        except (TypeError, ValueError, MemoryError, OSError) as e:
+            # Incorrect parameters, a heap too small, or a missing or bad asset file
+            if TELEMETRY.enabled:
+                TELEMETRY.error()
             self.display.clear()
             self.display.draw_text("Error Launching", 25, 20)
             self.display.draw_text(str(e), 0, 30)
-            self.display.show()
-            time.sleep(3)
-            self.display_menu()
+            Transition(self.display, self.input).run(self.idle)
+        # Free the game before the menu comes back
+        game_instance = None
+        gc.collect()
+        # Buttons still down from the game must not act on the menu
+        self.input.scan()
+        self.idle.wake()
+        # The menu only needs the low clock
+        set_freq(LOW_FREQ)
 
     def run(self):
         """
         Display the menu, get user selection, and launch the selected game
         """
-        self.display_menu()
-        self.get_menu_selection()
+        set_freq(LOW_FREQ)
+        while True:
+            self.display_menu()
+            self.get_menu_selection()
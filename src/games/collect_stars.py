@@ -1,9 +1,17 @@
 # collect_stars.py
 
-from game_framework import Game
-import random
-import machine
-import time
+from game_framework import (
+    Game,
+    ChaseSystem,
+    Entities,
+    CHUNK_SIZE,
+    CHUNK_AREA,
+    PICKUP,
+    POSITION,
+    TILE,
+)
+from difficulty import Curve, SCORE
+from audio import STAR
 
 
 class CollectStars(Game):
@@ -13,6 +21,13 @@ class CollectStars(Game):
     WALL_CHAR = "&"
     END_CHAR = "E"
     EMPTY_CHAR = " "
+    # Tiles the player may step onto
+    PLAYER_PASSABLE = (EMPTY_CHAR, END_CHAR, STAR_CHAR)
+    # Tiles a zombie hides rather than overwrites
+    ZOMBIE_HIDDEN = (END_CHAR, STAR_CHAR)
+    # Zombies speed up with every other star, to at most a step every 400 ms
+    DIFFICULTY = (Curve("update_period", -50, 20, 400, SCORE),)
+    SURVIVAL_TICKS = 60
 
     def __init__(
         self,
@@ -26,7 +41,8 @@ class CollectStars(Game):
         """
         Initialize the Collect Stars game with specific settings.
 
-        :param map_width: Width of the game map in cells.
+        :param map_width: Width of the game map in cells. Maps larger than the
+            screen scroll with the player and are generated in chunks.
         :param map_height: Height of the game map in cells.
         :param num_zombies: Number of zombies to place on the map.
         :param num_walls: Number of internal walls/obstacles.
@@ -36,56 +52,111 @@ class CollectStars(Game):
         super().__init__(map_width, map_height, update_period=zombie_move_period)
         self.player_pos = (self.map_height - 2, 1)
         self.goal_pos = (1, self.map_width - 2)
-        self.zombies = []
-        self.stars = []
+        self.use_entities(num_zombies + num_stars)
+        self.chase = self.entities.add_system(
+            ChaseSystem(num_zombies, map_width, map_height, self.ZOMBIE_HIDDEN)
+        )
+        # The chase kernel also holds the walls zombies walk around
+        self.zombies = self.chase.swarm
         self.num_zombies = num_zombies
         self.num_walls = num_walls
         self.num_stars = num_stars
+        self.level_seed = 0
+        self.wall_density = 0
+
+    @classmethod
+    def memory_budget(cls, params):
+        """
+        Add the zombie arrays and the entities of zombies and stars to the
+        budget of the map.
+        """
+        width = params.get("map_width", 16)
+        height = params.get("map_height", 8)
+        num_zombies = params.get("num_zombies", 2)
+        return (
+            cls.base_budget(width, height)
+            + Entities.budget(num_zombies + params.get("num_stars", 5))
+            + ChaseSystem.budget(num_zombies, width, height)
+        )
 
     def custom_randrange(self, a, b):
         """
-        Custom randrange using random.getrandbits.
+        Custom randrange using Game.random_below.
 
         :param a: Start of range (inclusive).
         :param b: End of range (exclusive).
         :return: Random integer between a and b-1.
         """
-        return a + (random.getrandbits(16) % (b - a))
+        return a + self.random_below(b - a)
 
     def initialize_game(self):
         """
         Initialize the game state: map, player, goal, zombies, walls, and stars.
         """
+        if not self.fits_screen():
+            self.level_seed = self.random_bits(15)
+            interior = (self.map_width - 2) * (self.map_height - 2)
+            self.wall_density = self.num_walls * 1024 // interior
+            self.use_world(self.generate_chunk)
+            self.focus(*self.player_pos)
         self.init_map()
         self.place_player()
         self.place_goal()
         self.place_zombies()
         self.place_walls()
         self.place_stars()
-        self.render()
+        self.mark_dirty()
 
     def init_map(self):
         """
         Initialize the game map with empty spaces and borders.
+        Large maps are generated chunk by chunk instead.
         """
+        if self.world is not None:
+            return
         self.game_map = [
             [self.EMPTY_CHAR for _ in range(self.map_width)]
             for _ in range(self.map_height)
         ]
 
+    def generate_chunk(self, chunk_y, chunk_x, chunk):
+        """
+        Generate one chunk of a large map with scattered walls, derived from
+        the level seed so that it comes out the same every time.
+        """
+        wall = ord(self.WALL_CHAR)
+        empty = ord(self.EMPTY_CHAR)
+        bottom = self.map_height - 1
+        right = self.map_width - 1
+        state = (self.level_seed ^ (chunk_y * 251 + chunk_x) * 97) & 0x7FFF
+        for i in range(CHUNK_AREA):
+            y = chunk_y * CHUNK_SIZE + i // CHUNK_SIZE
+            x = chunk_x * CHUNK_SIZE + i % CHUNK_SIZE
+            state = (state * 2053 + 13849) & 0x7FFF
+            if (
+                0 < y < bottom
+                and 0 < x < right
+                and (state >> 5) < self.wall_density
+                and (y, x) != self.player_pos
+                and (y, x) != self.goal_pos
+            ):
+                chunk[i] = wall
+            else:
+                chunk[i] = empty
+
     def place_player(self):
         """
         Place the player character on the map.
         """
         y, x = self.player_pos
-        self.game_map[y][x] = self.PLAYER_CHAR
+        self.set_cell(y, x, self.PLAYER_CHAR)
 
     def place_goal(self):
         """
         Place the goal on the map.
         """
         y, x = self.goal_pos
-        self.game_map[y][x] = self.END_CHAR
+        self.set_cell(y, x, self.END_CHAR)
 
     def place_zombies(self):
         """
@@ -96,29 +167,34 @@ class CollectStars(Game):
                 y = self.custom_randrange(1, self.map_height - 1)
                 x = self.custom_randrange(1, self.map_width - 1)
                 if (
-                    self.game_map[y][x] == self.EMPTY_CHAR
+                    self.get_cell(y, x) == self.EMPTY_CHAR
                     and (y, x) != self.player_pos
                     and (y, x) != self.goal_pos
                 ):
-                    self.game_map[y][x] = self.ZOMBIE_CHAR
-                    self.zombies.append([y, x])
+                    self.chase.add(self, y, x, self.ZOMBIE_CHAR)
                     break
 
     def place_walls(self):
         """
         Randomly place internal walls/obstacles on the map.
+        On large maps the walls come from the chunk generator and are only
+        registered with the zombies.
         """
+        if self.world is not None:
+            for y, x in self.world.generated(self.WALL_CHAR):
+                self.zombies.set_wall(y, x)
+            return
         for _ in range(self.num_walls):
             while True:
                 y = self.custom_randrange(1, self.map_height - 1)
                 x = self.custom_randrange(1, self.map_width - 1)
                 if (
-                    self.game_map[y][x] == self.EMPTY_CHAR
+                    self.get_cell(y, x) == self.EMPTY_CHAR
                     and (y, x) != self.player_pos
                     and (y, x) != self.goal_pos
-                    and [y, x] not in self.zombies
                 ):
-                    self.game_map[y][x] = self.WALL_CHAR
+                    self.set_cell(y, x, self.WALL_CHAR)
+                    self.zombies.set_wall(y, x)
                     break
 
     def place_stars(self):
@@ -130,14 +206,13 @@ class CollectStars(Game):
                 y = self.custom_randrange(1, self.map_height - 1)
                 x = self.custom_randrange(1, self.map_width - 1)
                 if (
-                    self.game_map[y][x] == self.EMPTY_CHAR
+                    self.get_cell(y, x) == self.EMPTY_CHAR
                     and (y, x) != self.player_pos
                     and (y, x) != self.goal_pos
-                    and [y, x] not in self.zombies
-                    and [y, x] not in self.stars
                 ):
-                    self.game_map[y][x] = self.STAR_CHAR
-                    self.stars.append([y, x])
+                    mask = POSITION | TILE | PICKUP
+                    self.entities.create(mask, y, x, self.STAR_CHAR)
+                    self.set_cell(y, x, self.STAR_CHAR)
                     break
 
     def handle_input(self, direction):
@@ -159,86 +234,30 @@ class CollectStars(Game):
 
         # Check boundaries and walls
         if 0 < new_y < self.map_height - 1 and 0 < new_x < self.map_width - 1:
-            if self.game_map[new_y][new_x] in [
-                self.EMPTY_CHAR,
-                self.END_CHAR,
-                self.STAR_CHAR,
-            ]:
-                self.game_map[y][x] = self.EMPTY_CHAR
-                if self.game_map[new_y][new_x] == self.END_CHAR:
+            target = self.get_cell(new_y, new_x)
+            if target in self.PLAYER_PASSABLE:
+                self.set_cell(y, x, self.EMPTY_CHAR)
+                if target == self.END_CHAR:
                     self.game_win_flag = True
-                elif self.game_map[new_y][new_x] == self.STAR_CHAR:
+                elif target == self.STAR_CHAR:
                     self.score += 10  # Increment score for collecting a star
-                    self.stars.remove([new_y, new_x])
+                    self.entities.destroy(self.entities.find(new_y, new_x, PICKUP))
+                    self.play_sound(STAR)
                 self.player_pos = (new_y, new_x)
-                self.game_map[new_y][new_x] = self.PLAYER_CHAR
+                self.set_cell(new_y, new_x, self.PLAYER_CHAR)
+                self.focus(new_y, new_x)
+                self.mark_dirty()
 
     def update_state(self, timer):
         """
         Move zombies towards the player each timer tick.
         """
-        new_zombies = []
-        for z in self.zombies:
-            y, x = z
-            dy = self.player_pos[0] - y
-            dx = self.player_pos[1] - x
-            move_y = dy // abs(dy) if dy != 0 else 0
-            move_x = dx // abs(dx) if dx != 0 else 0
-            new_y = y + move_y
-            new_x = x + move_x
-
-            # Check boundaries and walls
-            if not (0 < new_y < self.map_height - 1 and 0 < new_x < self.map_width - 1):
-                new_y, new_x = y, x  # Zombie stays
-            elif self.game_map[new_y][new_x] == self.WALL_CHAR:
-                new_y, new_x = y, x  # Zombie stays
-
-            # Check collision with player
-            if (new_y, new_x) == self.player_pos:
-                self.game_over_flag = True
-
-            # Update zombie position
-            if self.game_map[new_y][new_x] in [
-                self.EMPTY_CHAR,
-                self.PLAYER_CHAR,
-                self.END_CHAR,
-                self.STAR_CHAR,
-            ]:
-                self.game_map[y][x] = self.EMPTY_CHAR
-                if self.game_map[new_y][new_x] not in [self.END_CHAR, self.STAR_CHAR]:
-                    self.game_map[new_y][new_x] = self.ZOMBIE_CHAR
-                z[0], z[1] = new_y, new_x
-                new_zombies.append(z)
-            else:
-                new_zombies.append(z)
-        self.zombies = new_zombies
+        self.entities.run(self)
         self.score += 1
-        self.render()
+        self.mark_dirty()
 
     def render(self):
         """
         Render the current game state to the display.
         """
-        self.display.update_display(self.game_map, self.score)
-
-    def game_over_screen(self):
-        """
-        Display the game over screen and reset the device after a delay.
-        """
-        self.display.clear()
-        self.display.draw_text("GAME OVER", 30, 20)
-        self.display.draw_text(f"Score: {self.score}", 30, 30)
-        self.display.show()
-        time.sleep(3)
-        machine.reset()
-
-    def game_win_screen(self):
-        """
-        Display the game win screen and reset the device after a delay.
-        """
-        self.display.clear()
-        self.display.draw_text("YOU WIN!", 35, 20)
-        self.display.draw_text(f"Score: {self.score}", 35, 30)
-        self.display.show()
-        time.sleep(3)
-        machine.reset()
+        self.draw_map()
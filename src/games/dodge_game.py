@@ -1,8 +1,17 @@
 # dodge_game.py
 
-from game_framework import Game
-import random
-import machine
+from game_framework import (
+    Game,
+    Entities,
+    MoveSystem,
+    RENDER_ALWAYS,
+    POSITION,
+    VELOCITY,
+    TILE,
+)
+from display_module import CELL_TEXT
+from audio import CRASH
+from difficulty import Curve, SCORE
 import time
 
 
@@ -20,6 +29,24 @@ class DodgeGame(Game):
     WALL_CHAR = "#"  # Wall or boundary representation
     EMPTY_CHAR = " "  # Empty space
 
+    # 8x8 sprites in MONO_VLSB layout, one byte per column
+    PLAYER_SPRITE = b"\xc0\xf0\xfc\xff\xff\xfc\xf0\xc0"
+    OBJECT_SPRITE = b"\x00\x3c\x7e\x7e\x7e\x7e\x3c\x00"
+    WALL_SPRITE = b"\xaa\x55\xaa\x55\xaa\x55\xaa\x55"
+    # 4x4 versions for small panels
+    PLAYER_SPRITE_4 = b"\x0c\x0f\x0f\x0c"
+    OBJECT_SPRITE_4 = b"\x06\x0f\x0f\x06"
+    WALL_SPRITE_4 = b"\x05\x0a\x05\x0a"
+
+    # Sprites are blitted on every frame
+    CPU_FREQ = 160000000
+    # Reaction time decides the round: held buttons repeat quickly
+    REPEAT_DELAY_MS = 120
+    REPEAT_RATE_MS = 50
+    # Objects fall faster every 10 points, down to 150 ms a cell
+    DIFFICULTY = (Curve("update_period", -15, 10, 150, SCORE),)
+    SURVIVAL_TICKS = 300
+
     def __init__(
         self,
         map_width=16,
@@ -27,6 +54,7 @@ class DodgeGame(Game):
         num_walls=1,
         object_spawn_interval=1,  # Reduced interval for testing
         object_fall_speed=1,
+        num_players=1,
     ):
         """
         Initialize the DodgeGame with specific settings.
@@ -36,18 +64,43 @@ class DodgeGame(Game):
         :param num_walls: Number of walls to place on each side.
         :param object_spawn_interval: Time interval (in seconds) between object spawns.
         :param object_fall_speed: Number of cells an object falls per update.
+        :param num_players: Number of players sharing the bottom row (netplay).
         """
         super().__init__(map_width, map_height, update_period=300)
-        self.player_pos = (
-            self.map_height - 1,
-            self.map_width // 2,
-        )
-        self.objects = []
+        # Players spread evenly along the bottom row
+        self.players = [
+            (self.map_height - 1, self.map_width * (p + 1) // (num_players + 1))
+            for p in range(num_players)
+        ]
+        # At most one object spawns per tick and each falls off the map
+        # within map_height ticks
+        self.use_entities(self.map_height + 4)
+        self.entities.add_system(MoveSystem())
         self.score = 0
         self.num_walls = num_walls
         self.object_spawn_interval = object_spawn_interval
         self.object_fall_speed = object_fall_speed
-        self.last_spawn_time = time.ticks_ms()
+        # Spawns are counted in ticks so that netplay peers agree on them
+        self.ticks_since_spawn = 0
+        # Falling objects glide between cells, so draw every frame
+        self.set_render_policy(RENDER_ALWAYS)
+
+    @classmethod
+    def memory_budget(cls, params):
+        """
+        Add the falling objects to the budget of the map.
+        """
+        width = params.get("map_width", 16)
+        height = params.get("map_height", 8)
+        return cls.base_budget(width, height) + Entities.budget(height + 4)
+
+    @property
+    def player_pos(self):
+        return self.players[0]
+
+    @player_pos.setter
+    def player_pos(self, pos):
+        self.players[0] = pos
 
     def initialize_game(self, initial_objects=3):
         """
@@ -57,7 +110,7 @@ class DodgeGame(Game):
         self.place_player()
         for _ in range(initial_objects):
             self.spawn_object()
-        self.render()
+        self.mark_dirty()
 
     def init_map(self):
         """
@@ -76,14 +129,14 @@ class DodgeGame(Game):
 
     def place_player(self):
         """
-        Place the player character on the map.
+        Place the player characters on the map.
         """
-        y, x = self.player_pos
-        self.game_map[y][x] = self.PLAYER_CHAR
+        for y, x in self.players:
+            self.set_cell(y, x, self.PLAYER_CHAR)
 
     def custom_randrange(self, start, stop=None, step=1):
         """
-        Emulate Python's randrange function using random.getrandbits().
+        Emulate Python's randrange function using Game.random_below().
 
         :param start: Start of range (inclusive).
         :param stop: End of range (exclusive). If None, start is treated as stop and start is set to 0.
@@ -98,7 +151,7 @@ class DodgeGame(Game):
         if range_size <= 0:
             raise ValueError("Empty range for randrange")
 
-        random_value = random.getrandbits(16) % range_size
+        random_value = self.random_below(range_size)
         return start + step * random_value
 
     def custom_randint(self, start, stop):
@@ -116,22 +169,22 @@ class DodgeGame(Game):
         Spawn a new falling object at a random horizontal position.
         """
 
+        if not self.can_add_entity():
+            return
+
         min_x = self.num_walls
         max_x = self.map_width - self.num_walls - 1
         x = self.custom_randrange(min_x, max_x + 1)
         y = 0
 
-        # Avoid spawning on the player
-        if (y, x) == self.player_pos:
+        # Avoid spawning on a player or an existing object
+        if self.get_cell(y, x) != self.EMPTY_CHAR:
             return
 
-        # Avoid spawning on existing objects
-        for obj in self.objects:
-            if obj["x"] == x and obj["y"] == y:
-                return
-
-        self.objects.append({"y": y, "x": x})
-        self.game_map[y][x] = self.OBJECT_CHAR
+        mask = POSITION | VELOCITY | TILE
+        dy = self.object_fall_speed
+        if self.entities.create(mask, y, x, self.OBJECT_CHAR, dy) >= 0:
+            self.set_cell(y, x, self.OBJECT_CHAR)
 
     def handle_input(self, direction):
         """
@@ -139,7 +192,16 @@ class DodgeGame(Game):
 
         :param direction: Direction input by the player
         """
-        y, x = self.player_pos
+        self.handle_player_input(0, direction)
+
+    def handle_player_input(self, player, direction):
+        """
+        Move one of the players left or right.
+
+        :param player: Index of the player.
+        :param direction: Direction input by that player.
+        """
+        y, x = self.players[player]
         new_x = x
 
         if direction == "left":
@@ -151,10 +213,16 @@ class DodgeGame(Game):
         min_x = self.num_walls
         max_x = self.map_width - self.num_walls - 1
 
-        if min_x <= new_x <= max_x:
-            self.game_map[y][x] = self.EMPTY_CHAR
-            self.player_pos = (y, new_x)
-            self.game_map[y][new_x] = self.PLAYER_CHAR
+        if min_x <= new_x <= max_x and (y, new_x) not in self.players:
+            # Stepping into a falling object is a collision, not a pass
+            if self.get_cell(y, new_x) == self.OBJECT_CHAR:
+                self.game_over_flag = True
+                self.play_sound(CRASH)
+                return
+            self.set_cell(y, x, self.EMPTY_CHAR)
+            self.players[player] = (y, new_x)
+            self.set_cell(y, new_x, self.PLAYER_CHAR)
+            self.mark_dirty()
 
     def update_state(self, timer):
         """
@@ -162,93 +230,123 @@ class DodgeGame(Game):
 
         :param timer: Timer tick (unused).
         """
-        current_time = time.ticks_ms()
-
         # Spawn new object at intervals
+        self.ticks_since_spawn += 1
         if (
-            time.ticks_diff(current_time, self.last_spawn_time)
+            self.ticks_since_spawn * self.update_period
             > self.object_spawn_interval * 1000
         ):
             self.spawn_object()
-            self.last_spawn_time = current_time
-
-        # Move objects
-        objects_to_remove = []
-        for obj in self.objects:
-            y = obj["y"]
-            x = obj["x"]
-
-            # Clear current position
-            self.game_map[y][x] = self.EMPTY_CHAR
+            self.ticks_since_spawn = 0
 
-            # Move object down by fall_speed
-            new_y = y + self.object_fall_speed
+        # Move the objects down by their fall speed
+        self.entities.run(self)
 
-            if new_y >= self.map_height:
-                self.score += 1
-                objects_to_remove.append(obj)
-                continue
+        # Redraw the updated state on the next frame
+        self.mark_dirty()
 
-            # Check collision with player
-            if (new_y, x) == self.player_pos:
-                self.game_over_flag = True
-                return
+    def entity_left(self, e):
+        """
+        An object fell past the bottom: one more point.
+        """
+        self.score += 1
+        self.entities.destroy(e)
 
-            # Place object in new position
-            if self.game_map[new_y][x] == self.EMPTY_CHAR:
-                self.game_map[new_y][x] = self.OBJECT_CHAR
-                obj["y"] = new_y
-            else:
-                # Collision with another object or wall
-                self.game_over_flag = True
-                return
+    def entity_blocked(self, e, tile):
+        """
+        An object fell onto a player, a wall or another object.
+        """
+        if not self.game_over_flag:
+            self.play_sound(CRASH)
+        self.game_over_flag = True
 
-        # Remove objects that have fallen past the bottom
-        for obj in objects_to_remove:
-            self.objects.remove(obj)
+    def save_state(self):
+        """
+        Capture the players, objects, score and random state for netplay.
+        """
+        return (
+            tuple(self.players),
+            self.entities.save(),
+            self.score,
+            self.game_over_flag,
+            self.ticks_since_spawn,
+            self.rng.state if self.rng is not None else 0,
+        )
 
-        # Render the updated state after all updates
-        self.render()
+    def load_state(self, state):
+        """
+        Restore a state from save_state() and rebuild the map from it.
+        """
+        players, objects, self.score, self.game_over_flag, spawn, seed = state
+        self.players[:] = players
+        self.entities.load(objects)
+        self.ticks_since_spawn = spawn
+        if self.rng is not None:
+            self.rng.state = seed
+        self.init_map()
+        self.place_player()
+        entities = self.entities
+        for e in range(entities.end):
+            if entities.masks[e]:
+                self.set_cell(entities.ys[e], entities.xs[e], chr(entities.tiles[e]))
+        self.mark_dirty()
 
     def render(self):
         """
         Render the current game state to the display.
+
+        Objects are drawn pixel by pixel on their way to the next cell,
+        according to how much of the update period has passed.
         """
         self.display.clear()
-
-        # Draw the game map
+        canvas = self.display.canvas
+        cell = self.display.cell
+        if cell == CELL_TEXT:
+            player = self.PLAYER_SPRITE
+            obj = self.OBJECT_SPRITE
+            wall_sprite = self.WALL_SPRITE
+        else:
+            player = self.PLAYER_SPRITE_4
+            obj = self.OBJECT_SPRITE_4
+            wall_sprite = self.WALL_SPRITE_4
+
+        # Progress towards the next update, in pixels of fall
+        remaining = time.ticks_diff(self.next_tick_ms, time.ticks_ms())
+        if remaining < 0:
+            remaining = 0
+        elif remaining > self.update_period:
+            remaining = self.update_period
+        fall = (
+            (self.update_period - remaining) * cell * self.object_fall_speed
+        ) // self.update_period
+
+        # Walls never move
         for y in range(self.map_height):
-            for x in range(self.map_width):
-                char = self.game_map[y][x]
-                if char == self.OBJECT_CHAR:
-                    self.display.draw_text(char, x * 8, y * 8)
-                elif char == self.PLAYER_CHAR:
-                    self.display.draw_text(char, x * 8, y * 8)
-                elif char == self.WALL_CHAR:
-                    self.display.draw_text(char, x * 8, y * 8)
-                # No need to draw EMPTY_CHAR
-
-        # Draw the score
-        score_text = f"Score: {self.score}"
-        self.display.draw_text(score_text, 0, 0)
+            for wall in range(self.num_walls):
+                canvas.blit(wall_sprite, cell, cell, wall * cell, y * cell)
+                canvas.blit(
+                    wall_sprite,
+                    cell,
+                    cell,
+                    (self.map_width - 1 - wall) * cell,
+                    y * cell,
+                )
+
+        # Walk the slots rather than query(): a tick may run mid-frame
+        entities = self.entities
+        for e in range(entities.end):
+            if entities.masks[e] & VELOCITY:
+                x = entities.xs[e] * cell
+                y = entities.ys[e] * cell + fall
+                canvas.blit(obj, cell, cell, x, y)
+
+        for y, x in self.players:
+            canvas.blit(player, cell, cell, x * cell, y * cell)
+
+        # Draw the score over the top row, or on the score panel
+        if self.display.hud is not None:
+            self.display.draw_score(self.score)
+        else:
+            self.display.draw_text(f"Score: {self.score}", 0, 0)
 
         self.display.show()
-
-    def game_over_screen(self):
-        """
-        Display the game over screen with the final score and reset after a delay.
-        """
-        self.display.clear()
-        game_over_text = "GAME OVER"
-        score_text = f"Final Score: {self.score}"
-        self.display.draw_text(game_over_text, 20, 25)
-        self.display.draw_text(score_text, 20, 35)
-        self.display.show()
-        time.sleep(3)
-        machine.reset()
-
-    def game_win_screen(self):
-        """
-        TODO: Implement a game win screen
-        """
-        pass
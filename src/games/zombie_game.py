@@ -1,9 +1,9 @@
 # zombie_game.py
 
-from game_framework import Game
-import random
-import machine
-import time
+from game_framework import Game, ChaseSystem, Entities, CHUNK_SIZE, CHUNK_AREA
+from assets import TileMap
+from difficulty import Curve
+from memory import heap_bytes
 
 
 class ZombieGame(Game):
@@ -13,6 +13,13 @@ class ZombieGame(Game):
     WALL_CHAR = "#"
     EMPTY_CHAR = " "
     DISABLE_BORDERS = True
+    # Tiles the player may step onto
+    PLAYER_PASSABLE = (EMPTY_CHAR, END_CHAR)
+    # Tiles a zombie hides rather than overwrites
+    ZOMBIE_HIDDEN = (END_CHAR,)
+    # Zombies speed up every 30 ticks, to at most a step every 400 ms
+    DIFFICULTY = (Curve("update_period", -50, 30, 400),)
+    SURVIVAL_TICKS = 60
 
     def __init__(
         self,
@@ -21,52 +28,127 @@ class ZombieGame(Game):
         num_zombies=3,
         num_walls=5,
         zombie_move_period=1000,
+        level=None,
     ):
         """
         Initialize the Zombie Game with specific settings.
 
-        :param map_width: Width of the game map in cells.
+        :param map_width: Width of the game map in cells. Maps larger than the
+            screen scroll with the player and are generated in chunks.
         :param map_height: Height of the game map in cells.
         :param num_zombies: Number of zombies to place on the map.
         :param num_walls: Number of internal walls/obstacles.
         :param zombie_move_period: Period (in milliseconds) for zombie movements.
+        :param level: Path of a tile map asset (see assets.py) to play instead
+            of a random map. It sets the map size and holds the walls and
+            border; "P", "E" and "Z" mark the player, the exit and the zombies.
         """
+        self.tiles = None
+        self.zombie_starts = None
+        if level is not None:
+            self.tiles = TileMap(
+                level, self.PLAYER_CHAR + self.END_CHAR + self.ZOMBIE_CHAR
+            )
+            map_width = self.tiles.width
+            map_height = self.tiles.height
+            self.zombie_starts = self.tiles.positions(self.ZOMBIE_CHAR)
+            num_zombies = len(self.zombie_starts)
         super().__init__(map_width, map_height, update_period=zombie_move_period)
         self.player_pos = (self.map_height - 2, 1)
         self.goal_pos = (1, self.map_width - 2)
-        self.zombies = []
+        if self.tiles is not None:
+            for pos in self.tiles.positions(self.PLAYER_CHAR)[:1]:
+                self.player_pos = pos
+            for pos in self.tiles.positions(self.END_CHAR)[:1]:
+                self.goal_pos = pos
+        self.use_entities(num_zombies)
+        self.chase = self.entities.add_system(
+            ChaseSystem(num_zombies, map_width, map_height, self.ZOMBIE_HIDDEN)
+        )
+        # The chase kernel also holds the walls zombies walk around
+        self.zombies = self.chase.swarm
         self.num_zombies = num_zombies
         self.num_walls = num_walls
+        self.level_seed = 0
+        self.wall_density = 0
+
+    @classmethod
+    def memory_budget(cls, params):
+        """
+        Add the zombie arrays, and for a level the open tile map and the
+        zombie starts, to the budget of a map of that size.
+        """
+        num_zombies = params.get("num_zombies", 3)
+        level = params.get("level")
+        extra = 0
+        if level is None:
+            width = params.get("map_width", 16)
+            height = params.get("map_height", 8)
+        else:
+            tiles = TileMap(level)
+            try:
+                width = tiles.width
+                height = tiles.height
+                num_zombies = len(tiles.positions(cls.ZOMBIE_CHAR))
+            finally:
+                tiles.close()
+            extra = (
+                TileMap.budget(width, height)
+                + heap_bytes(4 * num_zombies)
+                + num_zombies * heap_bytes(8)
+            )
+        return (
+            cls.base_budget(width, height)
+            + extra
+            + Entities.budget(num_zombies)
+            + ChaseSystem.budget(num_zombies, width, height)
+        )
 
     def custom_randrange(self, a, b):
         """
-        Custom randrange using random.getrandbits.
+        Custom randrange using Game.random_below.
 
         :param a: Start of range (inclusive).
         :param b: End of range (exclusive).
         :return: Random integer between a and b-1.
         """
-        return a + (random.getrandbits(16) % (b - a))
+        return a + self.random_below(b - a)
 
     def initialize_game(self):
         """
         Initialize the game state: map, player, goal, zombies, and walls.
         """
+        if self.tiles is not None:
+            if not self.fits_screen():
+                self.use_world(self.load_chunk)
+                self.focus(*self.player_pos)
+        elif not self.fits_screen():
+            self.level_seed = self.random_bits(15)
+            interior = (self.map_width - 2) * (self.map_height - 2)
+            self.wall_density = self.num_walls * 1024 // interior
+            self.use_world(self.generate_chunk)
+            self.focus(*self.player_pos)
         self.init_map()
         self.place_player()
         self.place_goal()
         self.place_zombies()
         self.place_walls()
-        self.render()
+        self.mark_dirty()
 
     def init_map(self):
         """
         Initialize the game map with empty spaces and borders.
+        Large maps are generated chunk by chunk instead.
         """
+        if self.world is not None:
+            return
         self.game_map = [
             [self.EMPTY_CHAR for _ in range(self.map_width)]
             for _ in range(self.map_height)
         ]
+        if self.tiles is not None:
+            self.tiles.load(self.game_map)
+            return
         # Borders in the user area
         if self.DISABLE_BORDERS:
             for y in range(self.map_height):
@@ -76,52 +158,94 @@ class ZombieGame(Game):
                 self.game_map[0][x] = self.WALL_CHAR
                 self.game_map[self.map_height - 1][x] = self.WALL_CHAR
 
+    def generate_chunk(self, chunk_y, chunk_x, chunk):
+        """
+        Generate one chunk of a large map: borders and scattered walls,
+        derived from the level seed so that it comes out the same every time.
+        """
+        wall = ord(self.WALL_CHAR)
+        empty = ord(self.EMPTY_CHAR)
+        bottom = self.map_height - 1
+        right = self.map_width - 1
+        state = (self.level_seed ^ (chunk_y * 251 + chunk_x) * 97) & 0x7FFF
+        for i in range(CHUNK_AREA):
+            y = chunk_y * CHUNK_SIZE + i // CHUNK_SIZE
+            x = chunk_x * CHUNK_SIZE + i % CHUNK_SIZE
+            state = (state * 2053 + 13849) & 0x7FFF
+            if y == 0 or x == 0 or y == bottom or x == right:
+                chunk[i] = wall if self.DISABLE_BORDERS else empty
+            elif (state >> 5) < self.wall_density and (y, x) != self.player_pos:
+                chunk[i] = wall if (y, x) != self.goal_pos else empty
+            else:
+                chunk[i] = empty
+
+    def load_chunk(self, chunk_y, chunk_x, chunk):
+        """
+        Read one chunk of a large level from its asset file.
+        """
+        self.tiles.read_block(chunk_y, chunk_x, chunk, CHUNK_SIZE)
+
     def place_player(self):
         """
         Place the player character on the map.
         """
         y, x = self.player_pos
-        self.game_map[y][x] = self.PLAYER_CHAR
+        self.set_cell(y, x, self.PLAYER_CHAR)
 
     def place_goal(self):
         """
         Place the goal on the map.
         """
         y, x = self.goal_pos
-        self.game_map[y][x] = self.END_CHAR
+        self.set_cell(y, x, self.END_CHAR)
 
     def place_zombies(self):
         """
         Randomly place zombies on the map, avoiding the player and goal positions.
         """
+        if self.zombie_starts is not None:
+            for y, x in self.zombie_starts:
+                self.chase.add(self, y, x, self.ZOMBIE_CHAR)
+            return
         for _ in range(self.num_zombies):
             while True:
                 y = self.custom_randrange(1, self.map_height - 1)
                 x = self.custom_randrange(1, self.map_width - 1)
                 if (
-                    self.game_map[y][x] == self.EMPTY_CHAR
+                    self.get_cell(y, x) == self.EMPTY_CHAR
                     and (y, x) != self.player_pos
                     and (y, x) != self.goal_pos
                 ):
-                    self.game_map[y][x] = self.ZOMBIE_CHAR
-                    self.zombies.append([y, x])
+                    self.chase.add(self, y, x, self.ZOMBIE_CHAR)
                     break
 
     def place_walls(self):
         """
         Randomly place internal walls/obstacles on the map.
+        On large maps the walls come from the chunk generator and are only
+        registered with the zombies.
         """
+        if self.world is not None:
+            for y, x in self.world.generated(self.WALL_CHAR):
+                self.zombies.set_wall(y, x)
+            return
+        if self.tiles is not None:
+            for y in range(self.map_height):
+                for x in range(self.map_width):
+                    if self.game_map[y][x] == self.WALL_CHAR:
+                        self.zombies.set_wall(y, x)
+            return
         for _ in range(self.num_walls):
             while True:
                 y = self.custom_randrange(1, self.map_height - 1)
                 x = self.custom_randrange(1, self.map_width - 1)
                 if (
-                    self.game_map[y][x] == self.EMPTY_CHAR
+                    self.get_cell(y, x) == self.EMPTY_CHAR
                     and (y, x) != self.player_pos
                     and (y, x) != self.goal_pos
-                    and [y, x] not in self.zombies
                 ):
-                    self.game_map[y][x] = self.WALL_CHAR
+                    self.set_cell(y, x, self.WALL_CHAR)
+                    self.zombies.set_wall(y, x)
                     break
 
     def handle_input(self, direction):
@@ -143,78 +267,31 @@ class ZombieGame(Game):
 
         # Check boundaries and walls
         if 0 < new_y < self.map_height - 1 and 0 < new_x < self.map_width - 1:
-            if self.game_map[new_y][new_x] in [self.EMPTY_CHAR, self.END_CHAR]:
-                self.game_map[y][x] = self.EMPTY_CHAR
-                if self.game_map[new_y][new_x] == self.END_CHAR:
+            target = self.get_cell(new_y, new_x)
+            if target in self.PLAYER_PASSABLE:
+                self.set_cell(y, x, self.EMPTY_CHAR)
+                if target == self.END_CHAR:
                     self.game_win_flag = True
                 self.player_pos = (new_y, new_x)
-                self.game_map[new_y][new_x] = self.PLAYER_CHAR
+                self.set_cell(new_y, new_x, self.PLAYER_CHAR)
+                self.focus(new_y, new_x)
+                self.mark_dirty()
 
     def update_state(self, timer):
         """
         Move zombies towards the player each timer tick.
         """
-        new_zombies = []
-        for z in self.zombies:
-            y, x = z
-            dy = self.player_pos[0] - y
-            dx = self.player_pos[1] - x
-            move_y = dy // abs(dy) if dy != 0 else 0
-            move_x = dx // abs(dx) if dx != 0 else 0
-            new_y = y + move_y
-            new_x = x + move_x
-
-            # Check boundaries and walls
-            if not (0 < new_y < self.map_height - 1 and 0 < new_x < self.map_width - 1):
-                new_y, new_x = y, x  # Zombie stays
-            elif self.game_map[new_y][new_x] == self.WALL_CHAR:
-                new_y, new_x = y, x  # Zombie stays
-
-            # Check collision with player
-            if (new_y, new_x) == self.player_pos:
-                self.game_over_flag = True
-
-            # Update zombie position
-            if self.game_map[new_y][new_x] in [
-                self.EMPTY_CHAR,
-                self.PLAYER_CHAR,
-                self.END_CHAR,
-            ]:
-                self.game_map[y][x] = self.EMPTY_CHAR
-                if self.game_map[new_y][new_x] != self.END_CHAR:
-                    self.game_map[new_y][new_x] = self.ZOMBIE_CHAR
-                z[0], z[1] = new_y, new_x
-                new_zombies.append(z)
-            else:
-                new_zombies.append(z)
-        self.zombies = new_zombies
+        self.entities.run(self)
         self.score += 1
-        self.render()
+        self.mark_dirty()
+
+    def finish(self):
+        super().finish()
+        if self.tiles is not None:
+            self.tiles.close()
 
     def render(self):
         """
         Render the current game state to the display.
         """
-        self.display.update_display(self.game_map, self.score)
-
-    def game_over_screen(self):
-        """
-        Display the game over screen and reset the device after a delay.
-        """
-        self.display.clear()
-        self.display.draw_text("GAME OVER", 30, 20)
-        self.display.draw_text(f"Score: {self.score}", 30, 30)
-        self.display.show()
-        time.sleep(3)
-        machine.reset()
-
-    def game_win_screen(self):
-        """
-        Display the game win screen and reset the device after a delay.
-        """
-        self.display.clear()
-        self.display.draw_text("YOU WIN!", 35, 20)
-        self.display.draw_text(f"Score: {self.score}", 35, 30)
-        self.display.show()
-        time.sleep(3)
-        machine.reset()
+        self.draw_map()
@@ -0,0 +1,307 @@
+# gfx.py
+
+import sys
+from array import array
+import micropython
+
+# Viper kernels only exist on the device; the host emulator uses the Python versions
+_VIPER = sys.implementation.name == "micropython"
+
+
+def _fill_rect_py(buf, args):
+    width = args[0]
+    x0 = args[1]
+    y0 = args[2]
+    x1 = args[3]
+    y1 = args[4]
+    c = args[5]
+    first = y0 >> 3
+    last = (y1 - 1) >> 3
+    page = first
+    while page <= last:
+        top = y0 & 7 if page == first else 0
+        bottom = ((y1 - 1) & 7) + 1 if page == last else 8
+        mask = (0xFF << top) & (0xFF >> (8 - bottom))
+        base = page * width
+        if c:
+            for i in range(base + x0, base + x1):
+                buf[i] |= mask
+        else:
+            mask ^= 0xFF
+            for i in range(base + x0, base + x1):
+                buf[i] &= mask
+        page += 1
+
+
+def _line_py(buf, args):
+    width = args[0]
+    height = args[1]
+    x0 = args[2]
+    y0 = args[3]
+    x1 = args[4]
+    y1 = args[5]
+    c = args[6]
+    dx = x1 - x0 if x1 > x0 else x0 - x1
+    dy = y0 - y1 if y1 > y0 else y1 - y0
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+    err = dx + dy
+    while True:
+        if 0 <= x0 < width and 0 <= y0 < height:
+            i = (y0 >> 3) * width + x0
+            if c:
+                buf[i] |= 1 << (y0 & 7)
+            else:
+                buf[i] &= 0xFF ^ (1 << (y0 & 7))
+        if x0 == x1 and y0 == y1:
+            return
+        e2 = err + err
+        if e2 >= dy:
+            err += dy
+            x0 += sx
+        if e2 <= dx:
+            err += dx
+            y0 += sy
+
+
+def _blit_py(buf, sprite, args):
+    width = args[0]
+    pages = (args[1] + 7) >> 3
+    sw = args[2]
+    spages = (args[3] + 7) >> 3
+    x = args[4]
+    y = args[5]
+    c = args[6]
+    shift = y & 7
+    i0 = -x if x < 0 else 0
+    i1 = width - x if x + sw > width else sw
+    for p in range(spages):
+        page = (y >> 3) + p
+        for i in range(i0, i1):
+            b = sprite[p * sw + i]
+            if not b:
+                continue
+            lo = (b << shift) & 0xFF
+            hi = b >> (8 - shift) if shift else 0
+            if 0 <= page < pages:
+                j = page * width + x + i
+                buf[j] = buf[j] | lo if c else buf[j] & (lo ^ 0xFF)
+            if hi and 0 <= page + 1 < pages:
+                j = (page + 1) * width + x + i
+                buf[j] = buf[j] | hi if c else buf[j] & (hi ^ 0xFF)
+
+
+if _VIPER:
+
+    @micropython.viper
+    def _fill_rect(buf: ptr8, args: ptr32):
+        width = int(args[0])
+        x0 = int(args[1])
+        y0 = int(args[2])
+        x1 = int(args[3])
+        y1 = int(args[4])
+        c = int(args[5])
+        first = y0 >> 3
+        last = (y1 - 1) >> 3
+        page = first
+        while page <= last:
+            top = 0
+            if page == first:
+                top = y0 & 7
+            bottom = 8
+            if page == last:
+                bottom = ((y1 - 1) & 7) + 1
+            mask = (0xFF << top) & (0xFF >> (8 - bottom))
+            i = page * width + x0
+            end = page * width + x1
+            if c:
+                while i < end:
+                    buf[i] = buf[i] | mask
+                    i += 1
+            else:
+                mask = mask ^ 0xFF
+                while i < end:
+                    buf[i] = buf[i] & mask
+                    i += 1
+            page += 1
+
+    @micropython.viper
+    def _line(buf: ptr8, args: ptr32):
+        width = int(args[0])
+        height = int(args[1])
+        x0 = int(args[2])
+        y0 = int(args[3])
+        x1 = int(args[4])
+        y1 = int(args[5])
+        c = int(args[6])
+        dx = x1 - x0
+        sx = 1
+        if dx < 0:
+            dx = 0 - dx
+            sx = -1
+        dy = y1 - y0
+        sy = 1
+        if dy < 0:
+            dy = 0 - dy
+            sy = -1
+        dy = 0 - dy
+        err = dx + dy
+        while True:
+            if 0 <= x0 and x0 < width and 0 <= y0 and y0 < height:
+                i = (y0 >> 3) * width + x0
+                bit = 1 << (y0 & 7)
+                if c:
+                    buf[i] = buf[i] | bit
+                else:
+                    buf[i] = buf[i] & (bit ^ 0xFF)
+            if x0 == x1 and y0 == y1:
+                break
+            e2 = err + err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+    @micropython.viper
+    def _blit(buf: ptr8, sprite: ptr8, args: ptr32):
+        width = int(args[0])
+        pages = (int(args[1]) + 7) >> 3
+        sw = int(args[2])
+        spages = (int(args[3]) + 7) >> 3
+        x = int(args[4])
+        y = int(args[5])
+        c = int(args[6])
+        shift = y & 7
+        i0 = 0
+        if x < 0:
+            i0 = 0 - x
+        i1 = sw
+        if x + sw > width:
+            i1 = width - x
+        p = 0
+        while p < spages:
+            page = (y >> 3) + p
+            i = i0
+            while i < i1:
+                b = int(sprite[p * sw + i])
+                if b:
+                    lo = (b << shift) & 0xFF
+                    hi = 0
+                    if shift:
+                        hi = b >> (8 - shift)
+                    if 0 <= page and page < pages:
+                        j = page * width + x + i
+                        if c:
+                            buf[j] = buf[j] | lo
+                        else:
+                            buf[j] = buf[j] & (lo ^ 0xFF)
+                    if hi and 0 <= page + 1 and page + 1 < pages:
+                        j = (page + 1) * width + x + i
+                        if c:
+                            buf[j] = buf[j] | hi
+                        else:
+                            buf[j] = buf[j] & (hi ^ 0xFF)
+                i += 1
+            p += 1
+
+else:
+    _fill_rect = _fill_rect_py
+    _line = _line_py
+    _blit = _blit_py
+
+
+class Canvas:
+    def __init__(self, fb):
+        """
+        Pixel drawing straight into an SSD1306 frame buffer.
+
+        Works on the MONO_VLSB bytearray behind the driver instead of going
+        through FrameBuffer.pixel(), using viper kernels on the device.
+
+        :param fb: SSD1306 driver instance whose buffer is drawn into.
+        """
+        self.buf = fb.buffer
+        self.width = fb.width
+        self.height = fb.height
+        # Kernel arguments are passed packed, viper functions take at most four
+        self.args = array("i", [0] * 7)
+
+    def fill_rect(self, x, y, w, h, c=1):
+        """
+        Fill a rectangle, clipped to the screen.
+
+        :param x: Left edge in pixels.
+        :param y: Top edge in pixels.
+        :param w: Width in pixels.
+        :param h: Height in pixels.
+        :param c: 1 to set the pixels, 0 to clear them.
+        """
+        x1 = min(x + w, self.width)
+        y1 = min(y + h, self.height)
+        x = max(x, 0)
+        y = max(y, 0)
+        if x >= x1 or y >= y1:
+            return
+        args = self.args
+        args[0] = self.width
+        args[1] = x
+        args[2] = y
+        args[3] = x1
+        args[4] = y1
+        args[5] = c
+        _fill_rect(self.buf, args)
+
+    def hline(self, x, y, w, c=1):
+        """
+        Draw a horizontal line `w` pixels long starting at (x, y).
+        """
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c=1):
+        """
+        Draw a vertical line `h` pixels long starting at (x, y).
+        """
+        self.fill_rect(x, y, 1, h, c)
+
+    def line(self, x0, y0, x1, y1, c=1):
+        """
+        Draw a line between two points with Bresenham's algorithm.
+        Pixels outside the screen are skipped.
+        """
+        args = self.args
+        args[0] = self.width
+        args[1] = self.height
+        args[2] = x0
+        args[3] = y0
+        args[4] = x1
+        args[5] = y1
+        args[6] = c
+        _line(self.buf, args)
+
+    def blit(self, sprite, w, h, x, y, c=1):
+        """
+        Draw a 1-bit sprite at any pixel position, clipped to the screen.
+
+        Set bits in the sprite are drawn, clear bits leave the screen as it
+        was. With c=0 the set bits are cleared instead, erasing the sprite.
+
+        :param sprite: Sprite bytes in MONO_VLSB layout, one byte per column per 8 rows.
+        :param w: Sprite width in pixels.
+        :param h: Sprite height in pixels.
+        :param x: Left edge in pixels.
+        :param y: Top edge in pixels.
+        :param c: 1 to draw, 0 to erase.
+        """
+        if x >= self.width or x + w <= 0 or y >= self.height or y + h <= 0:
+            return
+        args = self.args
+        args[0] = self.width
+        args[1] = self.height
+        args[2] = w
+        args[3] = h
+        args[4] = x
+        args[5] = y
+        args[6] = c
+        _blit(self.buf, sprite, args)
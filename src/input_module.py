@@ -3,29 +3,123 @@
 from machine import Pin
 import time
 
+# Button bits, in the order of DIRECTIONS
+LEFT = 1
+RIGHT = 2
+UP = 4
+DOWN = 8
+DIRECTIONS = ("left", "right", "up", "down")
+# Direction names for every combination of button bits, so that turning a
+# mask into names never allocates
+NAMES = tuple(
+    tuple(name for i, name in enumerate(DIRECTIONS) if mask >> i & 1)
+    for mask in range(1 << len(DIRECTIONS))
+)
+# Changes of a button within this many milliseconds of the last one are bounce
+DEBOUNCE_MS = 20
+# Holding a button repeats it after REPEAT_DELAY_MS, then every REPEAT_RATE_MS
+REPEAT_DELAY_MS = 200
+REPEAT_RATE_MS = 200
+
 
 class Input:
-    def __init__(self, pin_left=14, pin_right=12, pin_up=0, pin_down=13):
+    def __init__(
+        self,
+        pin_left=14,
+        pin_right=12,
+        pin_up=0,
+        pin_down=13,
+        repeat_delay=REPEAT_DELAY_MS,
+        repeat_rate=REPEAT_RATE_MS,
+    ):
+        """
+        Buttons read into bitmasks once per frame with scan().
+
+        After a scan, `held` has the bits of the buttons that are down,
+        `pressed` and `released` those that went down or up since the last
+        scan, and `triggered` those pressed or auto-repeated, which is what
+        movement usually wants.
+
+        :param repeat_delay: Milliseconds a button is held before it repeats,
+            0 for no auto-repeat.
+        :param repeat_rate: Milliseconds between repeats after that.
+        """
         self.buttons = {
             'left': Pin(pin_left, Pin.IN, Pin.PULL_UP),
             'right': Pin(pin_right, Pin.IN, Pin.PULL_UP),
             'up': Pin(pin_up, Pin.IN, Pin.PULL_UP),
             'down': Pin(pin_down, Pin.IN, Pin.PULL_UP),
         }
-        self.last_press = {
-            'left': 0,
-            'right': 0,
-            'up': 0,
-            'down': 0,
-        }
-        self.debounce_time = 200  # milliseconds
+        # Pins in bit order
+        self.pins = tuple(self.buttons[name] for name in DIRECTIONS)
+        self.repeat_delay = repeat_delay
+        self.repeat_rate = repeat_rate
+        self.held = 0
+        self.pressed = 0
+        self.released = 0
+        self.triggered = 0
+        self.last_change = [0] * len(DIRECTIONS)
+        self.next_repeat = [0] * len(DIRECTIONS)
+
+    def set_repeat(self, delay, rate):
+        """
+        Change the auto-repeat timing.
+
+        :param delay: Milliseconds before the first repeat, 0 to disable.
+        :param rate: Milliseconds between repeats.
+        """
+        self.repeat_delay = delay
+        self.repeat_rate = rate
+
+    def scan(self):
+        """
+        Read the buttons and update the masks. Call once per frame.
+
+        :return: The `triggered` mask.
+        """
+        now = time.ticks_ms()
+        held = self.held
+        pressed = 0
+        released = 0
+        repeated = 0
+        last_change = self.last_change
+        next_repeat = self.next_repeat
+        for i in range(len(DIRECTIONS)):
+            bit = 1 << i
+            down = not self.pins[i].value()
+            if down != bool(held & bit):
+                if time.ticks_diff(now, last_change[i]) < DEBOUNCE_MS:
+                    continue
+                last_change[i] = now
+                if down:
+                    pressed |= bit
+                    next_repeat[i] = time.ticks_add(now, self.repeat_delay)
+                else:
+                    released |= bit
+            elif (
+                down
+                and self.repeat_delay
+                and time.ticks_diff(now, next_repeat[i]) >= 0
+            ):
+                repeated |= bit
+                next_repeat[i] = time.ticks_add(now, self.repeat_rate)
+        self.held = (held | pressed) & ~released
+        self.pressed = pressed
+        self.released = released
+        self.triggered = pressed | repeated
+        return self.triggered
+
+    def chord(self, mask):
+        """
+        Check whether all the buttons in `mask` are held and the last of
+        them went down in this scan, so a chord fires once per press.
+        """
+        return self.held & mask == mask and self.pressed & mask != 0
 
     def get_pressed(self):
-        current_time = time.ticks_ms()
-        pressed = []
-        for direction, pin in self.buttons.items():
-            if not pin.value():
-                if time.ticks_diff(current_time, self.last_press[direction]) > self.debounce_time:
-                    pressed.append(direction)
-                    self.last_press[direction] = current_time
-        return pressed
\ No newline at end of file
+        """
+        Scan the buttons.
+
+        :return: Tuple of the triggered direction names.
+        """
+        return NAMES[self.scan()]
@@ -0,0 +1,110 @@
+# memory.py
+
+import gc
+import time
+
+# Run a controlled collection once this many bytes were allocated since the last one
+GC_STEP_BYTES = 2048
+# Only collect between ticks if at least this many milliseconds remain before the next one
+GC_SLACK_MS = 20
+# The MicroPython heap hands out memory in blocks of this many bytes
+HEAP_BLOCK = 16
+
+
+def heap_bytes(data_bytes):
+    """
+    Heap taken by a bytearray, array or list holding `data_bytes` of data
+    (4 bytes per list item): one block for the object and its data
+    rounded up to whole blocks.
+    """
+    return HEAP_BLOCK + (data_bytes + HEAP_BLOCK - 1) // HEAP_BLOCK * HEAP_BLOCK
+
+
+class HeapMonitor:
+    def __init__(self):
+        """
+        Track heap usage of a game and run garbage collections at points the
+        game loop chooses, instead of whenever an allocation happens to fail.
+        """
+        self.low_water = gc.mem_free()
+        self.peak_alloc = gc.mem_alloc()
+        self.alloc_after_collect = self.peak_alloc
+        self.collections = 0
+        self.collect_us_max = 0
+
+    def sample(self):
+        """
+        Update the low-water mark of free heap and the peak allocation.
+
+        :return: Bytes currently allocated.
+        """
+        free = gc.mem_free()
+        alloc = gc.mem_alloc()
+        if free < self.low_water:
+            self.low_water = free
+        if alloc > self.peak_alloc:
+            self.peak_alloc = alloc
+        return alloc
+
+    def collect(self):
+        """
+        Run a full collection now and remember how long it took.
+        """
+        self.sample()
+        start = time.ticks_us()
+        gc.collect()
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        if elapsed > self.collect_us_max:
+            self.collect_us_max = elapsed
+        self.collections += 1
+        self.alloc_after_collect = gc.mem_alloc()
+
+    def collect_if_needed(self, slack_ms):
+        """
+        Collect if enough garbage piled up and there is time before the next tick.
+
+        :param slack_ms: Milliseconds left until the next deadline of the game loop.
+        :return: True if a collection ran.
+        """
+        alloc = self.sample()
+        if (
+            slack_ms >= GC_SLACK_MS
+            and alloc - self.alloc_after_collect >= GC_STEP_BYTES
+        ):
+            self.collect()
+            return True
+        return False
+
+    def set_threshold(self):
+        """
+        Make the automatic collector a safety net: it only runs once a quarter
+        of the currently free heap has been allocated since the last collection.
+        """
+        gc.threshold(gc.mem_free() // 4)
+
+    def clear_threshold(self):
+        """
+        Return the automatic collector to its default behaviour.
+        """
+        gc.threshold(-1)
+
+    def report(self, name):
+        """
+        Format the heap statistics as a single line for the serial console.
+
+        :param name: Name of the game the statistics belong to.
+        """
+        return (
+            f"MEM {name} low={self.low_water} peak={self.peak_alloc}"
+            f" gcs={self.collections} gc_max={self.collect_us_max}us"
+        )
+
+
+def has_free_heap(budget):
+    """
+    Collect garbage and check whether `budget` bytes of heap are free.
+
+    :param budget: Number of bytes required.
+    """
+    gc.collect()
+    return gc.mem_free() >= budget
@@ -0,0 +1,391 @@
+# netplay.py
+
+import socket
+import struct
+import time
+from memory import HeapMonitor
+from profiler import PROFILER
+
+PORT = 4210
+# Ticks between reading a button and applying it, on every device
+INPUT_DELAY = 2
+# How many ticks a device may run ahead of the inputs it has confirmed
+ROLLBACK_WINDOW = 8
+# Resend unacknowledged inputs this often while waiting on a peer
+RESEND_MS = 100
+HELLO_MS = 200
+# Input codes carried in the packets; 0 means no button
+CODES = (None, "left", "right", "up", "down")
+
+_HELLO = 1
+_INPUT = 2
+# Packet headers: type, player, seed / type, player, ack, first tick, count
+_HELLO_FMT = "<BBI"
+_INPUT_FMT = "<BBHHB"
+_INPUT_HEADER = struct.calcsize(_INPUT_FMT)
+# Most input codes in one packet
+_MAX_CODES = 32
+# Input ticks remembered per player; must exceed delay plus twice the window
+_RING = 64
+
+
+class Xorshift:
+    def __init__(self, seed):
+        """
+        Small deterministic random generator for networked games. Unlike the
+        random module its whole state is one integer that can be saved and
+        restored on rollback.
+
+        :param seed: Shared seed; 0 is replaced by a fixed non-zero value.
+        """
+        self.state = (seed & 0xFFFFFFFF) or 0x9E3779B9
+
+    def getrandbits(self, bits):
+        x = self.state
+        x ^= (x << 13) & 0xFFFFFFFF
+        x ^= x >> 17
+        x ^= (x << 5) & 0xFFFFFFFF
+        self.state = x
+        return x >> (32 - bits)
+
+
+def _unwrap(tick16, near):
+    """
+    Expand a 16-bit tick number from a packet to the full tick closest to `near`.
+    """
+    return near + ((tick16 - near + 0x8000) & 0xFFFF) - 0x8000
+
+
+class Lockstep:
+    def __init__(
+        self,
+        game,
+        player,
+        addresses,
+        delay=INPUT_DELAY,
+        window=ROLLBACK_WINDOW,
+    ):
+        """
+        Keep a game in lockstep with the same game on other devices over UDP.
+
+        Every device runs the full simulation. Each tick, every player's
+        button (one input code) is sent to the others and applied `delay`
+        ticks later, which hides that much network latency completely. When a
+        peer's input is later still, the game runs ahead predicting "no
+        button" for up to `window` ticks; if the real input turns out to be
+        different, the game is rolled back to the saved state of that tick
+        and the ticks are replayed. Past the window the game waits.
+
+        The game must draw randomness from Game.random_bits() and implement
+        save_state(), load_state() and handle_player_input().
+
+        :param game: Game instance, not yet initialized.
+        :param player: Index of the local player.
+        :param addresses: (host, port) of every player, the local one included.
+        :param delay: Input delay in ticks.
+        :param window: Rollback window in ticks.
+        """
+        self.game = game
+        self.player = player
+        self.players = len(addresses)
+        self.delay = delay
+        self.window = window
+        self.peers = [
+            None if p == player else socket.getaddrinfo(host, port)[0][-1]
+            for p, (host, port) in enumerate(addresses)
+        ]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(socket.getaddrinfo("0.0.0.0", addresses[player][1])[0][-1])
+        self.sock.setblocking(False)
+        self.buf = bytearray(_INPUT_HEADER + _MAX_CODES)
+        # Next tick to simulate
+        self.tick = 0
+        self.inputs = [bytearray(_RING) for _ in range(self.players)]
+        # Last tick whose input is known, per player; the first `delay`
+        # ticks have no input anywhere
+        self.confirmed = [delay - 1] * self.players
+        # Last tick of ours each peer acknowledged
+        self.acked = [delay - 1] * self.players
+        self.snapshots = [None] * (window + 1)
+        # Earliest tick simulated with a wrong prediction, or -1
+        self.rollback_from = -1
+        self.last_send = 0
+        self.seed = 0
+        # Counters
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.packets_sent = 0
+        self.packets_received = 0
+        self.rollbacks = 0
+        self.replayed = 0
+        self.stalls = 0
+        self.lag_total = 0
+        self.lag_max = 0
+
+    def _send(self, data, addr):
+        self.sock.sendto(data, addr)
+        self.bytes_sent += len(data)
+        self.packets_sent += 1
+
+    def connect(self, seed=0, timeout_ms=30000):
+        """
+        Agree on the seed and start together. Player 0 chooses the seed and
+        repeats it until every peer has echoed it back or started sending
+        inputs; the others wait for it.
+
+        :param seed: Seed chosen by player 0; ignored on the other players.
+        :param timeout_ms: Give up after this long.
+        :raises OSError: If the peers did not answer in time.
+        """
+        leader = self.player == 0
+        self.seed = seed if leader else 0
+        ready = [p == self.player for p in range(self.players)]
+        hello_size = struct.calcsize(_HELLO_FMT)
+        start = time.ticks_ms()
+        self.sock.settimeout(HELLO_MS / 1000)
+        try:
+            while not (all(ready) if leader else ready[0]):
+                if time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+                    raise OSError("netplay peers not answering")
+                if leader:
+                    hello = struct.pack(_HELLO_FMT, _HELLO, 0, self.seed)
+                    for p, addr in enumerate(self.peers):
+                        if not ready[p]:
+                            self._send(hello, addr)
+                try:
+                    data, _ = self.sock.recvfrom(_INPUT_HEADER + _MAX_CODES)
+                except OSError:
+                    continue
+                self.bytes_received += len(data)
+                self.packets_received += 1
+                if data[0] == _INPUT:
+                    # A peer that has the seed already started
+                    self._receive(data)
+                    if data[1] < self.players:
+                        ready[data[1]] = True
+                elif data[0] == _HELLO and len(data) == hello_size:
+                    _, sender, their_seed = struct.unpack(_HELLO_FMT, data)
+                    if leader and sender < self.players:
+                        ready[sender] = their_seed == self.seed
+                    elif sender == 0:
+                        self.seed = their_seed
+                        ready[0] = True
+                        # Echo the seed so the leader knows we have it
+                        self._send(
+                            struct.pack(_HELLO_FMT, _HELLO, self.player, self.seed),
+                            self.peers[0],
+                        )
+        finally:
+            self.sock.setblocking(False)
+        self.game.rng = Xorshift(self.seed)
+        self.last_send = time.ticks_ms()
+
+    def _receive(self, data):
+        kind, sender, ack, first, count = struct.unpack_from(_INPUT_FMT, data)
+        if kind != _INPUT or sender >= self.players or sender == self.player:
+            return
+        if len(data) < _INPUT_HEADER + count:
+            return
+        ack = _unwrap(ack, self.acked[sender])
+        if ack > self.acked[sender]:
+            self.acked[sender] = ack
+        codes = self.inputs[sender]
+        last = self.confirmed[sender]
+        first = _unwrap(first, last)
+        for i in range(count):
+            t = first + i
+            if t != last + 1:
+                continue  # already known, or past a gap
+            code = data[_INPUT_HEADER + i]
+            codes[t % _RING] = code
+            last = t
+            # Ticks already run predicted no button
+            if t < self.tick and code and (
+                self.rollback_from < 0 or t < self.rollback_from
+            ):
+                self.rollback_from = t
+        self.confirmed[sender] = last
+
+    def _send_inputs(self):
+        """
+        Send each peer our inputs it has not acknowledged yet.
+        """
+        mine = self.inputs[self.player]
+        last = self.confirmed[self.player]
+        buf = self.buf
+        for p, addr in enumerate(self.peers):
+            if addr is None:
+                continue
+            first = max(self.acked[p] + 1, last - _MAX_CODES + 1)
+            count = last - first + 1
+            struct.pack_into(
+                _INPUT_FMT,
+                buf,
+                0,
+                _INPUT,
+                self.player,
+                self.confirmed[p] & 0xFFFF,
+                first & 0xFFFF,
+                count,
+            )
+            for i in range(count):
+                buf[_INPUT_HEADER + i] = mine[(first + i) % _RING]
+            self._send(memoryview(buf)[: _INPUT_HEADER + count], addr)
+        self.last_send = time.ticks_ms()
+
+    def poll(self, timeout_ms=0):
+        """
+        Read every waiting packet, roll back if a prediction was wrong, and
+        resend inputs a peer seems to have missed.
+
+        :param timeout_ms: Wait up to this long for the first packet.
+        """
+        sock = self.sock
+        if timeout_ms:
+            sock.settimeout(timeout_ms / 1000)
+        try:
+            while True:
+                try:
+                    data, _ = sock.recvfrom(_INPUT_HEADER + _MAX_CODES)
+                except OSError:
+                    break
+                sock.setblocking(False)
+                self.bytes_received += len(data)
+                self.packets_received += 1
+                if data[0] == _INPUT:
+                    self._receive(data)
+        finally:
+            sock.setblocking(False)
+        if self.rollback_from >= 0:
+            self._rollback()
+        if time.ticks_diff(time.ticks_ms(), self.last_send) >= RESEND_MS:
+            self._send_inputs()
+
+    def _input(self, p, t):
+        if t > self.confirmed[p]:
+            return 0  # predicted: no button
+        return self.inputs[p][t % _RING]
+
+    def _simulate(self, t):
+        game = self.game
+        self.snapshots[t % len(self.snapshots)] = game.save_state()
+        # A finished game stays as it ended
+        if game.game_over_flag or game.game_win_flag:
+            return
+        for p in range(self.players):
+            code = self._input(p, t)
+            if code:
+                game.handle_player_input(p, CODES[code])
+        game.update_state(None)
+
+    def _rollback(self):
+        t = self.rollback_from
+        self.rollback_from = -1
+        self.game.load_state(self.snapshots[t % len(self.snapshots)])
+        self.game.full_redraw = True
+        self.rollbacks += 1
+        self.replayed += self.tick - t
+        if PROFILER.enabled:
+            PROFILER.count("rollbacks")
+        # Effects of the replayed ticks played when they were first predicted
+        self.game.muted = True
+        while t < self.tick:
+            self._simulate(t)
+            t += 1
+        self.game.muted = False
+
+    def confirmed_tick(self):
+        """
+        Last tick for which every player's input is known.
+        """
+        return min(self.confirmed)
+
+    def can_advance(self):
+        """
+        Check whether the next tick stays inside the rollback window.
+        """
+        return self.tick - self.confirmed_tick() <= self.window
+
+    def advance(self, direction=None):
+        """
+        Run one tick, recording the local player's button for `delay` ticks
+        from now.
+
+        :param direction: Direction pressed since the last tick, or None.
+        :return: False if the game has to wait for a peer instead.
+        """
+        if not self.can_advance():
+            self.stalls += 1
+            if PROFILER.enabled:
+                PROFILER.count("stalls")
+            return False
+        t = self.tick
+        ahead = t + self.delay
+        self.inputs[self.player][ahead % _RING] = CODES.index(direction)
+        self.confirmed[self.player] = ahead
+        self._send_inputs()
+        self._simulate(t)
+        self.tick = t + 1
+        lag = t - self.confirmed_tick()
+        if lag < 0:
+            lag = 0
+        self.lag_total += lag
+        if lag > self.lag_max:
+            self.lag_max = lag
+        self.game.tick_count = self.tick
+        self.game.mark_dirty()
+        return True
+
+    def settled(self):
+        """
+        Check whether every tick run so far used confirmed inputs only.
+        """
+        return self.confirmed_tick() >= self.tick - 1 and self.rollback_from < 0
+
+    def report(self):
+        """
+        Format the network counters as a single line for the serial console.
+        Lag is how many ticks the simulation ran ahead of confirmed inputs.
+        """
+        lag = self.lag_total * 100 // (self.tick or 1)
+        return (
+            f"NET tick={self.tick} sent={self.bytes_sent}B/{self.packets_sent}"
+            f" recv={self.bytes_received}B/{self.packets_received}"
+            f" rollbacks={self.rollbacks} replayed={self.replayed}"
+            f" stalls={self.stalls} lag={lag // 100}.{lag % 100:02d}/{self.lag_max}"
+        )
+
+    def close(self):
+        self.sock.close()
+
+    def run(self, seed=0):
+        """
+        Play the game on this device: connect, then tick on the game's
+        update period, rendering in between. Ends once the game is over on
+        confirmed inputs.
+
+        :param seed: Seed, if this is player 0.
+        """
+        game = self.game
+        game.heap = HeapMonitor()
+        self.connect(seed)
+        game.initialize_game()
+        game.heap.collect()
+        next_tick = time.ticks_add(time.ticks_ms(), game.update_period)
+        direction = None
+        while True:
+            pressed = game.input.get_pressed()
+            if pressed and direction is None:
+                direction = pressed[0]
+            if time.ticks_diff(time.ticks_ms(), next_tick) >= 0:
+                if self.advance(direction):
+                    direction = None
+                    next_tick = time.ticks_add(next_tick, game.update_period)
+                    game.next_tick_ms = next_tick
+            game.present()
+            if (game.game_over_flag or game.game_win_flag) and self.settled():
+                break
+            self.poll(min(20, max(time.ticks_diff(next_tick, time.ticks_ms()), 1)))
+        print(self.report())
+        self.close()
+        game.end()
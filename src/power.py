@@ -0,0 +1,199 @@
+# power.py
+
+import time
+import machine
+from machine import Pin
+from profiler import PROFILER
+
+# Pass length of the game and menu loops, in milliseconds
+FRAME_MS = 50
+# Dim the display after this long without a button press...
+DIM_AFTER_MS = 30000
+# ...and switch it off after this long
+OFF_AFTER_MS = 120000
+DIM_CONTRAST = 0x08
+FULL_CONTRAST = 0xFF
+# Longest single sleep when a button press can wake the CPU. Without pin
+# wake, sleeps never outlast one frame so presses are seen as quickly as
+# with the old fixed delay.
+MAX_SLEEP_MS = 1000
+
+# Display states
+AWAKE = 0
+DIMMED = 1
+OFF = 2
+
+# Clock speeds the ESP8266 supports; the menu always runs at the low one
+LOW_FREQ = 80000000
+HIGH_FREQ = 160000000
+# Number of load samples behind each automatic clock decision
+FREQ_WINDOW = 20
+# Raise the clock when the busiest sample used more than this percentage of
+# its time budget, lower it when even the busiest used less than this one
+FREQ_RAISE_LOAD = 60
+FREQ_LOWER_LOAD = 25
+
+
+def set_freq(hz):
+    """
+    Switch the CPU clock, if the board supports that speed.
+
+    :return: True if the CPU now runs at `hz`.
+    """
+    try:
+        if machine.freq() != hz:
+            machine.freq(hz)
+    except ValueError:
+        return False
+    return True
+
+
+class IdleScheduler:
+    def __init__(self, display, input):
+        """
+        Put the CPU in light sleep between frames and dim, then switch off,
+        the display when nobody is playing. Only the menu calls activity()
+        and update(): a running game keeps the display on, since it goes on
+        without presses.
+
+        Light sleep is used where the port has machine.lightsleep(), with the
+        buttons armed as wake sources where pins can wake it (ESP32). On other
+        boards it falls back to time.sleep_ms() with the same deadlines.
+
+        :param display: Display to dim and switch off.
+        :param input: Input whose buttons count as activity and wake the CPU.
+        """
+        self.display = display
+        self.input = input
+        self.state = AWAKE
+        self.last_activity = time.ticks_ms()
+        self.slept_ms = 0
+        self.lightsleep = getattr(machine, "lightsleep", None)
+        self.pin_wake = self._arm_pin_wake()
+
+    def _arm_pin_wake(self):
+        try:
+            for pin in self.input.buttons.values():
+                pin.irq(trigger=Pin.IRQ_FALLING, wake=machine.SLEEP)
+        except (AttributeError, TypeError, ValueError):
+            # The ESP8266 cannot wake from light sleep on a pin
+            return False
+        return True
+
+    def activity(self, pressed):
+        """
+        Report the buttons pressed in this pass of the loop.
+
+        :param pressed: Mask of triggered buttons from Input.scan().
+        :return: True if the press only woke the display and should be ignored.
+        """
+        if not pressed:
+            return False
+        self.last_activity = time.ticks_ms()
+        state = self.state
+        if state != AWAKE:
+            self.wake()
+        return state == OFF
+
+    def wake(self):
+        """
+        Bring the display back to full brightness.
+        """
+        if self.state == OFF:
+            self.display.poweron()
+        if self.state != AWAKE:
+            self.display.set_contrast(FULL_CONTRAST)
+        self.state = AWAKE
+        self.last_activity = time.ticks_ms()
+
+    def update(self):
+        """
+        Dim or switch off the display once the inactivity limits pass.
+
+        :return: The display state: AWAKE, DIMMED or OFF.
+        """
+        idle = time.ticks_diff(time.ticks_ms(), self.last_activity)
+        if self.state == AWAKE and idle >= DIM_AFTER_MS:
+            self.display.set_contrast(DIM_CONTRAST)
+            self.state = DIMMED
+        elif self.state == DIMMED and idle >= OFF_AFTER_MS:
+            self.display.poweroff()
+            self.state = OFF
+        return self.state
+
+    def sleep_until(self, deadline):
+        """
+        Sleep until a time.ticks_ms() deadline, or until a button wakes the
+        CPU where that is possible.
+
+        :param deadline: Time of the next frame or timer tick.
+        """
+        ms = time.ticks_diff(deadline, time.ticks_ms())
+        if ms <= 0:
+            return
+        limit = MAX_SLEEP_MS if self.pin_wake else FRAME_MS
+        if ms > limit:
+            ms = limit
+        if self.lightsleep is not None:
+            self.lightsleep(ms)
+        else:
+            time.sleep_ms(ms)
+        self.slept_ms += ms
+        if PROFILER.enabled:
+            PROFILER.count("sleep_ms", ms)
+
+
+class ClockGovernor:
+    def __init__(self, fixed=0):
+        """
+        Choose the CPU clock for a game.
+
+        A game either asks for a fixed clock, or the governor starts at
+        LOW_FREQ and switches between LOW_FREQ and HIGH_FREQ depending on how
+        much of each frame the game spends computing, ticks run during the
+        frame included.
+
+        :param fixed: Clock in Hz to run at, or 0 to choose automatically.
+        """
+        self.fixed = fixed
+        self.samples = 0
+        self.peak_load = 0
+
+    def start(self):
+        """
+        Set the initial clock when the game starts.
+        """
+        self.samples = 0
+        self.peak_load = 0
+        set_freq(self.fixed or LOW_FREQ)
+
+    def record(self, used_us, budget_us):
+        """
+        Add a load sample. Called from the game loop only, like adjust():
+        the samples are not guarded against the timer callback.
+
+        :param used_us: Microseconds of computation a frame took, without
+            display flushes.
+        :param budget_us: Microseconds it could have taken.
+        """
+        load = used_us * 100 // budget_us
+        if load > self.peak_load:
+            self.peak_load = load
+        self.samples += 1
+
+    def adjust(self):
+        """
+        Change the clock once a full window of samples was recorded.
+        Called from the game loop, never from the timer callback.
+        """
+        if self.fixed or self.samples < FREQ_WINDOW:
+            return
+        freq = machine.freq()
+        if self.peak_load > FREQ_RAISE_LOAD and freq < HIGH_FREQ:
+            set_freq(HIGH_FREQ)
+        elif self.peak_load < FREQ_LOWER_LOAD and freq > LOW_FREQ:
+            set_freq(LOW_FREQ)
+        if PROFILER.enabled:
+            PROFILER.record("load", self.peak_load)
+        self.samples = 0
+        self.peak_load = 0
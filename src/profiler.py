@@ -0,0 +1,165 @@
+# profiler.py
+
+import gc
+import time
+
+# Timer and sample slots: [count, total, min, max]
+_COUNT = 0
+_TOTAL = 1
+_MIN = 2
+_MAX = 3
+
+
+class Profiler:
+    def __init__(self, dump_period=5000):
+        """
+        Collect timings, counters and heap samples from the game loops.
+
+        Instrumented code checks `enabled` before touching the profiler, so a
+        disabled profiler costs one attribute lookup per call site.
+
+        :param dump_period: Period (in milliseconds) between serial dumps.
+        """
+        self.enabled = False
+        self.hud = False
+        self.hud_text = ""
+        self.dump_period = dump_period
+        self.last_dump = 0
+        self.stats = {}
+        self.counters = {}
+
+    def enable(self, hud=False):
+        """
+        Start collecting statistics.
+
+        :param hud: Also overlay the latest statistics on the OLED.
+        """
+        self.reset()
+        self.last_dump = time.ticks_ms()
+        self.enabled = True
+        self.hud = hud
+
+    def disable(self):
+        """
+        Stop collecting statistics.
+        """
+        self.enabled = False
+        self.hud = False
+
+    def reset(self):
+        """
+        Start a new aggregation window.
+        """
+        for slot in self.stats.values():
+            slot[_COUNT] = 0
+            slot[_TOTAL] = 0
+        for name in self.counters:
+            self.counters[name] = 0
+
+    def record(self, name, value):
+        """
+        Add a sample to the min/avg/max aggregate called `name`.
+
+        :param name: Name of the aggregate.
+        :param value: Sample value (microseconds for timers, bytes for heap).
+        """
+        slot = self.stats.get(name)
+        if slot is None:
+            self.stats[name] = [1, value, value, value]
+        elif slot[_COUNT] == 0:
+            slot[_COUNT] = 1
+            slot[_TOTAL] = value
+            slot[_MIN] = value
+            slot[_MAX] = value
+        else:
+            slot[_COUNT] += 1
+            slot[_TOTAL] += value
+            if value < slot[_MIN]:
+                slot[_MIN] = value
+            if value > slot[_MAX]:
+                slot[_MAX] = value
+
+    def stop(self, name, start):
+        """
+        Record the time elapsed since `start`.
+
+        :param name: Name of the timer.
+        :param start: Value of time.ticks_us() when the timed section began.
+        :return: The current time.ticks_us(), for timing the next section.
+        """
+        now = time.ticks_us()
+        self.record(name, time.ticks_diff(now, start))
+        return now
+
+    def count(self, name, n=1):
+        """
+        Increment the counter called `name`.
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def sample_mem(self, name="heap"):
+        """
+        Record the current free heap.
+        """
+        self.record(name, gc.mem_free())
+
+    def line(self):
+        """
+        Format the current window as a single compact line.
+
+        Timers and heap samples print as name=min/avg/max, counters as name=n.
+        """
+        parts = ["PROF"]
+        for name, slot in self.stats.items():
+            n = slot[_COUNT]
+            if n:
+                parts.append(f"{name}={slot[_MIN]}/{slot[_TOTAL] // n}/{slot[_MAX]}")
+        for name, n in self.counters.items():
+            parts.append(f"{name}={n}")
+        return " ".join(parts)
+
+    def update_hud_text(self):
+        """
+        Summarize the worst update, render and flush times (in milliseconds)
+        and the lowest free heap (in kilobytes) for the debug HUD.
+        """
+        text = ""
+        for name, label in (("update", "u"), ("render", "r"), ("show", "s")):
+            slot = self.stats.get(name)
+            if slot and slot[_COUNT]:
+                text += f"{label}{slot[_MAX] // 1000} "
+        slot = self.stats.get("heap")
+        if slot and slot[_COUNT]:
+            text += f"{slot[_MIN] // 1024}k"
+        self.hud_text = text
+
+    def dump(self):
+        """
+        Print the current window over serial and start a new one.
+        """
+        print(self.line())
+        self.update_hud_text()
+        self.reset()
+
+    def maybe_dump(self):
+        """
+        Dump the statistics if the dump period has elapsed.
+        """
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.last_dump) >= self.dump_period:
+            self.last_dump = now
+            self.dump()
+
+    def draw_hud(self, display):
+        """
+        Overlay the latest statistics on the bottom text row of the display.
+
+        :param display: Display instance about to be flushed.
+        """
+        y = display.height - 8
+        display.display.fill_rect(0, y, display.width, 8, 0)
+        display.draw_text(self.hud_text, 0, y)
+
+
+# Shared instance used by the framework's instrumentation points
+PROFILER = Profiler()
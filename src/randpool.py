@@ -0,0 +1,102 @@
+# randpool.py
+
+import urandom
+from urandom import getrandbits
+
+# Bytes in the pool; a power of two so indices wrap with a mask
+POOL_SIZE = 256
+POOL_MASK = POOL_SIZE - 1
+# Most bytes one refill() call adds, about 0.5 ms on an ESP8266 at 80 MHz
+REFILL_BYTES = 48
+# Only refill between frames if at least this many milliseconds remain
+REFILL_SLACK_MS = 2
+
+
+class RandomPool:
+    def __init__(self):
+        """
+        A ring of random bytes that the game loop tops up in bulk while it
+        has time to spare, so that game logic draws random numbers with a
+        couple of buffer reads instead of a urandom call.
+
+        refill() only moves `tail` and draws only move `head`, so the timer
+        callback may draw while the main loop is refilling. A draw that
+        finds the pool empty goes to urandom directly.
+        """
+        self.buf = bytearray(POOL_SIZE)
+        self.head = 0
+        self.tail = 0
+        # Draws that found the pool empty
+        self.misses = 0
+
+    def available(self):
+        """
+        Number of bytes ready to be drawn.
+        """
+        return (self.tail - self.head) & POOL_MASK
+
+    def refill(self, max_bytes=POOL_SIZE):
+        """
+        Add up to `max_bytes` random bytes, three per urandom call so that
+        the values stay small ints.
+
+        :return: Number of bytes added.
+        """
+        buf = self.buf
+        tail = self.tail
+        # One slot stays empty to tell a full ring from an empty one
+        room = (self.head - tail - 1) & POOL_MASK
+        if room > max_bytes:
+            room = max_bytes
+        added = room - room % 3
+        for _ in range(added // 3):
+            r = getrandbits(24)
+            buf[tail] = r & 0xFF
+            buf[(tail + 1) & POOL_MASK] = (r >> 8) & 0xFF
+            buf[(tail + 2) & POOL_MASK] = r >> 16
+            tail = (tail + 3) & POOL_MASK
+        self.tail = tail
+        return added
+
+    def seed(self, n):
+        """
+        Seed urandom and refill the whole pool from it, so that the draws
+        that follow depend on `n` alone.
+        """
+        urandom.seed(n)
+        self.head = self.tail = 0
+        self.misses = 0
+        self.refill()
+
+    def bits16(self):
+        """
+        :return: 16 random bits.
+        """
+        head = self.head
+        if (self.tail - head) & POOL_MASK < 2:
+            self.misses += 1
+            return getrandbits(16)
+        buf = self.buf
+        self.head = (head + 2) & POOL_MASK
+        return buf[head] | buf[(head + 1) & POOL_MASK] << 8
+
+    def bits(self, n):
+        """
+        :param n: Number of bits, at most 16.
+        :return: `n` random bits.
+        """
+        return self.bits16() >> (16 - n)
+
+    def below(self, n):
+        """
+        Draw a number in range(n). The bias is under n / 65536, which does
+        not matter for the small ranges of map cells and spawn columns.
+
+        :param n: Upper bound, from 1 to 65536.
+        """
+        return self.bits16() % n
+
+
+# Shared instance, filled at import and topped up by Game.run
+POOL = RandomPool()
+POOL.refill()
@@ -0,0 +1,173 @@
+# store.py
+
+import json
+import os
+
+# Rewrite the log once it grows past this many bytes...
+COMPACT_BYTES = 2048
+# ...and holds at least this many times the live data
+COMPACT_RATIO = 2
+# Log file of the shared STORE on the device filesystem
+STORE_PATH = "arcade.log"
+
+
+class Store:
+    def __init__(self, path=STORE_PATH):
+        """
+        Small persistent key-value store for high scores and settings.
+
+        Every change is appended to a log file as one `key<TAB>json` line, so
+        a write only adds a few bytes at the end of the file and the flash
+        blocks being written move along with the log. Loading replays the log
+        in one sequential scan; later lines win. Once the log is mostly stale
+        lines it is compacted into a fresh file holding one line per key.
+
+        Changes are buffered in memory by set() and only reach the flash on
+        flush(), which the games call from their end screens.
+
+        :param path: Log file on the device filesystem, or None to keep the
+            values in memory only.
+        """
+        self.path = path
+        self.values = {}
+        self.pending = []
+        self.log_bytes = 0
+        # Set when the log ends in a torn line that must not be appended to
+        self.damaged = False
+
+    def load(self):
+        """
+        Replay the log into memory. A missing file is an empty store. A line
+        torn by a reset in the middle of a write ends the scan, and the next
+        flush() rewrites the log without it.
+
+        A reset during compact() can leave the new log only as the temporary
+        file, or next to a torn log; its lines are then replayed first and
+        the next flush() rewrites the log from everything found.
+        """
+        self.values = {}
+        self.pending = []
+        self.log_bytes = 0
+        self.damaged = False
+        if self.path is None:
+            return
+        found = self._replay(self.path)
+        if found and not self.damaged:
+            return
+        values = self.values
+        self.values = {}
+        if self._replay(self.path + ".tmp"):
+            # Lines of the log are newer than those of the compacted copy
+            self.values.update(values)
+            self.damaged = True
+        else:
+            self.values = values
+
+    def _replay(self, path):
+        """
+        Read the lines of a log file into `values`, up to a torn line.
+
+        :return: False if the file does not exist.
+        """
+        try:
+            f = open(path)
+        except OSError:
+            return False
+        with f:
+            for line in f:
+                key, sep, value = line[:-1].partition("\t")
+                if not sep or not line.endswith("\n"):
+                    self.damaged = True
+                    break
+                try:
+                    self.values[key] = json.loads(value)
+                except ValueError:
+                    self.damaged = True
+                    break
+                self.log_bytes += len(line)
+        return True
+
+    def get(self, key, default=None):
+        """
+        Return the value stored under `key`, or `default`.
+        """
+        return self.values.get(key, default)
+
+    def set(self, key, value):
+        """
+        Store a value in memory; it is written out by the next flush().
+
+        :param key: Key without tabs or newlines.
+        :param value: Any JSON-serializable value.
+        """
+        if self.values.get(key) == value:
+            return
+        self.values[key] = value
+        self.pending.append(key)
+
+    def _line(self, key):
+        return f"{key}\t{json.dumps(self.values[key])}\n"
+
+    def flush(self):
+        """
+        Append the pending changes to the log, compacting it if needed.
+        Flash errors are reported and the changes kept for the next try.
+
+        :return: True if everything was written.
+        """
+        if not self.pending:
+            return True
+        if self.path is None:
+            self.pending = []
+            return True
+        try:
+            if self.damaged:
+                self.compact()
+                self.pending = []
+                return True
+            with open(self.path, "a") as f:
+                for key in self.pending:
+                    line = self._line(key)
+                    f.write(line)
+                    self.log_bytes += len(line)
+            self.pending = []
+            live = 0
+            for key in self.values:
+                live += len(self._line(key))
+            if (
+                self.log_bytes > COMPACT_BYTES
+                and self.log_bytes > live * COMPACT_RATIO
+            ):
+                self.compact()
+        except OSError as e:
+            print("Store flush failed:", e)
+            return False
+        return True
+
+    def compact(self):
+        """
+        Rewrite the log with one line per key. The new log is written to a
+        temporary file next to the old one, then the old log is removed and
+        the new one renamed in its place: FAT cannot rename over an existing
+        file. A reset at any point leaves a complete copy, which load()
+        recovers.
+        """
+        tmp = self.path + ".tmp"
+        size = 0
+        with open(tmp, "w") as f:
+            for key in self.values:
+                line = self._line(key)
+                f.write(line)
+                size += len(line)
+        try:
+            os.remove(self.path)
+        except OSError:
+            # No log yet, or only the copy a reset left behind
+            pass
+        os.rename(tmp, self.path)
+        self.log_bytes = size
+        self.damaged = False
+
+
+# Shared instance, loaded once at boot by GameManager
+STORE = Store()
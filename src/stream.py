@@ -0,0 +1,177 @@
+# stream.py
+
+import struct
+import sys
+import time
+import binascii
+
+# Packet header: magic, sequence number, packet length, width, pages, pages sent
+HEADER_FMT = "<2sHHBBB"
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+MAGIC = b"FB"
+# Each page: page index, encoded length, then (count, byte) runs
+PAGE_FMT = "<BH"
+PAGE_HEADER = struct.calcsize(PAGE_FMT)
+# Largest packet; pages that do not fit wait for the next frame
+MAX_PACKET = 1400
+# Send every page now and then so a viewer that joined late or lost packets catches up
+KEYFRAME_EVERY = 100
+
+
+def rle_encode(src, start, end, dst, pos, limit):
+    """
+    Run-length encode src[start:end] into dst at pos as (count, byte) pairs.
+
+    :return: Position after the encoded data, or -1 if it would pass `limit`.
+    """
+    i = start
+    while i < end:
+        value = src[i]
+        run = 1
+        while i + run < end and run < 255 and src[i + run] == value:
+            run += 1
+        if pos + 2 > limit:
+            return -1
+        dst[pos] = run
+        dst[pos + 1] = value
+        pos += 2
+        i += run
+    return pos
+
+
+def rle_decode(src, pos, length, dst, offset):
+    """
+    Decode `length` bytes of runs from src at pos into dst from offset on.
+
+    :return: Offset after the decoded bytes.
+    """
+    end = pos + length
+    while pos < end:
+        run = src[pos]
+        value = src[pos + 1]
+        for i in range(offset, offset + run):
+            dst[i] = value
+        offset += run
+        pos += 2
+    return offset
+
+
+class UdpSink:
+    def __init__(self, host, port):
+        """
+        Send frames as UDP datagrams to a viewer.
+        """
+        import socket
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addr = socket.getaddrinfo(host, port)[0][-1]
+
+    def write(self, data):
+        self.sock.sendto(data, self.addr)
+
+
+class SerialSink:
+    def write(self, data):
+        """
+        Print frames on the serial console as base64 lines starting with
+        "FB:", so they can share the port with ordinary output.
+        """
+        sys.stdout.write("FB:")
+        sys.stdout.write(binascii.b2a_base64(data).decode())
+
+
+class FrameStream:
+    def __init__(self, sink, width=128, height=64, max_rate=0):
+        """
+        Mirror the display to a viewer by sending the pages (8-pixel rows)
+        of the MONO_VLSB buffer that changed since the last frame sent,
+        run-length encoded, with a sequence number per frame.
+
+        :param sink: Object with a write(bytes) method, e.g. UdpSink,
+            SerialSink or a file opened in binary mode.
+        :param width: Display width in pixels.
+        :param height: Display height in pixels.
+        :param max_rate: Bandwidth cap in bytes per second, 0 for none.
+            Frames over the cap are dropped; their changes go out with
+            the next frame that fits.
+        """
+        self.sink = sink
+        self.width = width
+        self.pages = height // 8
+        self.max_rate = max_rate
+        self.last = bytearray(self.pages * width)
+        self.packet = bytearray(MAX_PACKET)
+        self.seq = 0
+        self.tokens = max_rate
+        self.refill_ms = time.ticks_ms()
+        # Bit per page that must be sent even if it looks unchanged
+        self.pending = 0
+        self.frames = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+
+    def _changed(self, buf, page):
+        last = self.last
+        for i in range(page * self.width, (page + 1) * self.width):
+            if buf[i] != last[i]:
+                return True
+        return False
+
+    def send(self, buf):
+        """
+        Send the pages of `buf` that changed since the last frame sent.
+
+        :param buf: MONO_VLSB frame buffer of the display.
+        :return: True if a frame was sent.
+        """
+        width = self.width
+        packet = self.packet
+        if self.seq % KEYFRAME_EVERY == 0:
+            self.pending = (1 << self.pages) - 1
+        pending = self.pending
+        pos = HEADER_SIZE
+        sent = 0
+        for page in range(self.pages):
+            if not (pending >> page) & 1 and not self._changed(buf, page):
+                continue
+            start = page * width
+            end = rle_encode(
+                buf, start, start + width, packet, pos + PAGE_HEADER, MAX_PACKET
+            )
+            if end < 0:
+                # Later pages go out with the next frame
+                pending |= 1 << page
+                continue
+            struct.pack_into(PAGE_FMT, packet, pos, page, end - pos - PAGE_HEADER)
+            pending &= ~(1 << page)
+            pos = end
+            sent += 1
+        if not sent:
+            return False
+        if self.max_rate:
+            now = time.ticks_ms()
+            self.tokens += time.ticks_diff(now, self.refill_ms) * self.max_rate // 1000
+            self.refill_ms = now
+            if self.tokens > self.max_rate:
+                self.tokens = self.max_rate
+            if pos > self.tokens:
+                self.dropped += 1
+                return False
+            self.tokens -= pos
+        struct.pack_into(
+            HEADER_FMT, packet, 0, MAGIC, self.seq & 0xFFFF, pos, width, self.pages, sent
+        )
+        self.sink.write(memoryview(packet)[:pos])
+        # Only the pages that were sent count as seen by the viewer
+        view = memoryview(buf)
+        p = HEADER_SIZE
+        for _ in range(sent):
+            page, length = struct.unpack_from(PAGE_FMT, packet, p)
+            start = page * width
+            self.last[start : start + width] = view[start : start + width]
+            p += PAGE_HEADER + length
+        self.pending = pending
+        self.seq += 1
+        self.frames += 1
+        self.bytes_sent += pos
+        return True
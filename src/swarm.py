@@ -0,0 +1,323 @@
+# swarm.py
+
+import sys
+from array import array
+import micropython
+from memory import heap_bytes
+
+_VIPER = sys.implementation.name == "micropython"
+
+if _VIPER:
+    np = None
+else:
+    try:
+        # Only the host emulator has NumPy
+        import numpy as np
+    except ImportError:
+        np = None
+
+# Layout of the packed kernel arguments
+_COUNT = 0
+_CAPACITY = 1
+_WIDTH = 2
+_HEIGHT = 3
+_TARGET_Y = 4
+_TARGET_X = 5
+_PLANE = 6
+_MOVED = 7
+_CAUGHT = 8
+_TOP = 9
+_LEFT = 10
+_BOTTOM = 11
+_RIGHT = 12
+
+
+def _step_py(state, grid, moved, args):
+    n = args[_COUNT]
+    cap = args[_CAPACITY]
+    w = args[_WIDTH]
+    h = args[_HEIGHT]
+    ty = args[_TARGET_Y]
+    tx = args[_TARGET_X]
+    occupied = args[_PLANE]
+    claims = occupied + occupied
+    top = args[_TOP]
+    left = args[_LEFT]
+    bottom = args[_BOTTOM]
+    right = args[_RIGHT]
+    caught = 0
+    m = 0
+    # Pass 1: every awake chaser picks a step towards the target and claims it
+    for k in range(n):
+        y = state[k]
+        x = state[cap + k]
+        state[2 * cap + k] = y
+        state[3 * cap + k] = x
+        if not (top <= y < bottom and left <= x < right):
+            continue  # asleep
+        ny = y + (ty > y) - (ty < y)
+        nx = x + (tx > x) - (tx < x)
+        if not (0 < ny < h - 1 and 0 < nx < w - 1):
+            continue
+        i = ny * w + nx
+        byte = i >> 3
+        bit = 1 << (i & 7)
+        if grid[byte] & bit:
+            continue  # wall
+        if ny == ty and nx == tx:
+            caught = 1
+        if grid[occupied + byte] & bit or grid[claims + byte] & bit:
+            continue  # another chaser stands there or got there first
+        grid[claims + byte] |= bit
+        state[k] = ny
+        state[cap + k] = nx
+        moved[m] = k
+        m += 1
+    # Pass 2: commit the moves to the occupancy plane
+    for j in range(m):
+        k = moved[j]
+        i = state[2 * cap + k] * w + state[3 * cap + k]
+        grid[occupied + (i >> 3)] &= 0xFF ^ (1 << (i & 7))
+    for j in range(m):
+        k = moved[j]
+        i = state[k] * w + state[cap + k]
+        grid[occupied + (i >> 3)] |= 1 << (i & 7)
+        grid[claims + (i >> 3)] &= 0xFF ^ (1 << (i & 7))
+    args[_MOVED] = m
+    args[_CAUGHT] = caught
+
+
+def _step_numpy(state, grid, moved, args):
+    n = args[_COUNT]
+    cap = args[_CAPACITY]
+    w = args[_WIDTH]
+    h = args[_HEIGHT]
+    ty = args[_TARGET_Y]
+    tx = args[_TARGET_X]
+    plane = args[_PLANE]
+    s = np.frombuffer(state, dtype=np.int8)
+    g = np.frombuffer(grid, dtype=np.uint8)
+    walls = g[:plane]
+    occupied = g[plane : 2 * plane]
+    ys = s[:n].astype(np.int32)
+    xs = s[cap : cap + n].astype(np.int32)
+    s[2 * cap : 2 * cap + n] = s[:n]
+    s[3 * cap : 3 * cap + n] = s[cap : cap + n]
+
+    ny = ys + np.sign(ty - ys)
+    nx = xs + np.sign(tx - xs)
+    awake = (
+        (ys >= args[_TOP])
+        & (ys < args[_BOTTOM])
+        & (xs >= args[_LEFT])
+        & (xs < args[_RIGHT])
+    )
+    inside = awake & (ny > 0) & (ny < h - 1) & (nx > 0) & (nx < w - 1)
+    i = np.where(inside, ny * w + nx, 0)
+    bits = (1 << (i & 7)).astype(np.uint8)
+    open_ = inside & ((walls[i >> 3] & bits) == 0)
+    caught = bool(np.any(open_ & (ny == ty) & (nx == tx)))
+    free = np.flatnonzero(open_ & ((occupied[i >> 3] & bits) == 0))
+    # Several chasers may want the same cell: the lowest index gets it
+    _, first = np.unique(i[free], return_index=True)
+    movers = np.sort(free[first])
+    m = len(movers)
+
+    old = ys[movers] * w + xs[movers]
+    new = i[movers]
+    np.bitwise_and.at(occupied, old >> 3, (0xFF ^ (1 << (old & 7))).astype(np.uint8))
+    np.bitwise_or.at(occupied, new >> 3, (1 << (new & 7)).astype(np.uint8))
+    s[movers] = ny[movers]
+    s[cap + movers] = nx[movers]
+    moved[:m] = movers.astype(np.uint8).tobytes()
+    args[_MOVED] = m
+    args[_CAUGHT] = caught
+
+
+if _VIPER:
+
+    @micropython.viper
+    def _step(state: ptr8, grid: ptr8, moved: ptr8, args: ptr32):
+        n = int(args[0])
+        cap = int(args[1])
+        w = int(args[2])
+        h = int(args[3])
+        ty = int(args[4])
+        tx = int(args[5])
+        occupied = int(args[6])
+        claims = occupied + occupied
+        top = int(args[9])
+        left = int(args[10])
+        bottom = int(args[11])
+        right = int(args[12])
+        caught = 0
+        m = 0
+        for k in range(n):
+            y = int(state[k])
+            x = int(state[cap + k])
+            state[2 * cap + k] = y
+            state[3 * cap + k] = x
+            if y < top or y >= bottom or x < left or x >= right:
+                continue
+            ny = y
+            if ty > y:
+                ny = y + 1
+            elif ty < y:
+                ny = y - 1
+            nx = x
+            if tx > x:
+                nx = x + 1
+            elif tx < x:
+                nx = x - 1
+            if ny <= 0 or ny >= h - 1 or nx <= 0 or nx >= w - 1:
+                continue
+            i = ny * w + nx
+            byte = i >> 3
+            bit = 1 << (i & 7)
+            if int(grid[byte]) & bit:
+                continue
+            if ny == ty and nx == tx:
+                caught = 1
+            if (int(grid[occupied + byte]) | int(grid[claims + byte])) & bit:
+                continue
+            grid[claims + byte] = int(grid[claims + byte]) | bit
+            state[k] = ny
+            state[cap + k] = nx
+            moved[m] = k
+            m += 1
+        for j in range(m):
+            k = int(moved[j])
+            i = int(state[2 * cap + k]) * w + int(state[3 * cap + k])
+            byte = occupied + (i >> 3)
+            grid[byte] = int(grid[byte]) & (0xFF ^ (1 << (i & 7)))
+        for j in range(m):
+            k = int(moved[j])
+            i = int(state[k]) * w + int(state[cap + k])
+            bit = 1 << (i & 7)
+            byte = occupied + (i >> 3)
+            grid[byte] = int(grid[byte]) | bit
+            byte = claims + (i >> 3)
+            grid[byte] = int(grid[byte]) & (0xFF ^ bit)
+        args[7] = m
+        args[8] = caught
+
+elif np is not None:
+    _step = _step_numpy
+else:
+    _step = _step_py
+
+
+class Swarm:
+    def __init__(self, capacity, map_width, map_height):
+        """
+        Chasers stored as parallel arrays and moved in one batched pass.
+
+        Positions live in array('b') buffers, walls and occupancy in bit
+        planes over the map, so a step never allocates. All chasers move at
+        once: a chaser steps towards the target unless the cell is outside
+        the border, a wall, was occupied at the start of the step, or was
+        already claimed by a chaser with a lower index. Chasers outside the
+        window set with set_window() do not move.
+
+        :param capacity: Maximum number of chasers.
+        :param map_width: Width of the map in cells (at most 127).
+        :param map_height: Height of the map in cells (at most 127).
+        """
+        self.capacity = capacity
+        self.count = 0
+        self.width = map_width
+        self.height = map_height
+        # Rows: current y, current x, previous y, previous x
+        self.state = array("b", bytes(4 * capacity))
+        view = memoryview(self.state)
+        self.ys = view[0:capacity]
+        self.xs = view[capacity : 2 * capacity]
+        self.prev_ys = view[2 * capacity : 3 * capacity]
+        self.prev_xs = view[3 * capacity : 4 * capacity]
+        # Planes: walls, occupied by a chaser, claimed during a step
+        plane = (map_width * map_height + 7) >> 3
+        self.grid = bytearray(3 * plane)
+        # Indices of the chasers that moved in the last step
+        self.moved = bytearray(capacity)
+        self.moved_count = 0
+        self.args = array("i", [0] * 13)
+        self.args[_CAPACITY] = capacity
+        self.args[_WIDTH] = map_width
+        self.args[_HEIGHT] = map_height
+        self.args[_PLANE] = plane
+        self.set_window(0, 0, map_height, map_width)
+
+    @staticmethod
+    def budget(capacity, map_width, map_height):
+        """
+        Heap taken by the buffers of a Swarm made with these arguments.
+        """
+        plane = (map_width * map_height + 7) >> 3
+        return (
+            heap_bytes(4 * capacity)
+            + heap_bytes(3 * plane)
+            + heap_bytes(capacity)
+            + heap_bytes(4 * 13)
+        )
+
+    def _bit(self, y, x):
+        i = y * self.width + x
+        return i >> 3, 1 << (i & 7)
+
+    def set_wall(self, y, x):
+        """
+        Mark a cell as impassable.
+        """
+        byte, bit = self._bit(y, x)
+        self.grid[byte] |= bit
+
+    def is_occupied(self, y, x):
+        """
+        Check whether a chaser stands on a cell.
+        """
+        byte, bit = self._bit(y, x)
+        return bool(self.grid[self.args[_PLANE] + byte] & bit)
+
+    def add(self, y, x):
+        """
+        Add a chaser at the given cell.
+
+        :return: Index of the new chaser.
+        """
+        k = self.count
+        self.ys[k] = y
+        self.xs[k] = x
+        self.prev_ys[k] = y
+        self.prev_xs[k] = x
+        byte, bit = self._bit(y, x)
+        self.grid[self.args[_PLANE] + byte] |= bit
+        self.count = k + 1
+        return k
+
+    def set_window(self, top, left, bottom, right):
+        """
+        Only move chasers inside a rectangle of the map; the rest sleep.
+        Bounds are clamped to the map, bottom and right are exclusive.
+        """
+        args = self.args
+        args[_TOP] = max(top, 0)
+        args[_LEFT] = max(left, 0)
+        args[_BOTTOM] = min(bottom, self.height)
+        args[_RIGHT] = min(right, self.width)
+
+    def step(self, target_y, target_x):
+        """
+        Move every chaser one cell towards the target.
+
+        Afterwards `moved[:moved_count]` lists the chasers that moved, with
+        their old cells in `prev_ys`/`prev_xs`.
+
+        :return: True if a chaser stepped onto, or stayed on, the target.
+        """
+        args = self.args
+        args[_COUNT] = self.count
+        args[_TARGET_Y] = target_y
+        args[_TARGET_X] = target_x
+        _step(self.state, self.grid, self.moved, args)
+        self.moved_count = args[_MOVED]
+        return bool(args[_CAUGHT])
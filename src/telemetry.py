@@ -0,0 +1,205 @@
+# telemetry.py
+
+import binascii
+import gc
+import struct
+import time
+
+# Record: kind, game index, sequence number, ticks_ms, then three values
+# whose meaning depends on the kind
+RECORD_FMT = "<BBHIIII"
+RECORD_SIZE = struct.calcsize(RECORD_FMT)
+# Records held until drained; more are dropped, leaving a gap in the sequence
+RING_RECORDS = 32
+# Records per drained line
+DRAIN_RECORDS = 8
+# Only drain between frames if at least this many milliseconds remain
+DRAIN_SLACK_MS = 10
+# Frames summed into one FRAMES record
+WINDOW_FRAMES = 20
+# Serial lines start with this, then the device id and the base64 records
+PREFIX = "TLM:"
+# Game index of records from outside a game
+NO_GAME = 0xFF
+
+# Record kinds and their values
+BOOT = 1  # free heap, CPU clock in Hz, records dropped so far
+START = 2  # free heap, update period in ms, 0
+FRAMES = 3  # frames, average busy us, worst busy us
+INPUT = 4  # presses shown, average us from scan to flush, worst us
+LOST = 5  # score, ticks, heap low-water mark
+WON = 6  # score, ticks, heap low-water mark
+ERROR = 7  # free heap, 0, 0
+
+
+class Telemetry:
+    def __init__(self):
+        """
+        Collect fixed-size binary records about sessions, frame times and
+        input latency, to be drained as text lines when there is time.
+
+        Records go into a preallocated ring with struct.pack_into().
+        Per-frame samples only add to a few counters; a record is packed
+        every WINDOW_FRAMES frames. drain() writes the records out in idle
+        time, as lines of PREFIX, the device id and base64 records, which
+        host/telemetry_report.py decodes.
+
+        Instrumented code checks `enabled` before touching the collector,
+        so a disabled collector costs one attribute lookup per call site.
+        """
+        self.enabled = False
+        self.sink = None
+        self.device = ""
+        self.ring = bytearray(RING_RECORDS * RECORD_SIZE)
+        self.head = 0
+        self.tail = 0
+        self.seq = 0
+        self.dropped = 0
+        # Index of the running game in the menu, set by GameManager
+        self.game = NO_GAME
+        self.reset_window()
+
+    def enable(self, sink, device=None):
+        """
+        Start collecting.
+
+        :param sink: Object with write(str), such as sys.stdout or a file
+            open for appending.
+        :param device: Id of this device in the lines, default the hex of
+            machine.unique_id().
+        """
+        if device is None:
+            import machine
+
+            device = binascii.hexlify(machine.unique_id()).decode()
+        self.sink = sink
+        self.device = device
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset_window(self):
+        self.frames = 0
+        self.busy_total = 0
+        self.busy_max = 0
+        self.presses = 0
+        self.latency_total = 0
+        self.latency_max = 0
+
+    def record(self, kind, a=0, b=0, c=0):
+        """
+        Add a record to the ring, or count it as dropped if the ring is full.
+        """
+        seq = self.seq
+        self.seq = (seq + 1) & 0xFFFF
+        tail = self.tail
+        nxt = (tail + 1) % RING_RECORDS
+        if nxt == self.head:
+            self.dropped += 1
+            return
+        struct.pack_into(
+            RECORD_FMT,
+            self.ring,
+            tail * RECORD_SIZE,
+            kind,
+            self.game,
+            seq,
+            time.ticks_ms(),
+            a,
+            b,
+            c,
+        )
+        self.tail = nxt
+
+    def boot(self, freq):
+        self.record(BOOT, gc.mem_free(), freq, self.dropped)
+
+    def start(self, game):
+        """
+        A game is about to start its clock.
+        """
+        self.reset_window()
+        self.record(START, gc.mem_free(), game.update_period)
+
+    def frame(self, busy_us):
+        """
+        Add a pass of the game loop that took `busy_us` of work.
+        """
+        self.frames += 1
+        self.busy_total += busy_us
+        if busy_us > self.busy_max:
+            self.busy_max = busy_us
+        if self.frames >= WINDOW_FRAMES:
+            self.close_window()
+
+    def shown(self, latency_us):
+        """
+        Add the time from the scan that saw a press to the end of the flush
+        of the first frame drawn after it.
+        """
+        self.presses += 1
+        self.latency_total += latency_us
+        if latency_us > self.latency_max:
+            self.latency_max = latency_us
+
+    def close_window(self):
+        """
+        Pack the frame and input samples gathered so far into records.
+        """
+        frames = self.frames
+        if frames:
+            self.record(FRAMES, frames, self.busy_total // frames, self.busy_max)
+        presses = self.presses
+        if presses:
+            self.record(
+                INPUT, presses, self.latency_total // presses, self.latency_max
+            )
+        self.reset_window()
+
+    def end(self, game, low_water):
+        """
+        A game ended; record how, with the lowest free heap it saw.
+        """
+        self.close_window()
+        kind = WON if game.game_win_flag else LOST
+        self.record(kind, game.score, game.tick_count, low_water)
+
+    def error(self):
+        self.record(ERROR, gc.mem_free())
+
+    def pending(self):
+        """
+        Number of records waiting to be drained.
+        """
+        return (self.tail - self.head) % RING_RECORDS
+
+    def drain(self, max_lines=1):
+        """
+        Write up to `max_lines` lines of waiting records to the sink. Call
+        when there is time to spare; base64 encoding allocates.
+
+        :return: Number of records written.
+        """
+        written = 0
+        view = memoryview(self.ring)
+        for _ in range(max_lines):
+            head = self.head
+            tail = self.tail
+            if head == tail:
+                break
+            # Up to the end of the ring; the rest goes in the next line
+            end = tail if tail > head else RING_RECORDS
+            if end - head > DRAIN_RECORDS:
+                end = head + DRAIN_RECORDS
+            data = binascii.b2a_base64(view[head * RECORD_SIZE : end * RECORD_SIZE])
+            self.sink.write(PREFIX + self.device + ":" + data.decode())
+            self.head = end % RING_RECORDS
+            written += end - head
+        if written and hasattr(self.sink, "flush"):
+            self.sink.flush()
+        return written
+
+
+# Shared instance, enabled from boot.py
+TELEMETRY = Telemetry()